@@ -67,12 +67,20 @@ INSTALLED_APPS = [
 # 3. MIDDLEWARE (Intermediarios)
 # ==========================================
 MIDDLEWARE = [
+    # Opcional: solo actúa con PERFILADO=True (consultas y tiempos por petición)
+    'expedientes.middleware.PerfiladoMiddleware',
     'django.middleware.security.SecurityMiddleware',
-    "whitenoise.middleware.WhiteNoiseMiddleware", 
+    # WhiteNoise con soporte async (ver expedientes/middleware.py)
+    'expedientes.middleware.EstaticosMiddleware',
+    # Latencias y conteos para /metrics (después de WhiteNoise: los estáticos no cuentan)
+    'expedientes.middleware.MetricasMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'expedientes.middleware.BitacoraMiddleware',
+    # Respuestas 413/503 cuando un PDF o una conversión no se admite (ver expedientes/admision.py)
+    'expedientes.admision.AdmisionMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -83,12 +91,20 @@ ROOT_URLCONF = 'core.urls'
 # ==========================================
 # 4. TEMPLATES (Plantillas HTML)
 # ==========================================
+# Loader en caché siempre: cada plantilla se compila una vez por proceso (en desarrollo
+# Django lo vacía al editar un archivo). Con gunicorn --preload arranque.py las precompila
+# todas en el maestro; `manage.py precompilar_plantillas` mide cuánto tarda cada una.
+CARGADORES_PLANTILLAS = [
+    'django.template.loaders.filesystem.Loader',
+    'django.template.loaders.app_directories.Loader',
+]
+
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
         'DIRS': [os.path.join(BASE_DIR, 'templates')],
-        'APP_DIRS': True,
         'OPTIONS': {
+            'loaders': [('django.template.loaders.cached.Loader', CARGADORES_PLANTILLAS)],
             'context_processors': [
                 'django.template.context_processors.debug',
                 'django.template.context_processors.request',
@@ -121,6 +137,26 @@ if 'DATABASE_URL' in os.environ:
     DATABASES['default'].update(db_from_env)
 
 
+# ==========================================
+# 5.1 CACHÉ (Compartida entre workers)
+# ==========================================
+# Por defecto en archivos: la comparten todos los workers de la máquina sin servicios extra.
+# Con CACHE_URL se usa otra, p. ej. redis://host:6379/1 (requiere el paquete `redis`)
+# o dbcache://corpad_cache (requiere `manage.py createcachetable`).
+if 'CACHE_URL' in os.environ:
+    CACHES = {'default': env.cache('CACHE_URL')}
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': BASE_DIR / '.cache',
+            # El backend de archivos recorre el directorio en cada escritura para
+            # decidir si purga: un tope moderado lo mantiene barato
+            'OPTIONS': {'MAX_ENTRIES': 5000, 'CULL_FREQUENCY': 4},
+        }
+    }
+
+
 # ==========================================
 # 6. AUTENTICACIÓN Y PASSWORD
 # ==========================================
@@ -183,7 +219,9 @@ else:
 # ==========================================
 # 9. SISTEMA DE CORREO (Vía API - RESEND)
 # ==========================================
-EMAIL_BACKEND = "anymail.backends.resend.EmailBackend"
+# El backend medido cuenta enviados/fallidos para /metrics y delega en el real
+EMAIL_BACKEND = "expedientes.metricas.EmailBackendMedido"
+EMAIL_BACKEND_REAL = env('EMAIL_BACKEND_REAL', default="anymail.backends.resend.EmailBackend")
 
 ANYMAIL = {
    "RESEND_API_KEY": env('RESEND_API_KEY', default=''),
@@ -198,6 +236,62 @@ SERVER_EMAIL = env('DEFAULT_FROM_EMAIL', default="onboarding@resend.dev")
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 
+# ==========================================
+# 9.1 PERFILADO (Opcional)
+# ==========================================
+# Con PERFILADO=True cada respuesta lleva Server-Timing y el staff ve /perfilado/
+PERFILADO = env.bool('PERFILADO', default=False)
+# Máximo de consultas por vista (nombre de la URL). Se pasa -> warning; con PERFILADO_ESTRICTO -> excepción.
+PERFILADO_PRESUPUESTO = env.int('PERFILADO_PRESUPUESTO', default=None)
+PERFILADO_PRESUPUESTOS = {
+    'dashboard': 15,
+    'detalle_cliente': 20,
+    'vista_publica_carga': 10,
+    'panel_finanzas': 15,
+    'api_eventos': 8,
+}
+PERFILADO_ESTRICTO = env.bool('PERFILADO_ESTRICTO', default=False)
+
+
+# ==========================================
+# 9.2 MÉTRICAS (/metrics)
+# ==========================================
+# Si se define, Prometheus debe mandar "Authorization: Bearer <token>". Sin token solo lo ve el staff.
+METRICAS_TOKEN = env('METRICAS_TOKEN', default='')
+
+
+# ==========================================
+# 9.3 ADMISIÓN DE TRABAJOS PESADOS
+# ==========================================
+# WeasyPrint, mammoth y pandas pasan por expedientes/admision.py. Por tipo:
+#   concurrencia: trabajos a la vez por worker     fichas/ventana: trabajos por N segundos entre workers
+#   max_bytes: tamaño máximo de la entrada          espera: segundos en cola (0 = rechazar de inmediato)
+#   timeout: segundos antes de responder 503
+ADMISION = {
+    # Cotizaciones, recibos, órdenes de cobro y el diseñador (HTML libre)
+    'pdf': {
+        'concurrencia': env.int('ADMISION_PDF_CONCURRENCIA', default=2),
+        'fichas': 30, 'ventana': 10, 'max_bytes': 5 * 1024 * 1024, 'espera': 10, 'timeout': 60,
+    },
+    # Vista previa y visor de Word
+    'docx': {
+        'concurrencia': env.int('ADMISION_DOCX_CONCURRENCIA', default=2),
+        'fichas': 30, 'ventana': 10, 'max_bytes': 15 * 1024 * 1024, 'espera': 5, 'timeout': 30,
+    },
+    # Vista previa de Excel/CSV
+    'tabla': {
+        'concurrencia': env.int('ADMISION_TABLA_CONCURRENCIA', default=1),
+        'fichas': 10, 'ventana': 10, 'max_bytes': 10 * 1024 * 1024, 'espera': 5, 'timeout': 30,
+    },
+}
+
+# Exportación masiva de cotizaciones (ZIP): los PDFs que faltan se renderizan en un
+# pool de procesos por worker (expedientes/pdf.py), fuera del límite de 'pdf'
+EXPORTACION_PDF_PROCESOS = env.int('EXPORTACION_PDF_PROCESOS', default=2)
+EXPORTACION_PDF_TAREAS_POR_PROCESO = 50
+EXPORTACION_MAX_COTIZACIONES = env.int('EXPORTACION_MAX_COTIZACIONES', default=1000)
+
+
 # ==========================================
 # 10. SEGURIDAD PARA PRODUCCIÓN (BLINDAJE)
 # ==========================================
@@ -30,6 +30,7 @@ urlpatterns = [
     path('cliente/<uuid:cliente_id>/', views.detalle_cliente, name='detalle_cliente'),
     path('cliente/<uuid:cliente_id>/carpeta/<int:carpeta_id>/', views.detalle_cliente, name='detalle_carpeta'),
     path('cliente/editar/<uuid:cliente_id>/', views.editar_cliente, name='editar_cliente'),
+    path('cliente/<uuid:cliente_id>/bitacora/', views.api_bitacora_cliente, name='api_bitacora_cliente'),
     path('finanzas/eliminar/<int:id>/', views.eliminar_finanza, name='eliminar_finanza'),
     # CONFIGURACIÓN
     path('configuracion/campos/', views.configurar_campos, name='configurar_campos'),
@@ -43,6 +44,7 @@ urlpatterns = [
     path('archivo/eliminar/<int:archivo_id>/', views.eliminar_archivo_drive, name='eliminar_archivo_drive'),
     path('drive/subir-requisito/<int:carpeta_id>/', views.subir_archivo_requisito, name='subir_archivo_requisito'),
     path('drive/zip/<int:carpeta_id>/', views.descargar_carpeta_zip, name='descargar_carpeta_zip'),
+    path('drive/exportar/', views.exportar_documentos, name='exportar_documentos'),
     path('drive/acciones-masivas/', views.acciones_masivas_drive, name='acciones_masivas_drive'),
     path('drive/preview/<int:documento_id>/', views.preview_archivo, name='preview_archivo'),
 
@@ -74,16 +76,23 @@ urlpatterns = [
     path('cotizaciones/servicios/eliminar/<int:servicio_id>/', views.eliminar_servicio, name='eliminar_servicio'),
     path('cotizaciones/', views.lista_cotizaciones, name='lista_cotizaciones'),
     path('cotizaciones/nueva/', views.nueva_cotizacion, name='nueva_cotizacion'),
+    path('cotizaciones/exportar/', views.exportar_cotizaciones_zip, name='exportar_cotizaciones_zip'),
+    path('cotizaciones/exportar/tabla/', views.exportar_cotizaciones, name='exportar_cotizaciones'),
     path('cotizaciones/<int:cotizacion_id>/', views.detalle_cotizacion, name='detalle_cotizacion'),
     path('cotizaciones/<int:cotizacion_id>/pdf/', views.generar_pdf_cotizacion, name='pdf_cotizacion'),
     path('cotizaciones/<int:cotizacion_id>/convertir/', views.convertir_a_cliente, name='convertir_cliente'),
     path('cotizaciones/<int:cotizacion_id>/enviar-email/', views.enviar_cotizacion_email, name='enviar_cotizacion_email'),
     path('cotizaciones/eliminar/<int:cotizacion_id>/', views.eliminar_cotizacion, name='eliminar_cotizacion'),
+    path('cotizacion/<uuid:folio>/', views.cotizacion_publica, name='cotizacion_publica'),
+    path('cotizacion/<uuid:folio>/pdf/', views.cotizacion_publica_pdf, name='cotizacion_publica_pdf'),
 
     # FINANZAS
     path('finanzas/', views.panel_finanzas, name='panel_finanzas'),
     path('finanzas/pagar/', views.registrar_pago, name='registrar_pago'),
     path('finanzas/recibo/<int:pago_id>/', views.recibo_pago_pdf, name='recibo_pago_pdf'),
+    path('finanzas/estados-cuenta/', views.generar_estados_cuenta, name='generar_estados_cuenta'),
+    path('finanzas/cartera/exportar/', views.exportar_cartera, name='exportar_cartera'),
+    path('finanzas/exportar/', views.exportar_finanzas, name='exportar_finanzas'),
     path('correo/<uuid:cliente_id>/<str:tipo_correo>/', views.enviar_correo_universal, name='enviar_correo_universal'),
     path('generar-final/', views.generar_contrato_final, name='generar_contrato_final'),
     # AGENDA
@@ -92,6 +101,12 @@ urlpatterns = [
     path('agenda/crear/', views.crear_evento, name='crear_evento'),
     path('agenda/eliminar/<int:evento_id>/', views.eliminar_evento, name='eliminar_evento'),
     path('agenda/mover/', views.mover_evento_api, name='mover_evento_api'),
+    # VENCIMIENTOS
+    path('vencimientos/', views.panel_vencimientos, name='panel_vencimientos'),
+    path('vencimientos/exportar/', views.exportar_vencimientos, name='exportar_vencimientos'),
+    # DIAGNÓSTICO
+    path('perfilado/', views.reporte_perfilado, name='reporte_perfilado'),
+    path('metrics', views.metricas_prometheus, name='metricas'),
     # PARCHE DE EMERGENCIA: Acepta la ruta vieja por si el navegador tiene caché
     path('expedientes/drive/subir-requisito/<int:carpeta_id>/', views.subir_archivo_requisito),
     path('cliente/<uuid:cliente_id>/enviar-recordatorio/', views.enviar_recordatorio_documentacion, name='enviar_recordatorio'),
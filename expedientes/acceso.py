@@ -0,0 +1,148 @@
+# ==========================================
+# EXPEDIENTES/ACCESO.PY - ALCANCE DE ACCESO POR USUARIO
+# ==========================================
+"""
+Qué clientes puede ver un usuario y qué permisos tiene, en un solo objeto.
+
+Los clientes asignados se leen una vez (1 consulta a la tabla M2M), se
+guardan en la caché compartida y el alcance se memoriza en la instancia del
+usuario: dentro de una petición las revisiones son búsquedas en un set y
+entre peticiones no se vuelve a tocar la base de datos.
+
+Las señales de models.py lo invalidan cuando cambia el Usuario o su lista de
+clientes_asignados; como la caché se comparte entre workers (ver cache.py),
+todos lo ven al momento.
+"""
+import uuid
+
+from django.db.models import Q
+
+from .cache import ACCESO
+
+# La posición de cada bandera es su bit en la máscara
+PERMISOS = (
+    'can_create_client', 'can_edit_client', 'can_delete_client', 'can_view_documents',
+    'can_upload_files', 'can_manage_users',
+    'access_finanzas', 'access_cotizaciones', 'access_contratos', 'access_disenador', 'access_agenda',
+)
+_BITS = {nombre: 1 << i for i, nombre in enumerate(PERMISOS)}
+TODOS = (1 << len(PERMISOS)) - 1
+
+_ATRIBUTO = '_alcance_acceso'
+
+
+class Alcance:
+    """
+    Clientes visibles (frozenset de UUID) más una máscara de permisos.
+
+    Uso:
+        alcance = alcance_de(request.user)
+        if not alcance.ve_cliente(cliente.id): return redirect('dashboard')
+        if alcance.puede('can_delete_client'): ...
+        tareas = Tarea.objects.filter(alcance.filtro())
+    """
+
+    __slots__ = ('usuario_id', 'es_admin', 'clientes', 'permisos')
+
+    def __init__(self, usuario_id=None, es_admin=False, clientes=frozenset(), permisos=0):
+        self.usuario_id = usuario_id
+        self.es_admin = es_admin
+        self.clientes = frozenset(clientes)
+        self.permisos = TODOS if es_admin else permisos
+
+    def puede(self, permiso):
+        """True si tiene la bandera (p. ej. 'can_delete_client'). El admin puede todo."""
+        return bool(self.permisos & _BITS[permiso])
+
+    def ve_cliente(self, cliente_id):
+        """True si el cliente (id, UUID en texto o instancia) está en su alcance."""
+        if self.es_admin:
+            return True
+        if cliente_id is None:
+            return False
+        cliente_id = getattr(cliente_id, 'pk', cliente_id)
+        if not isinstance(cliente_id, uuid.UUID):
+            try:
+                cliente_id = uuid.UUID(str(cliente_id))
+            except ValueError:
+                return False
+        return cliente_id in self.clientes
+
+    def filtro(self, campo='cliente'):
+        """
+        Q reutilizable para listas: `campo` es la FK a Cliente ('id' si el modelo es Cliente).
+
+        Para el admin es "tiene cliente" y no Q() vacío, para que al combinarlo
+        con | (p. ej. Q(usuario=u) | alcance.filtro()) siga significando lo mismo.
+        """
+        if self.es_admin:
+            return Q(**{f"{campo}__isnull": False})
+        return Q(**{f"{campo}__in": self.clientes})
+
+    def clientes_qs(self):
+        from .models import Cliente
+
+        return Cliente.objects.filter(self.filtro('id'))
+
+
+def _mascara(usuario):
+    permisos = 0
+    for nombre, bit in _BITS.items():
+        if getattr(usuario, nombre, False):
+            permisos |= bit
+    return permisos
+
+
+def _ambito(usuario_id):
+    return f"usuario:{usuario_id}"
+
+
+def alcance_de(usuario):
+    """
+    Alcance del usuario, memorizado en la instancia (vida de la petición).
+
+    La máscara sale de las banderas que ya trae la fila del usuario; la lista
+    de clientes asignados (lo que cuesta una consulta) se guarda además en la
+    caché compartida entre peticiones y workers.
+
+    Args:
+        usuario: Usuario (o request.user). Anónimos: alcance vacío.
+
+    Returns:
+        Alcance
+    """
+    if usuario is None or not usuario.is_authenticated:
+        return Alcance()
+    alcance = getattr(usuario, _ATRIBUTO, None)
+    if alcance is not None:
+        return alcance
+    if usuario.rol == 'admin':
+        alcance = Alcance(usuario.pk, es_admin=True)
+    else:
+        # La versión se lee antes de la consulta: si el alcance cambia mientras tanto,
+        # lo leído queda guardado con la versión vieja y nadie lo vuelve a leer
+        version = ACCESO.version(_ambito(usuario.pk))
+        clientes = ACCESO.obtener(
+            ACCESO.clave(usuario.pk, version),
+            lambda: frozenset(usuario.clientes_asignados.values_list('id', flat=True)),
+        )
+        alcance = Alcance(usuario.pk, False, clientes, _mascara(usuario))
+    setattr(usuario, _ATRIBUTO, alcance)
+    return alcance
+
+
+def invalidar_alcance(*usuarios):
+    """
+    Descarta el alcance guardado de los usuarios dados (instancias o ids).
+
+    La copia de la instancia se borra al momento; la de la caché cambia de
+    versión al confirmar la transacción. Una lectura que empezó antes guarda
+    la lista vieja con la versión anterior, que ya nadie consulta.
+    """
+    ambitos = []
+    for u in usuarios:
+        if hasattr(u, 'pk'):
+            u.__dict__.pop(_ATRIBUTO, None)
+            u = u.pk
+        ambitos.append(_ambito(u))
+    ACCESO.invalidar(*ambitos)
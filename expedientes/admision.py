@@ -0,0 +1,222 @@
+# ==========================================
+# EXPEDIENTES/ADMISION.PY - CONTROL DE ADMISIÓN DE TRABAJOS PESADOS
+# ==========================================
+"""
+Los renders de WeasyPrint y las conversiones con mammoth y pandas cargan el
+documento completo en memoria. Unas cuantas peticiones grandes a la vez bastan
+para agotar la RAM de la máquina, así que todas pasan por aquí:
+
+    - Tamaño máximo de la entrada por tipo (413 si se pasa).
+    - Semáforo por worker: cuántos trabajos del tipo corren a la vez en el proceso.
+    - Cubeta de fichas en la caché compartida: cuántos trabajos por ventana de
+      tiempo entre todos los workers (con Redis el conteo es atómico; con la caché
+      de archivos es aproximado y el semáforo sigue siendo el tope duro).
+    - Sin lugar se espera en cola hasta `espera` segundos, o se rechaza de
+      inmediato si es 0 (503 con Retry-After).
+    - Tiempo máximo de ejecución: pasado `timeout` la petición recibe un 503. El
+      trabajo no se puede interrumpir, así que conserva su lugar hasta terminar.
+
+Los límites por tipo están en settings.ADMISION ("9.3 ADMISIÓN").
+"""
+import contextvars
+import logging
+import math
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturoVencido
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse, JsonResponse
+from django.template.defaultfilters import filesizeformat
+from django.utils.deprecation import MiddlewareMixin
+
+from .metricas import ADMISION_EN_CURSO, ADMISION_ESPERA, ADMISION_RECHAZOS
+
+logger = logging.getLogger(__name__)
+
+LIMITES_DEFECTO = {
+    'concurrencia': 2,   # Trabajos simultáneos por worker
+    'fichas': 10,        # Trabajos por ventana entre todos los workers (0 = sin cubeta)
+    'ventana': 5,        # Segundos
+    'max_bytes': 5 * 1024 * 1024,
+    'espera': 5,         # Segundos en cola antes de rechazar (0 = rechazar sin esperar)
+    'timeout': 60,       # Segundos de ejecución antes de responder 503
+}
+
+
+class Rechazo(Exception):
+    """Un trabajo pesado que no se admitió o no terminó a tiempo."""
+
+    estado = 503
+    motivo = 'saturado'
+
+    def __init__(self, mensaje, reintentar=None):
+        super().__init__(mensaje)
+        self.reintentar = reintentar
+
+
+class EntradaDemasiadoGrande(Rechazo):
+    estado = 413
+    motivo = 'tamano'
+
+
+class Saturado(Rechazo):
+    motivo = 'saturado'
+
+
+class TiempoAgotado(Rechazo):
+    motivo = 'tiempo'
+
+
+def limites(tipo):
+    return {**LIMITES_DEFECTO, **getattr(settings, 'ADMISION', {}).get(tipo, {})}
+
+
+# ------------------------------------------
+# Semáforos y pools por worker
+# ------------------------------------------
+_locales = {}
+_locales_lock = threading.Lock()
+
+
+def _del_proceso(tipo, concurrencia):
+    """
+    (semáforo, pool) del tipo en este proceso. Se crean al primer uso: los de un
+    maestro de gunicorn no sobreviven al fork (igual que el pool de tareas.py).
+    """
+    try:
+        return _locales[tipo]
+    except KeyError:
+        pass
+    with _locales_lock:
+        if tipo not in _locales:
+            _locales[tipo] = (
+                threading.BoundedSemaphore(concurrencia),
+                ThreadPoolExecutor(max_workers=concurrencia, thread_name_prefix=f'corpad-{tipo}'),
+            )
+        return _locales[tipo]
+
+
+# ------------------------------------------
+# Cubeta de fichas compartida
+# ------------------------------------------
+def _tomar_ficha(tipo, fichas, ventana):
+    """
+    Descuenta una ficha de la ventana actual. Devuelve 0 si se obtuvo o los
+    segundos que faltan para que la cubeta se rellene.
+    """
+    if not fichas:
+        return 0
+    ahora = time.time()
+    numero = int(ahora // ventana)
+    clave = f"admision:{tipo}:{numero}"
+    try:
+        cache.add(clave, 0, ventana * 2)
+        usadas = cache.incr(clave)
+    except ValueError:  # La clave venció entre add e incr: ventana nueva
+        return 0
+    except Exception as e:
+        # Sin caché no se bloquea el servicio: el semáforo del worker sigue limitando
+        logger.warning(f"Cubeta de admisión '{tipo}' sin caché: {e}")
+        return 0
+    if usadas <= fichas:
+        return 0
+    return (numero + 1) * ventana - ahora
+
+
+# ------------------------------------------
+# Ejecución
+# ------------------------------------------
+def ejecutar(tipo, funcion, *args, tamano=None, **kwargs):
+    """
+    Corre `funcion(*args, **kwargs)` respetando los límites del tipo.
+
+    Uso:
+        contenido = admision.ejecutar('pdf', pdf.renderizar, html, base_url, origen, tamano=len(html))
+        html = admision.ejecutar('docx', _docx_a_html, doc.archivo, tamano=doc.archivo.size)
+
+    Args:
+        tipo:   Clave de settings.ADMISION ('pdf', 'docx', 'tabla').
+        tamano: Bytes de la entrada, para el tope `max_bytes` (None = no se revisa).
+
+    Returns:
+        Lo que devuelva la función.
+
+    Raises:
+        EntradaDemasiadoGrande, Saturado o TiempoAgotado (todas subclases de Rechazo).
+    """
+    conf = limites(tipo)
+    if tamano is not None and tamano > conf['max_bytes']:
+        ADMISION_RECHAZOS.labels(tipo, EntradaDemasiadoGrande.motivo).inc()
+        raise EntradaDemasiadoGrande(f"El archivo excede el máximo de {filesizeformat(conf['max_bytes'])} para esta operación.")
+
+    semaforo, pool = _del_proceso(tipo, conf['concurrencia'])
+    inicio = time.monotonic()
+    limite = inicio + conf['espera']
+
+    def _rechazar(reintentar):
+        ADMISION_ESPERA.labels(tipo).observe(time.monotonic() - inicio)
+        ADMISION_RECHAZOS.labels(tipo, Saturado.motivo).inc()
+        raise Saturado("El servidor está ocupado generando otros documentos. Intenta de nuevo en unos segundos.", reintentar)
+
+    # 1. Ficha de la cubeta compartida (si no hay, se espera al relleno mientras alcance)
+    while True:
+        faltan = _tomar_ficha(tipo, conf['fichas'], conf['ventana'])
+        if not faltan:
+            break
+        if time.monotonic() + faltan > limite:
+            _rechazar(faltan)
+        time.sleep(faltan)
+
+    # 2. Lugar en el worker
+    if not semaforo.acquire(timeout=max(limite - time.monotonic(), 0)):
+        _rechazar(conf['ventana'])
+    ADMISION_ESPERA.labels(tipo).observe(time.monotonic() - inicio)
+
+    # 3. Ejecución con tiempo máximo; el lugar se libera cuando el trabajo termina de verdad
+    ADMISION_EN_CURSO.labels(tipo).inc()
+    try:
+        # Con el contexto de la petición (perfilado y demás ContextVar), como sync_to_async
+        futuro = pool.submit(contextvars.copy_context().run, funcion, *args, **kwargs)
+    except Exception:
+        ADMISION_EN_CURSO.labels(tipo).dec()
+        semaforo.release()
+        raise
+
+    def _liberar(_):
+        ADMISION_EN_CURSO.labels(tipo).dec()
+        semaforo.release()
+
+    futuro.add_done_callback(_liberar)
+    try:
+        return futuro.result(timeout=conf['timeout'])
+    except FuturoVencido:
+        ADMISION_RECHAZOS.labels(tipo, TiempoAgotado.motivo).inc()
+        logger.warning(f"Trabajo '{tipo}' ({getattr(funcion, '__name__', funcion)}) pasó de {conf['timeout']} s")
+        raise TiempoAgotado("El documento tardó demasiado en procesarse.", conf['ventana'])
+
+
+# ------------------------------------------
+# Respuestas
+# ------------------------------------------
+def _con_reintento(respuesta, rechazo):
+    if rechazo.reintentar:
+        respuesta['Retry-After'] = str(math.ceil(rechazo.reintentar))
+    return respuesta
+
+
+def respuesta(rechazo):
+    """JsonResponse con el formato de error de las APIs ({'status': 'error', 'msg': ...})."""
+    return _con_reintento(JsonResponse({'status': 'error', 'msg': str(rechazo)}, status=rechazo.estado), rechazo)
+
+
+class AdmisionMiddleware(MiddlewareMixin):
+    """Convierte un Rechazo que llegue hasta arriba (descargas de PDF, visor) en 413/503 en texto plano."""
+
+    def process_exception(self, request, exception):
+        if not isinstance(exception, Rechazo):
+            return None
+        return _con_reintento(
+            HttpResponse(str(exception), status=exception.estado, content_type='text/plain; charset=utf-8'), exception,
+        )
@@ -0,0 +1,149 @@
+# ==========================================
+# EXPEDIENTES/ARRANQUE.PY - CALENTAMIENTO ANTES DEL FORK (gunicorn --preload)
+# ==========================================
+"""
+Carga en el proceso maestro lo que todos los workers van a necesitar, para
+que lo hereden por copy-on-write en lugar de construirlo cada uno.
+
+Lo llama gunicorn.conf.py (when_ready) con preload_app activo. Nada de aquí
+debe dejar hilos, pools ni conexiones abiertas: no sobreviven al fork.
+"""
+import logging
+import os
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+
+def _urls():
+    from django.urls import get_resolver
+
+    return len(get_resolver().reverse_dict)
+
+
+def _librerias():
+    # Las vistas las importan al usarlas (arranque en frío rápido); con preload se cargan
+    # aquí una vez para que todos los workers compartan esas páginas en lugar de duplicarlas
+    import importlib
+
+    cargadas = 0
+    for nombre in ('pandas', 'mammoth', 'docxtpl', 'docx', 'qrcode'):
+        try:
+            importlib.import_module(nombre)
+            cargadas += 1
+        except ImportError as e:
+            logger.warning(f"Calentamiento sin {nombre}: {e}")
+    return cargadas
+
+
+def _requisitos():
+    from .models import REQUISITOS_CARPETA
+
+    return sum(len(lista) for lista in REQUISITOS_CARPETA.values())
+
+
+def _fuentes():
+    # Fontconfig escanea las fuentes del sistema la primera vez y el CSS de los PDF se
+    # compila (pdf.HOJAS): se paga una vez en el maestro y los workers lo heredan
+    from . import pdf
+
+    try:
+        hojas = pdf.preparar()
+    except (ImportError, OSError) as e:
+        logger.warning(f"Calentamiento sin WeasyPrint: {e}")
+        return 0
+    pdf.renderizar("<p>.</p>", None, None)
+    return hojas
+
+
+def nombres_plantillas():
+    """Rutas relativas de todas las plantillas HTML del proyecto (DIRS y apps)."""
+    from django.template.utils import get_app_template_dirs
+
+    raices = [Path(d) for conf in settings.TEMPLATES for d in conf.get('DIRS', [])]
+    raices += [Path(d) for d in get_app_template_dirs('templates')]
+    nombres = set()
+    for raiz in raices:
+        for ruta in raiz.rglob('*.html'):
+            nombres.add(ruta.relative_to(raiz).as_posix())
+    return sorted(nombres)
+
+
+def precompilar(nombres=None):
+    """
+    Compila cada plantilla en el loader en caché y mide cuánto tardó.
+
+    Args:
+        nombres: rutas a compilar; por defecto todas (nombres_plantillas()).
+
+    Returns:
+        Lista de (nombre, milisegundos, error o None), en el orden dado.
+    """
+    from django.template.loader import get_template
+
+    resultados = []
+    for nombre in nombres or nombres_plantillas():
+        inicio = time.perf_counter()
+        error = None
+        try:
+            get_template(nombre)
+        except Exception as e:
+            error = str(e)
+        resultados.append((nombre, (time.perf_counter() - inicio) * 1000, error))
+    return resultados
+
+
+def _plantillas():
+    # El loader en caché guarda las plantillas compiladas: quedan en memoria compartida con los workers
+    resultados = precompilar()
+    for nombre, _, error in resultados:
+        if error:
+            logger.warning(f"No se pudo precompilar {nombre}: {error}")
+    lentas = sorted(resultados, key=lambda r: r[1], reverse=True)[:3]
+    logger.info("Plantillas más lentas: " + ", ".join(f"{n} {ms:.0f} ms" for n, ms, _ in lentas))
+    return sum(1 for *_, error in resultados if error is None)
+
+
+PASOS = (
+    ('urls', _urls),
+    ('librerias', _librerias),
+    ('requisitos', _requisitos),
+    ('fuentes', _fuentes),
+    ('plantillas', _plantillas),
+)
+
+
+def calentar():
+    """
+    Ejecuta cada paso y devuelve {paso: (cantidad, segundos)}.
+
+    Un paso que falla se registra y no detiene el arranque.
+    """
+    reporte = {}
+    for nombre, paso in PASOS:
+        inicio = time.perf_counter()
+        try:
+            cantidad = paso()
+        except Exception as e:
+            logger.exception(f"Calentamiento '{nombre}' falló: {e}")
+            cantidad = None
+        reporte[nombre] = (cantidad, time.perf_counter() - inicio)
+    # Las conexiones abiertas en el maestro se compartirían entre workers tras el fork
+    connections.close_all()
+    caches.close_all()
+    return reporte
+
+
+def memoria_mb():
+    """RSS actual del proceso en MB (Linux; None si no se puede leer)."""
+    try:
+        with open(f"/proc/{os.getpid()}/statm") as f:
+            paginas = int(f.read().split()[1])
+        return round(paginas * os.sysconf('SC_PAGE_SIZE') / 1024 / 1024, 1)
+    except (OSError, ValueError, IndexError):
+        return None
@@ -0,0 +1,53 @@
+# ==========================================
+# EXPEDIENTES/ASINCRONO.PY - APOYO PARA VISTAS ASYNC (ASGI)
+# ==========================================
+"""
+Piezas comunes de las vistas async: mientras esperan al storage, a la base de
+datos o a una conversión, el worker ASGI sigue atendiendo otras peticiones.
+
+Regla: lo que toca el ORM va con `sync_to_async` normal (hilo de la petición,
+donde vive su conexión); lo que solo es CPU o storage va con `en_hilo`
+(cualquier hilo del pool, en paralelo).
+"""
+import mimetypes
+
+from asgiref.sync import sync_to_async
+from django.http import StreamingHttpResponse
+from django.utils.http import content_disposition_header
+
+TAMANO_TROZO = 64 * 1024
+
+
+def en_hilo(funcion):
+    """Versión async de `funcion` que corre en el pool de hilos, sin amarrarse al hilo de la petición."""
+    return sync_to_async(funcion, thread_sensitive=False)
+
+
+async def trozos(archivo, tamano=TAMANO_TROZO):
+    """Iterador async sobre un archivo abierto; lo cierra al terminar."""
+    leer = en_hilo(archivo.read)
+    try:
+        while True:
+            trozo = await leer(tamano)
+            if not trozo:
+                break
+            yield trozo
+    finally:
+        await en_hilo(archivo.close)()
+
+
+async def respuesta_archivo(campo, nombre, adjunto=True):
+    """
+    Sirve un FileField leyéndolo por trozos sin bloquear el event loop.
+
+    Uso:
+        return await respuesta_archivo(doc.archivo, doc.nombre_archivo)
+
+    Raises:
+        FileNotFoundError / OSError si el storage no tiene el archivo.
+    """
+    archivo = await en_hilo(campo.open)('rb')
+    tipo, _ = mimetypes.guess_type(nombre)
+    respuesta = StreamingHttpResponse(trozos(archivo), content_type=tipo or 'application/octet-stream')
+    respuesta['Content-Disposition'] = content_disposition_header(adjunto, nombre)
+    return respuesta
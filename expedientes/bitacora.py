@@ -0,0 +1,145 @@
+# ==========================================
+# EXPEDIENTES/BITACORA.PY - AUDITORÍA POR CLIENTE
+# ==========================================
+import logging
+from contextvars import ContextVar
+
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import Bitacora, BitacoraHistorica
+
+logger = logging.getLogger(__name__)
+
+# Registros pendientes de la petición en curso (None = sin búfer: se insertan al momento)
+_pendientes = ContextVar('bitacora_pendientes', default=None)
+
+LIMITE_PAGINA = 20
+LIMITE_MAXIMO = 100
+
+
+# ------------------------------------------
+# Registro con búfer
+# ------------------------------------------
+def registrar_bitacora(usuario, cliente, accion, descripcion):
+    """
+    Registra una acción en la bitácora del cliente.
+
+    Dentro de una petición (BitacoraMiddleware) el registro se acumula y se
+    inserta junto con los demás en un solo bulk_create al terminar. Fuera de
+    una petición (comandos, tareas) se inserta de inmediato.
+
+    Uso:
+        registrar_bitacora(request.user, cliente, 'descarga', f"Descargó ZIP: {carpeta.nombre}")
+
+    Args:
+        usuario:     Usuario que hizo la acción (o None).
+        cliente:     Cliente o id del cliente.
+        accion:      Clave corta ('edicion', 'eliminacion', 'descarga', ...).
+        descripcion: Texto libre.
+    """
+    registro = Bitacora(
+        usuario=usuario if getattr(usuario, 'is_authenticated', False) else None,
+        cliente_id=getattr(cliente, 'pk', cliente),
+        accion=accion,
+        descripcion=descripcion,
+        fecha=timezone.now(),
+    )
+    pendientes = _pendientes.get()
+    if pendientes is None:
+        registro.save()
+    elif transaction.get_connection().in_atomic_block:
+        # Si la transacción se revierte, la acción no ocurrió: solo se anota al confirmar
+        transaction.on_commit(lambda: pendientes.append(registro))
+    else:
+        pendientes.append(registro)
+
+
+def iniciar_bufer():
+    """Activa el búfer para el contexto actual. Devuelve el token para `vaciar_bufer`."""
+    return _pendientes.set([])
+
+
+def vaciar_bufer(token):
+    """Inserta en lote lo acumulado y desactiva el búfer."""
+    return guardar_lote(cerrar_bufer(token))
+
+
+def cerrar_bufer(token):
+    """
+    Desactiva el búfer y devuelve lo acumulado sin guardarlo.
+
+    En la ruta async el token debe restablecerse en el mismo contexto donde se
+    creó; el bulk_create (`guardar_lote`) se manda después a un hilo.
+    """
+    pendientes = _pendientes.get()
+    _pendientes.reset(token)
+    return pendientes
+
+
+def guardar_lote(pendientes):
+    if not pendientes:
+        return 0
+    try:
+        Bitacora.objects.bulk_create(pendientes)
+    except Exception as e:
+        # La auditoría nunca debe tumbar la respuesta
+        logger.error(f"No se pudo guardar la bitácora ({len(pendientes)} registros): {e}")
+        return 0
+    return len(pendientes)
+
+
+# ------------------------------------------
+# Historial paginado (activo + archivado)
+# ------------------------------------------
+def _cursor(registro):
+    return f"{registro.fecha.isoformat()}|{registro.id}"
+
+
+def _filtro_cursor(cursor):
+    if not cursor:
+        return Q()
+    fecha_txt, _, id_txt = cursor.rpartition('|')
+    fecha = parse_datetime(fecha_txt)
+    if fecha is None or not id_txt.isdigit():
+        return Q()
+    return Q(fecha__lt=fecha) | Q(fecha=fecha, id__lt=int(id_txt))
+
+
+def pagina_historial(cliente_id, cursor=None, limite=LIMITE_PAGINA):
+    """
+    Página del historial de un cliente, de lo más reciente a lo más antiguo.
+
+    Paginación por cursor (fecha, id) sobre el índice (cliente, -fecha): el costo
+    no crece con la página. Al agotarse la tabla activa continúa en la archivada;
+    ambas comparten ids, así que el mismo cursor sirve para las dos.
+
+    Returns:
+        (registros, siguiente_cursor). `siguiente_cursor` es None en la última página.
+    """
+    limite = min(max(int(limite), 1), LIMITE_MAXIMO)
+    filtro = _filtro_cursor(cursor)
+    registros = []
+    for modelo in (Bitacora, BitacoraHistorica):
+        faltan = limite + 1 - len(registros)
+        if faltan <= 0:
+            break
+        registros += list(
+            modelo.objects.filter(filtro, cliente_id=cliente_id)
+            .select_related('usuario').only('id', 'accion', 'descripcion', 'fecha', 'usuario__username')
+            .order_by('-fecha', '-id')[:faltan]
+        )
+    siguiente = _cursor(registros[limite - 1]) if len(registros) > limite else None
+    return registros[:limite], siguiente
+
+
+def serializar_registro(registro):
+    return {
+        'id': registro.id,
+        'fecha': timezone.localtime(registro.fecha).isoformat(),
+        'usuario': registro.usuario.username if registro.usuario else '',
+        'accion': registro.accion,
+        'descripcion': registro.descripcion,
+    }
@@ -0,0 +1,155 @@
+# ==========================================
+# EXPEDIENTES/CACHE.PY - CACHÉ COMPARTIDA POR DOMINIOS
+# ==========================================
+"""
+Claves con espacio de nombres y versión para cada dominio que guarda cosas en
+la caché compartida (settings.CACHES, ver "5.1 CACHÉ").
+
+Cada clave tiene la forma "<dominio>:v<N>:<partes...>":
+    - N es la versión del formato: subirla en el código descarta de golpe todo
+      lo guardado por el dominio (p. ej. si cambia la forma del valor).
+    - Las partes suelen incluir una *versión de ámbito* (cliente, mes...) que
+      las señales cambian al modificar los datos: las entradas viejas ya no se
+      vuelven a leer y la caché las vence sola, sin borrar nada a mano.
+
+Las lecturas cuentan aciertos y fallos por dominio en /metrics
+(corpad_cache_consultas_total); `manage.py cache_stats` los resume.
+"""
+import secrets
+
+from django.core.cache import cache
+from django.db import transaction
+
+from .metricas import CACHE_CONSULTAS
+
+# Centinela para distinguir "no está" de un valor None guardado
+_FALTA = object()
+
+
+def _ficha():
+    # Versión de ámbito: aleatoria en lugar de un contador, para que dos
+    # invalidaciones simultáneas (o una clave de versión vencida) nunca
+    # regresen a un valor ya usado
+    return secrets.token_hex(4)
+
+
+class Espacio:
+    """
+    Un dominio de la caché: prefijo, versión de formato y TTL por defecto.
+
+    Uso:
+        clave = CUMPLIMIENTO.clave(carpeta.pk, CUMPLIMIENTO.version(carpeta.cliente_id))
+        detalle = CUMPLIMIENTO.obtener(clave, lambda: calcular(carpeta))
+        ...
+        CUMPLIMIENTO.invalidar(cliente_id)   # desde una señal
+    """
+
+    def __init__(self, nombre, ttl, version=1):
+        self.nombre = nombre
+        self.ttl = ttl
+        self.version_formato = version
+        self._prefijo = f"{nombre}:v{version}"
+
+    def __repr__(self):
+        return f"<Espacio {self._prefijo}>"
+
+    def clave(self, *partes):
+        return ':'.join([self._prefijo, *map(str, partes)])
+
+    def _contar(self, aciertos, fallos):
+        if aciertos:
+            CACHE_CONSULTAS.labels(self.nombre, 'acierto').inc(aciertos)
+        if fallos:
+            CACHE_CONSULTAS.labels(self.nombre, 'fallo').inc(fallos)
+
+    # ------------------------------------------
+    # Valores
+    # ------------------------------------------
+    def leer(self, clave, default=None):
+        valor = cache.get(clave, _FALTA)
+        self._contar(valor is not _FALTA, valor is _FALTA)
+        return default if valor is _FALTA else valor
+
+    def leer_varios(self, claves):
+        """Lee varias claves en una sola ida a la caché; devuelve solo las encontradas."""
+        encontradas = cache.get_many(list(claves))
+        self._contar(len(encontradas), len(claves) - len(encontradas))
+        return encontradas
+
+    def guardar(self, clave, valor, ttl=None):
+        cache.set(clave, valor, self.ttl if ttl is None else ttl)
+
+    def guardar_varios(self, valores, ttl=None):
+        if valores:
+            cache.set_many(valores, self.ttl if ttl is None else ttl)
+
+    def obtener(self, clave, calcular, ttl=None):
+        """
+        Valor guardado en `clave`; si no está, lo calcula, lo guarda y lo devuelve.
+
+        Un error de `calcular` se propaga y no se guarda nada.
+        """
+        valor = self.leer(clave, _FALTA)
+        if valor is _FALTA:
+            valor = calcular()
+            self.guardar(clave, valor, ttl)
+        return valor
+
+    def descartar(self, *claves):
+        """Borra claves concretas al confirmar la transacción en curso."""
+        if claves:
+            transaction.on_commit(lambda: cache.delete_many(list(claves)))
+
+    # ------------------------------------------
+    # Versiones de ámbito (invalidación por señales)
+    # ------------------------------------------
+    def _clave_version(self, ambito):
+        return f"{self._prefijo}:ver:{ambito}"
+
+    def versiones(self, ambitos):
+        """Versión actual de cada ámbito (una sola lectura); las que falten se crean."""
+        claves = [self._clave_version(a) for a in ambitos]
+        encontradas = cache.get_many(claves)
+        nuevas = {c: _ficha() for c in claves if c not in encontradas}
+        if nuevas:
+            cache.set_many(nuevas, None)
+            encontradas.update(nuevas)
+        return [encontradas[c] for c in claves]
+
+    def version(self, ambito):
+        return self.versiones([ambito])[0]
+
+    def invalidar(self, *ambitos):
+        """
+        Cambia la versión de los ámbitos dados al confirmar la transacción.
+
+        Se espera al commit para que otra petición no guarde, con la versión
+        nueva, datos que todavía no incluyen el cambio.
+        """
+        if not ambitos:
+            return
+        nuevas = {self._clave_version(a): _ficha() for a in ambitos}
+        transaction.on_commit(lambda: cache.set_many(nuevas, None))
+
+
+# ------------------------------------------
+# Dominios
+# ------------------------------------------
+# Clientes visibles por usuario (acceso.py)
+ACCESO = Espacio('acceso', ttl=10 * 60)
+# Eventos de la agenda por usuario y mes (calendario.py)
+AGENDA = Espacio('agenda', ttl=60 * 60 * 6)
+# Detalle de requisitos por carpeta; ámbito: cliente
+CUMPLIMIENTO = Espacio('cumplimiento', ttl=60 * 60)
+# Menú y avisos de base.html por usuario
+NOTIFICACIONES = Espacio('notif', ttl=5 * 60)
+# HTML de vistas previas (docx, hojas de cálculo, texto); la clave lleva el nombre del archivo
+PREVIEWS = Espacio('preview', ttl=60 * 60 * 24)
+# PDFs renderizados; la clave es el hash del HTML de entrada
+PDFS = Espacio('pdf', ttl=60 * 60 * 24)
+# Enlace público de cotizaciones (cotizacion_pdf.py); ámbito: folio
+PUBLICAS = Espacio('cotpub', ttl=60 * 60 * 24)
+# Antigüedad de saldos y flujo esperado (cartera.py); la clave lleva el día, ámbito: 'cuentas'
+CARTERA = Espacio('cartera', ttl=60 * 60 * 24)
+
+DOMINIOS = (ACCESO, AGENDA, CUMPLIMIENTO, NOTIFICACIONES, PREVIEWS, PDFS, PUBLICAS, CARTERA)
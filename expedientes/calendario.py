@@ -0,0 +1,241 @@
+# ==========================================
+# EXPEDIENTES/CALENDARIO.PY - VENTANAS DE EVENTOS DE LA AGENDA
+# ==========================================
+import hashlib
+from datetime import datetime, time
+
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from .acceso import alcance_de
+from .cache import AGENDA
+from .models import Documento, Evento
+from .recordatorios import alertas_en_rango, filtro_recurrentes, ocurrencias
+
+
+# ------------------------------------------
+# Meses y rangos
+# ------------------------------------------
+def parsear_limite(valor):
+    """Convierte el `start`/`end` que manda FullCalendar (fecha o fecha-hora ISO) a datetime aware."""
+    if not valor:
+        return None
+    dt = parse_datetime(valor)
+    if dt is None:
+        fecha = parse_date(valor[:10])
+        if fecha is None:
+            return None
+        dt = datetime.combine(fecha, time.min)
+    if timezone.is_naive(dt):
+        dt = timezone.make_aware(dt)
+    return dt
+
+
+def _inicio_mes(anio, mes):
+    return timezone.make_aware(datetime(anio, mes, 1))
+
+
+def _siguiente(anio, mes):
+    return (anio + 1, 1) if mes == 12 else (anio, mes + 1)
+
+
+def meses_en_rango(inicio, fin):
+    """Lista de (anio, mes) en hora local que toca el intervalo [inicio, fin)."""
+    local_ini = timezone.localtime(inicio)
+    local_fin = timezone.localtime(fin)
+    anio, mes = local_ini.year, local_ini.month
+    meses = []
+    while _inicio_mes(anio, mes) < local_fin or not meses:
+        meses.append((anio, mes))
+        anio, mes = _siguiente(anio, mes)
+    return meses
+
+
+def filtro_traslape(inicio, fin):
+    """
+    Eventos que se traslapan con [inicio, fin).
+
+    Incluye los que empezaron antes de la ventana y terminan dentro. Los
+    eventos sin `fin` son puntuales y cuentan solo si su inicio cae en la ventana.
+    """
+    return Q(inicio__lt=fin) & (Q(fin__gt=inicio) | Q(fin__isnull=True, inicio__gte=inicio))
+
+
+# ------------------------------------------
+# Versiones por mes (invalidación por señales)
+# ------------------------------------------
+def _ambito_mes(anio, mes):
+    return f"{anio}-{mes:02d}"
+
+
+AMBITO_RECURRENTES = "recurrentes"
+# Los títulos llevan el nombre del cliente: renombrar uno cambia cualquier mes
+AMBITO_CLIENTES = "clientes"
+
+
+def _ambito_usuario(usuario_id):
+    return f"usuario:{usuario_id}"
+
+
+def versiones_meses(usuario, meses):
+    """Versión de cada mes más la de las series recurrentes, la de los nombres de clientes y la del usuario."""
+    *por_mes, recurrentes, clientes, propia = AGENDA.versiones(
+        [_ambito_mes(a, m) for a, m in meses] + [AMBITO_RECURRENTES, AMBITO_CLIENTES, _ambito_usuario(usuario.pk)]
+    )
+    return [f"{v}.{recurrentes}.{clientes}.{propia}" for v in por_mes]
+
+
+def invalidar_rango(inicio, fin=None):
+    """Marca como obsoletos los meses que toca un evento (se llama desde las señales de Evento)."""
+    if inicio is None:
+        return
+    fin = fin if fin and fin > inicio else inicio
+    AGENDA.invalidar(*(_ambito_mes(anio, mes) for anio, mes in meses_en_rango(inicio, fin)))
+
+
+def invalidar_recurrentes():
+    """Una serie recurrente puede tocar cualquier mes: se invalida la versión común."""
+    AGENDA.invalidar(AMBITO_RECURRENTES)
+
+
+def invalidar_clientes():
+    """Al renombrar un cliente (señal de Cliente; solo si cambió nombre_empresa)."""
+    AGENDA.invalidar(AMBITO_CLIENTES)
+
+
+def invalidar_usuarios(*usuarios):
+    """Descarta la agenda guardada de los usuarios dados (instancias o ids) cuando cambia su alcance."""
+    AGENDA.invalidar(*{_ambito_usuario(getattr(u, 'pk', u)) for u in usuarios if u is not None})
+
+
+def invalidar_fechas(fechas):
+    """Invalida los meses de una lista de fechas (avisos de vencimiento de documentos)."""
+    AGENDA.invalidar(*{_ambito_mes(f.year, f.month) for f in fechas if f})
+
+
+# ------------------------------------------
+# Serialización compacta
+# ------------------------------------------
+def serializar_evento(e):
+    """Diccionario mínimo para FullCalendar: se omiten los campos vacíos."""
+    data = {
+        'id': e.id,
+        'title': f"{e.cliente.nombre_empresa}: {e.titulo}" if e.cliente else e.titulo,
+        'start': e.inicio.isoformat(),
+        'backgroundColor': e.color_hex,
+    }
+    if e.fin:
+        data['end'] = e.fin.isoformat()
+    extras = {'tipo': e.get_tipo_display()}
+    if e.descripcion:
+        extras['descripcion'] = e.descripcion
+    if e.cliente:
+        extras['cliente'] = e.cliente.nombre_empresa
+    data['extendedProps'] = extras
+    return data
+
+
+# ------------------------------------------
+# Consulta por ventana
+# ------------------------------------------
+def _eventos_visibles(usuario):
+    qs = Evento.objects.select_related('cliente')
+    alcance = alcance_de(usuario)
+    if not alcance.es_admin:
+        qs = qs.filter(Q(usuario=usuario) | alcance.filtro())
+    return qs
+
+
+def _documentos_visibles(usuario):
+    return Documento.objects.con_vencimiento().visibles_para(usuario)
+
+
+def _cargar_ventana(usuario, desde, hasta):
+    """
+    Todo lo que se muestra en la agenda para [desde, hasta), como tuplas (inicio, fin, data):
+    eventos simples, repeticiones de series recurrentes y avisos de vencimiento derivados.
+    """
+    qs = _eventos_visibles(usuario).filter(
+        (Q(recurrencia='') & filtro_traslape(desde, hasta)) | filtro_recurrentes(desde, hasta)
+    ).order_by('inicio')
+
+    for e in qs:
+        if not e.recurrencia:
+            yield e.inicio, (e.fin if e.fin and e.fin > e.inicio else e.inicio), serializar_evento(e)
+            continue
+        for inicio, fin in ocurrencias(e, desde, hasta):
+            data = serializar_evento(e)
+            data['start'] = inicio.isoformat()
+            if e.fin:
+                data['end'] = fin.isoformat()
+            data['editable'] = False  # Arrastrar una repetición movería toda la serie
+            yield inicio, fin, data
+
+    yield from alertas_en_rango(_documentos_visibles(usuario), desde, hasta)
+
+
+def firma_alcance(usuario):
+    """
+    Huella de lo que el usuario puede ver (admin o su lista de clientes).
+
+    Va en la clave y en el ETag: al cambiar sus asignaciones el alcance se
+    vuelve a leer (ver acceso.py) y las ventanas guardadas con el anterior
+    dejan de coincidir, sin esperar al TTL.
+    """
+    alcance = alcance_de(usuario)
+    if alcance.es_admin:
+        return 'admin'
+    return hashlib.md5(','.join(sorted(str(c) for c in alcance.clientes)).encode()).hexdigest()[:12]
+
+
+def etag_ventana(usuario, inicio, fin):
+    """ETag de la ventana: depende del alcance y de las versiones de los meses, sin tocar la BD."""
+    meses = meses_en_rango(inicio, fin)
+    firma = f"{usuario.pk}|{firma_alcance(usuario)}|{inicio.isoformat()}|{fin.isoformat()}|{versiones_meses(usuario, meses)}"
+    return hashlib.md5(firma.encode()).hexdigest()
+
+
+def eventos_en_ventana(usuario, inicio, fin):
+    """
+    Devuelve los eventos serializados que se traslapan con [inicio, fin).
+
+    Los eventos se guardan en caché por usuario, alcance y mes; los meses que
+    faltan se resuelven juntos con una sola consulta sobre el índice (inicio, fin)
+    más una sobre el índice de vencimientos de documentos.
+    """
+    meses = meses_en_rango(inicio, fin)
+    versiones = versiones_meses(usuario, meses)
+    alcance = firma_alcance(usuario)
+    claves = {
+        (anio, mes): AGENDA.clave(usuario.pk, alcance, _ambito_mes(anio, mes), version)
+        for (anio, mes), version in zip(meses, versiones)
+    }
+    cubetas = AGENDA.leer_varios(claves.values())
+    faltantes = [m for m in meses if claves[m] not in cubetas]
+
+    if faltantes:
+        limites = {m: (_inicio_mes(*m), _inicio_mes(*_siguiente(*m))) for m in faltantes}
+        desde = min(ini for ini, _ in limites.values())
+        hasta = max(fin_mes for _, fin_mes in limites.values())
+        nuevas = {claves[m]: [] for m in faltantes}
+
+        for ini_e, fin_e, data in _cargar_ventana(usuario, desde, hasta):
+            for m, (ini_mes, fin_mes) in limites.items():
+                if ini_e < fin_mes and (fin_e > ini_mes or ini_e >= ini_mes):
+                    nuevas[claves[m]].append((ini_e, fin_e, data))
+
+        AGENDA.guardar_varios(nuevas)
+        cubetas.update(nuevas)
+
+    vistos = set()
+    resultado = []
+    for m in meses:
+        for ini_e, fin_e, data in cubetas[claves[m]]:
+            llave = (data['id'], data['start'])
+            if llave in vistos:
+                continue
+            if ini_e < fin and (fin_e > inicio or ini_e >= inicio):
+                vistos.add(llave)
+                resultado.append(data)
+    return resultado
@@ -0,0 +1,148 @@
+# ==========================================
+# EXPEDIENTES/CARTERA.PY - ANTIGÜEDAD DE SALDOS Y FLUJO ESPERADO
+# ==========================================
+"""
+Reportes de cuentas por cobrar calculados en la base de datos:
+
+    - antiguedad(): saldo pendiente por cliente en tramos según
+      fecha_vencimiento (corriente, 1-30, 31-60, 61-90 y más de 90 días).
+      Un GROUP BY con una suma condicional por tramo.
+    - pronostico(): lo que se espera cobrar en las próximas 12 semanas según
+      el vencimiento de cada saldo, más lo ya vencido y lo que no tiene fecha.
+      Un solo aggregate con una suma condicional por semana.
+
+Ninguno recorre cuentas en Python. Los resultados se guardan en la caché
+(CARTERA) por día; un cambio en cuentas o pagos cambia el ámbito y la
+siguiente lectura vuelve a consultar.
+"""
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db.models import Count, DecimalField, Q, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .cache import CARTERA
+
+SEMANAS = 12
+
+# (clave, etiqueta, días vencidos desde, hasta); None = sin límite
+TRAMOS = (
+    ('corriente', 'Corriente', None, 0),
+    ('d1_30', '1-30 días', 1, 30),
+    ('d31_60', '31-60 días', 31, 60),
+    ('d61_90', '61-90 días', 61, 90),
+    ('d90_mas', 'Más de 90', 91, None),
+)
+
+
+def _suma(filtro):
+    return Coalesce(
+        Sum('saldo_pendiente', filter=filtro), Value(Decimal('0')),
+        output_field=DecimalField(max_digits=14, decimal_places=2),
+    )
+
+
+def _filtro_tramo(hoy, desde, hasta):
+    if hasta == 0:
+        # Corriente: aún no vence o no tiene fecha de vencimiento
+        return Q(fecha_vencimiento__gte=hoy) | Q(fecha_vencimiento__isnull=True)
+    filtro = Q(fecha_vencimiento__lte=hoy - timedelta(days=desde))
+    if hasta is not None:
+        filtro &= Q(fecha_vencimiento__gte=hoy - timedelta(days=hasta))
+    return filtro
+
+
+def _abiertas():
+    from .models import CuentaPorCobrar
+
+    return CuentaPorCobrar.objects.filter(saldo_pendiente__gt=0)
+
+
+def _en_cache(nombre, hoy, calcular):
+    return CARTERA.obtener(CARTERA.clave(nombre, hoy.isoformat(), CARTERA.version('cuentas')), calcular)
+
+
+# ------------------------------------------
+# Antigüedad de saldos
+# ------------------------------------------
+def _calcular_antiguedad(hoy):
+    sumas = {clave: _suma(_filtro_tramo(hoy, desde, hasta)) for clave, _, desde, hasta in TRAMOS}
+    clientes = list(
+        _abiertas().values('cliente_id', 'cliente__nombre_empresa')
+        .annotate(cuentas=Count('id'), total=_suma(Q()), **sumas)
+        .order_by('-total', 'cliente__nombre_empresa')
+    )
+    totales = _abiertas().aggregate(cuentas=Count('id'), total=_suma(Q()), **sumas)
+    return {'hoy': hoy, 'clientes': clientes, 'totales': totales}
+
+
+def antiguedad(hoy=None):
+    """
+    Saldo pendiente por cliente y tramo de vencimiento.
+
+    Uso:
+        reporte = antiguedad()
+        reporte['totales']['d90_mas']
+
+    Returns:
+        dict con `hoy`, `clientes` (lista de dicts: cliente_id, cliente__nombre_empresa,
+        cuentas, total y una clave por tramo de TRAMOS) y `totales` (mismas claves).
+    """
+    hoy = hoy or timezone.localdate()
+    return _en_cache('antiguedad', hoy, lambda: _calcular_antiguedad(hoy))
+
+
+# ------------------------------------------
+# Flujo esperado
+# ------------------------------------------
+def _calcular_pronostico(hoy, semanas):
+    fin = hoy + timedelta(weeks=semanas)
+    sumas = {
+        f's{i}': _suma(Q(
+            fecha_vencimiento__gte=hoy + timedelta(weeks=i), fecha_vencimiento__lt=hoy + timedelta(weeks=i + 1),
+        ))
+        for i in range(semanas)
+    }
+    fila = _abiertas().aggregate(
+        vencido=_suma(Q(fecha_vencimiento__lt=hoy)),
+        posterior=_suma(Q(fecha_vencimiento__gte=fin)),
+        sin_fecha=_suma(Q(fecha_vencimiento__isnull=True)),
+        **sumas,
+    )
+    acumulado = Decimal('0')
+    lista = []
+    for i in range(semanas):
+        acumulado += fila[f's{i}']
+        inicio = hoy + timedelta(weeks=i)
+        lista.append({
+            'semana': i + 1, 'inicio': inicio, 'fin': inicio + timedelta(days=6),
+            'monto': fila[f's{i}'], 'acumulado': acumulado,
+        })
+    return {
+        'hoy': hoy, 'semanas': lista, 'vencido': fila['vencido'],
+        'posterior': fila['posterior'], 'sin_fecha': fila['sin_fecha'], 'total_semanas': acumulado,
+    }
+
+
+def pronostico(hoy=None, semanas=SEMANAS):
+    """
+    Cobranza esperada por semana (desde hoy) según fecha_vencimiento.
+
+    Uso:
+        flujo = pronostico()
+        for s in flujo['semanas']: s['inicio'], s['monto'], s['acumulado']
+
+    Lo vencido no se reparte en las semanas: se reporta aparte (`vencido`),
+    igual que lo que vence después (`posterior`) y lo que no tiene fecha.
+
+    Returns:
+        dict con `hoy`, `semanas`, `vencido`, `posterior`, `sin_fecha` y `total_semanas`.
+    """
+    hoy = hoy or timezone.localdate()
+    return _en_cache(f'pronostico{semanas}', hoy, lambda: _calcular_pronostico(hoy, semanas))
+
+
+def invalidar():
+    """Desde las señales de CuentaPorCobrar y Pago."""
+    CARTERA.invalidar('cuentas')
@@ -1,52 +1,96 @@
 from django.utils import timezone
+from django.utils.functional import SimpleLazyObject, cached_property
 from datetime import timedelta
 from django.db.models import Q
-from .models import Tarea, Evento, CuentaPorCobrar, Cliente
+from .acceso import alcance_de
+from .cache import NOTIFICACIONES
+from .models import Tarea, Evento, CuentaPorCobrar, Usuario
+
+# Partes de la ruta que cambian el resaltado del menú lateral de base.html.
+# El fragmento del menú se guarda por sección: si se agrega un {% if ... in request.path %} al menú, va aquí también.
+SECCIONES_MENU = ('agenda', 'vencimientos', 'cotizaciones', 'finanzas', 'herramientas/disenador', 'herramientas/qr')
+
+
+def seccion_menu(path):
+    if path == '/':
+        return 'inicio'
+    return '|'.join(m for m in SECCIONES_MENU if m in path)
+
+
+class Avisos:
+    """
+    Recordatorios de la campana. Las consultas corren solo si la plantilla los
+    usa: con el fragmento en caché ({% cache_usuario %}) no se toca la BD.
+    """
+
+    def __init__(self, usuario):
+        self.usuario = usuario
+        self.hoy = timezone.now().date()
+
+    @cached_property
+    def tareas(self):
+        # A. Tareas Vencidas o de Hoy
+        return list(Tarea.objects.filter(
+            alcance_de(self.usuario).filtro(),
+            completada=False,
+            fecha_limite__lte=self.hoy
+        ).select_related('cliente').order_by('fecha_limite'))
+
+    @cached_property
+    def eventos(self):
+        # B. Eventos (Hoy y Mañana)
+        mañana = self.hoy + timedelta(days=1)
+        return list(Evento.objects.filter(
+            inicio__date__range=[self.hoy, mañana]
+        ).filter(
+            Q(usuario=self.usuario) | alcance_de(self.usuario).filtro()
+        ).select_related('cliente').order_by('inicio'))
+
+    @cached_property
+    def cobros(self):
+        # C. Cobranza (Próximos 3 días) - Solo si tiene permiso
+        alcance = alcance_de(self.usuario)
+        if not alcance.puede('access_finanzas'):
+            return []
+        return list(CuentaPorCobrar.objects.filter(
+            alcance.filtro(),
+            estado__in=['pendiente', 'parcial'],
+            fecha_vencimiento__lte=self.hoy + timedelta(days=3)
+        ).select_related('cliente'))
+
+    @cached_property
+    def total(self):
+        # Conteo Total para el "Globito Rojo"
+        return len(self.tareas) + len(self.eventos) + len(self.cobros)
+
 
 def notificaciones_globales(request):
     if not request.user.is_authenticated:
         return {}
 
-    hoy = timezone.now().date()
-    
-    # 1. Definir qué clientes puede ver este usuario
-    if request.user.rol == 'admin':
-        mis_clientes = Cliente.objects.all()
-    else:
-        mis_clientes = request.user.clientes_asignados.all()
-
-    # 2. Buscar Recordatorios
-    
-    # A. Tareas Vencidas o de Hoy
-    tareas = Tarea.objects.filter(
-        cliente__in=mis_clientes, 
-        completada=False, 
-        fecha_limite__lte=hoy
-    ).select_related('cliente').order_by('fecha_limite')
-
-    # B. Eventos (Hoy y Mañana)
-    mañana = hoy + timedelta(days=1)
-    eventos = Evento.objects.filter(
-        inicio__date__range=[hoy, mañana]
-    ).filter(
-        Q(usuario=request.user) | Q(cliente__in=mis_clientes)
-    ).select_related('cliente').order_by('inicio')
-
-    # C. Cobranza (Próximos 3 días) - Solo si tiene permiso
-    cobros = []
-    if request.user.rol == 'admin' or request.user.access_finanzas:
-        cobros = CuentaPorCobrar.objects.filter(
-            cliente__in=mis_clientes, 
-            estado__in=['pendiente', 'parcial'],
-            fecha_vencimiento__lte=hoy + timedelta(days=3)
-        ).select_related('cliente')
+    avisos = Avisos(request.user)
+    return {
+        'notif_tareas': SimpleLazyObject(lambda: avisos.tareas),
+        'notif_eventos': SimpleLazyObject(lambda: avisos.eventos),
+        'notif_cobros': SimpleLazyObject(lambda: avisos.cobros),
+        'total_notif': SimpleLazyObject(lambda: avisos.total),
+        'seccion_menu': seccion_menu(request.path),
+    }
 
-    # Conteo Total para el "Globito Rojo"
-    total_notif = tareas.count() + eventos.count() + len(cobros)
 
-    return {
-        'notif_tareas': tareas,
-        'notif_eventos': eventos,
-        'notif_cobros': cobros,
-        'total_notif': total_notif
-    }
\ No newline at end of file
+# ------------------------------------------
+# Invalidación (desde las señales de models.py)
+# ------------------------------------------
+def invalidar_avisos(*usuarios):
+    """Cambia la versión de los fragmentos de base.html de los usuarios dados (instancias o ids)."""
+    NOTIFICACIONES.invalidar(*{getattr(u, 'pk', u) for u in usuarios if u is not None})
+
+
+def invalidar_avisos_cliente(cliente_id, *usuarios):
+    """Invalida a quienes ven al cliente (admins y abogados asignados) más los usuarios dados."""
+    ids = set(usuarios)
+    if cliente_id is not None:
+        ids.update(Usuario.objects.filter(
+            Q(rol='admin') | Q(clientes_asignados=cliente_id)
+        ).values_list('pk', flat=True))
+    invalidar_avisos(*ids)
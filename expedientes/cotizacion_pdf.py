@@ -0,0 +1,370 @@
+# ==========================================
+# EXPEDIENTES/COTIZACION_PDF.PY - VERSIONES Y PDF DE COTIZACIONES
+# ==========================================
+"""
+Los totales de una Cotizacion se editan en su lugar; lo que se le mandó al
+prospecto queda en VersionCotizacion:
+
+    - Cada envío (correo o conversión a cliente) llama a congelar(): toma la
+      instantánea de partidas y totales, y si su huella es nueva renderiza el
+      PDF una vez y lo guarda en el storage.
+    - Descargas, reenvíos y la conversión buscan la versión por huella y
+      leen el archivo guardado; solo un borrador nunca enviado se renderiza.
+
+El enlace público (/cotizacion/<folio>/) muestra al prospecto la última
+versión enviada. Su HTML se arma con la instantánea y se guarda en la caché
+por folio (publica()); el PDF es el archivo de la versión. Reabrir el enlace
+no renderiza ni consulta la base de datos.
+
+La conversión a cliente además hace la parte de base de datos en una
+transacción corta; el PDF final se genera después del commit en el pool de
+tareas y el Documento aparece en la carpeta "Cotizaciones" del cliente cuando
+está listo (adjuntar_pdf_final).
+
+La exportación masiva (pdfs_de_cotizaciones) toma el PDF de la versión o de
+la caché de PDFs cuando existe y renderiza el resto en el pool de procesos.
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import time
+from decimal import Decimal
+
+from asgiref.sync import sync_to_async
+from django.core.files.base import ContentFile
+from django.db import IntegrityError, transaction
+from django.db.models import Max, Prefetch
+from django.template.loader import render_to_string
+from django.urls import reverse
+from django.utils.text import slugify
+
+from . import admision, pdf
+from .asincrono import en_hilo
+from .cache import PDFS, PUBLICAS
+from .utils import clave_pdf, pdf_desde_html
+
+logger = logging.getLogger(__name__)
+
+PLANTILLA = 'cotizaciones/pdf_template.html'
+PLANTILLA_PUBLICA = 'externo/cotizacion_publica.html'
+CARPETA = "Cotizaciones"
+# Intentos si el control de admisión rechaza el render por saturación
+REINTENTOS = 3
+# Cotizaciones que la exportación masiva carga (y tiene en memoria) a la vez
+LOTE_EXPORTACION = 20
+
+
+def con_partidas():
+    """Cotizaciones con sus partidas en orden estable (la instantánea y el PDF las recorren igual)."""
+    from .models import Cotizacion, ItemCotizacion
+
+    return Cotizacion.objects.select_related('cliente_convertido').prefetch_related(
+        Prefetch('items', queryset=ItemCotizacion.objects.select_related('servicio').order_by('id'))
+    )
+
+
+# ------------------------------------------
+# Instantánea y huella
+# ------------------------------------------
+def _monto(valor):
+    # Los totales en memoria tras calcular_totales() traen más decimales que los guardados
+    return str(Decimal(valor or 0).quantize(Decimal('0.01')))
+
+
+def instantanea(c):
+    """Todo lo que la plantilla del PDF muestra de la cotización, en tipos JSON."""
+    return {
+        'id': c.id,
+        'titulo': c.titulo or '',
+        'fecha_creacion': c.fecha_creacion.isoformat() if c.fecha_creacion else None,
+        'prospecto': {
+            'empresa': c.prospecto_empresa or '', 'nombre': c.prospecto_nombre or '', 'email': c.prospecto_email or '',
+            'telefono': c.prospecto_telefono or '', 'direccion': c.prospecto_direccion or '', 'cargo': c.prospecto_cargo or '',
+        },
+        'items': [
+            {
+                'servicio': i.servicio.nombre,
+                'descripcion': i.descripcion_personalizada or i.servicio.descripcion or '',
+                'cantidad': i.cantidad,
+                'precio_unitario': _monto(i.precio_unitario),
+                'subtotal': _monto(i.subtotal),
+            }
+            for i in c.items.all()
+        ],
+        'porcentaje_descuento': _monto(c.porcentaje_descuento),
+        'descuento': _monto(c.descuento),
+        'subtotal': _monto(c.subtotal),
+        'aplica_iva': c.aplica_iva,
+        'porcentaje_iva': _monto(c.porcentaje_iva),
+        'monto_iva': _monto(c.monto_iva),
+        'total': _monto(c.total),
+        'total_con_iva': _monto(c.total_con_iva),
+        'condiciones_pago': c.condiciones_pago,
+        'tiempo_entrega': c.tiempo_entrega,
+        'validez_hasta': c.validez_hasta.isoformat() if c.validez_hasta else None,
+    }
+
+
+def huella(datos):
+    return hashlib.sha256(json.dumps(datos, sort_keys=True, separators=(',', ':')).encode()).hexdigest()
+
+
+# ------------------------------------------
+# Versiones
+# ------------------------------------------
+def _renderizar(cotizacion, base_url):
+    html_string = render_to_string(PLANTILLA, {'c': cotizacion, 'base_url': base_url})
+    for intento in range(1, REINTENTOS + 1):
+        try:
+            return pdf_desde_html(html_string, base_url, PLANTILLA)
+        except admision.Saturado as e:
+            # En segundo plano no hay nadie esperando: se espera al relleno en lugar de perder el PDF
+            if intento == REINTENTOS:
+                raise
+            time.sleep(e.reintentar or 5)
+
+
+def version_actual(c):
+    """La versión ya enviada que coincide con el estado actual de la cotización, o None."""
+    return c.versiones.filter(huella=huella(instantanea(c))).first()
+
+
+def congelar(c, base_url, usuario_id=None):
+    """
+    Versión de la cotización en su estado actual, creándola si hace falta.
+
+    Uso:
+        version = congelar(get_object_or_404(con_partidas(), id=cotizacion_id), base_url, request.user.id)
+        email.attach(f"Cotizacion_{c.id}.pdf", leer_pdf(version), 'application/pdf')
+
+    Si nada cambió desde el último envío devuelve esa versión sin renderizar.
+    El PDF se renderiza y se sube antes de insertar la fila: no hay transacción
+    abierta mientras tanto.
+
+    Returns:
+        VersionCotizacion.
+    """
+    from .models import VersionCotizacion
+
+    datos = instantanea(c)
+    firma = huella(datos)
+    existente = c.versiones.filter(huella=firma).first()
+    if existente:
+        return existente
+
+    version = VersionCotizacion(cotizacion=c, huella=firma, datos=datos, creada_por_id=usuario_id)
+    version.pdf.save(f"Cotizacion_{c.id}_{firma[:12]}.pdf", ContentFile(_renderizar(c, base_url)), save=False)
+    for _ in range(REINTENTOS):
+        version.numero = (c.versiones.aggregate(ultimo=Max('numero'))['ultimo'] or 0) + 1
+        try:
+            with transaction.atomic():
+                version.save()
+            logger.info(f"Cotización {c.id}: versión {version.numero} guardada")
+            return version
+        except IntegrityError:
+            # Otro envío simultáneo ganó: con la misma huella se usa la suya; si no, se reintenta el número
+            otra = c.versiones.filter(huella=firma).first()
+            if otra:
+                version.pdf.delete(save=False)
+                return otra
+    version.pdf.delete(save=False)
+    raise IntegrityError(f"No se pudo numerar la versión de la cotización {c.id}")
+
+
+def leer_pdf(version):
+    with version.pdf.open('rb') as f:
+        return f.read()
+
+
+# ------------------------------------------
+# Enlace público
+# ------------------------------------------
+def _pagina_publica(version):
+    from .models import Cotizacion
+
+    datos = version.datos
+    creada = datos['fecha_creacion'][:4] if datos['fecha_creacion'] else version.fecha.year
+    return render_to_string(PLANTILLA_PUBLICA, {
+        'd': datos,
+        'version': version,
+        'folio': f"GC-COT-{datos['id']:03d}-{creada}",
+        'condiciones_pago': dict(Cotizacion.OPCIONES_PAGO).get(datos['condiciones_pago'], datos['condiciones_pago']),
+        'tiempo_entrega': dict(Cotizacion.OPCIONES_TIEMPO).get(datos['tiempo_entrega'], datos['tiempo_entrega']),
+        'url_pdf': reverse('cotizacion_publica_pdf', args=[version.cotizacion.folio]),
+    })
+
+
+def publica(folio):
+    """
+    Lo que sirve el enlace público de una cotización: su última versión enviada.
+
+    Uso:
+        entrada = publica(folio)
+        if entrada is None: raise Http404
+        etag = quote_etag(entrada['etag_html'])
+
+    Se guarda en PUBLICAS con el folio como ámbito; una versión nueva cambia
+    el ámbito (señal invalidar_cotizacion_publica) y la siguiente visita la
+    arma de nuevo. Un folio sin versiones (borrador nunca enviado) no se guarda.
+
+    Returns:
+        dict con html, etag_html, pdf (nombre en el storage), etag_pdf y
+        nombre_pdf; None si no hay versión enviada.
+    """
+    from .models import VersionCotizacion
+
+    clave = PUBLICAS.clave(folio, PUBLICAS.version(folio))
+    entrada = PUBLICAS.leer(clave)
+    if entrada is not None:
+        return entrada
+
+    version = VersionCotizacion.objects.select_related('cotizacion').filter(cotizacion__folio=folio).first()
+    if version is None:
+        return None
+    html = _pagina_publica(version)
+    entrada = {
+        'html': html,
+        # El HTML también depende de la plantilla: su hash y no la huella, para que un cambio de diseño no dé 304
+        'etag_html': hashlib.sha256(html.encode()).hexdigest()[:32],
+        'pdf': version.pdf.name,
+        'etag_pdf': version.huella[:32],
+        'nombre_pdf': f"Cotizacion_{version.cotizacion_id}.pdf",
+    }
+    PUBLICAS.guardar(clave, entrada)
+    return entrada
+
+
+def abrir_pdf_publico(entrada):
+    from .models import VersionCotizacion
+
+    return VersionCotizacion._meta.get_field('pdf').storage.open(entrada['pdf'], 'rb')
+
+
+# ------------------------------------------
+# Conversión a cliente
+# ------------------------------------------
+def nombre_pdf_final(cotizacion):
+    nombre_safe = slugify(cotizacion.titulo or f"v1_{cotizacion.id}").replace("-", "_")
+    return f"Cotizacion_{cotizacion.id}_{nombre_safe}_FINAL.pdf"
+
+
+def adjuntar_pdf_final(cotizacion_id, usuario_id, base_url):
+    """
+    Congela la versión aceptada de una cotización convertida y guarda su PDF
+    como Documento del cliente, en su carpeta "Cotizaciones".
+
+    Uso:
+        transaction.on_commit(lambda: encolar(adjuntar_pdf_final, c.id, request.user.id, base_url))
+
+    Es idempotente: si la carpeta ya tiene el documento no hace nada.
+
+    Returns:
+        El Documento creado, o None si no hizo falta.
+    """
+    from .models import Carpeta, Documento
+
+    c = con_partidas().filter(id=cotizacion_id).first()
+    if c is None or c.cliente_convertido is None:
+        logger.warning(f"Cotización {cotizacion_id} sin cliente convertido: no se genera el PDF final")
+        return None
+    cliente = c.cliente_convertido
+
+    carpeta, _ = Carpeta.objects.get_or_create(nombre=CARPETA, cliente=cliente, defaults={'es_expediente': False})
+    nombre_archivo = nombre_pdf_final(c)
+    if Documento.objects.filter(carpeta=carpeta, nombre_archivo=nombre_archivo).exists():
+        return None
+
+    # Si se aceptó tal como se envió, es el mismo archivo de la versión enviada
+    contenido = leer_pdf(congelar(c, base_url, usuario_id))
+
+    # Primero el storage (lento) y después un INSERT en autocommit
+    documento = Documento(cliente=cliente, carpeta=carpeta, nombre_archivo=nombre_archivo, subido_por_id=usuario_id)
+    documento.archivo.save(nombre_archivo, ContentFile(contenido), save=False)
+    documento.save()
+    logger.info(f"PDF final de la cotización {c.id} guardado en el drive de {cliente.nombre_empresa}")
+    return documento
+
+
+# ------------------------------------------
+# Exportación masiva
+# ------------------------------------------
+def nombre_pdf(cotizacion):
+    nombre_safe = slugify(cotizacion.titulo or '').replace("-", "_")[:60]
+    return f"Cotizacion_{cotizacion.id:04d}{'_' + nombre_safe if nombre_safe else ''}.pdf"
+
+
+def _preparar_lote(ids, base_url):
+    """
+    Carga un lote y separa lo que ya existe de lo que hay que renderizar.
+
+    Returns:
+        (listos, pendientes): [(nombre, bytes)] y [(nombre, clave_cache, futuro)].
+    """
+    listos, pendientes = [], []
+    for c in con_partidas().prefetch_related('versiones').filter(id__in=ids).order_by('id'):
+        nombre = nombre_pdf(c)
+        # Enviada y sin cambios: el archivo de esa versión (las versiones ya vienen en el prefetch)
+        firma = huella(instantanea(c))
+        version = next((v for v in c.versiones.all() if v.huella == firma), None)
+        if version:
+            listos.append((nombre, leer_pdf(version)))
+            continue
+        html_string = render_to_string(PLANTILLA, {'c': c, 'base_url': base_url})
+        clave = clave_pdf(html_string, base_url, PLANTILLA)
+        contenido = PDFS.leer(clave)
+        if contenido is not None:
+            listos.append((nombre, contenido))
+        else:
+            pendientes.append((nombre, clave, pdf.renderizar_en_proceso(html_string, base_url, PLANTILLA)))
+    return listos, pendientes
+
+
+async def _esperar_render(nombre, clave, futuro):
+    try:
+        # El timeout lo aplica el hijo desde que empieza el render: esperar en la cola no cuenta
+        contenido = await asyncio.wrap_future(futuro)
+    except Exception as e:
+        logger.error(f"Exportación de cotizaciones: no se pudo renderizar {nombre}: {e!r}")
+        return nombre, None
+    # Queda en la caché de PDFs: la próxima descarga o exportación no lo vuelve a renderizar
+    await en_hilo(PDFS.guardar)(clave, contenido)
+    return nombre, contenido
+
+
+async def pdfs_de_cotizaciones(ids, base_url):
+    """
+    PDFs de las cotizaciones dadas, en el orden en que quedan listos.
+
+    Uso:
+        return respuesta_zip('cotizaciones', pdfs_de_cotizaciones(ids, request.build_absolute_uri('/')))
+
+    Por lote (LOTE_EXPORTACION): primero los que ya existen (versión enviada
+    o caché de PDFs) y luego los renderizados en el pool de procesos
+    (pdf.renderizar_en_proceso) conforme terminan. Un render que falla o pasa
+    del timeout de settings.ADMISION['pdf'] (contado desde que un proceso lo
+    toma, no desde que se encoló) no corta la descarga: se anota en
+    ERRORES.txt al final del ZIP.
+
+    Yields:
+        (nombre_en_zip, bytes)
+    """
+    fallidos = []
+    for inicio in range(0, len(ids), LOTE_EXPORTACION):
+        listos, pendientes = await sync_to_async(_preparar_lote)(ids[inicio:inicio + LOTE_EXPORTACION], base_url)
+        try:
+            for nombre, contenido in listos:
+                yield nombre, contenido
+            for tarea in asyncio.as_completed([_esperar_render(*p) for p in pendientes]):
+                nombre, contenido = await tarea
+                if contenido is None:
+                    fallidos.append(nombre)
+                else:
+                    yield nombre, contenido
+        finally:
+            # Si el navegador cortó la descarga, lo que aún no empezó ya no se renderiza
+            for *_, futuro in pendientes:
+                futuro.cancel()
+    if fallidos:
+        yield 'ERRORES.txt', ("No se pudieron generar:\n" + "\n".join(fallidos) + "\n").encode()
+
@@ -0,0 +1,266 @@
+# ==========================================
+# EXPEDIENTES/ESTADOS_CUENTA.PY - ESTADOS DE CUENTA MENSUALES EN LOTE
+# ==========================================
+"""
+Un PDF por cliente con lo que se le cargó y lo que pagó en el mes, más sus
+saldos inicial y final, guardado en su drive (carpeta "Estados de cuenta").
+
+    - Saldos por cliente: una sola consulta agregada (resumen()), con
+      subconsultas por columna para que los JOIN de cuentas y pagos no
+      multipliquen las sumas.
+    - Renglones (cargos y pagos del mes): dos consultas por tanda de clientes.
+    - El HTML se arma en el proceso y el PDF en el pool de procesos de pdf.py.
+
+La corrida es reanudable: LoteEstadosCuenta tiene un EstadoCuenta por
+cliente y solo se procesan los que aún no tienen documento. Si el proceso
+muere a la mitad, encolar otra vez el lote (o el comando
+`generar_estados_cuenta`) sigue donde se quedó.
+"""
+import logging
+from collections import defaultdict
+import time as reloj
+from concurrent.futures import FIRST_COMPLETED, wait
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+
+from django.core.files.base import ContentFile
+from django.db import transaction
+from django.db.models import DecimalField, F, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from django.template.loader import render_to_string
+from django.utils import timezone
+
+from . import admision, pdf
+
+logger = logging.getLogger(__name__)
+
+PLANTILLA = 'finanzas/estado_cuenta_pdf.html'
+CARPETA = "Estados de cuenta"
+# Clientes que se cargan y renderizan por tanda
+TANDA = 20
+# Cada cuánto anota la corrida que sigue viva, también a media tanda: una tanda
+# puede tardar hasta TANDA * timeout de render, mucho más que SIN_LATIDO
+LATIDO = timedelta(minutes=1)
+# Una corrida "en_curso" sin latido en este tiempo se considera caída
+SIN_LATIDO = timedelta(minutes=10)
+
+MESES = (
+    'Enero', 'Febrero', 'Marzo', 'Abril', 'Mayo', 'Junio',
+    'Julio', 'Agosto', 'Septiembre', 'Octubre', 'Noviembre', 'Diciembre',
+)
+
+
+def periodo_de(texto):
+    """'2026-09' -> date(2026, 9, 1); None si no es un mes válido."""
+    try:
+        anio, mes = (int(p) for p in (texto or '').split('-')[:2])
+        return date(anio, mes, 1)
+    except ValueError:
+        return None
+
+
+def mes_cerrado(periodo):
+    """True si el mes ya terminó. Un lote del mes en curso quedaría 'terminado' sin los movimientos que faltan."""
+    return periodo < timezone.localdate().replace(day=1)
+
+
+def _limites(periodo):
+    """(inicio, fin) del mes como fechas y como datetimes locales (fin exclusivo)."""
+    fin = (periodo + timedelta(days=32)).replace(day=1)
+    zona = timezone.get_current_timezone()
+    return periodo, fin, datetime.combine(periodo, time.min, zona), datetime.combine(fin, time.min, zona)
+
+
+def nombre_pdf(periodo):
+    return f"Estado_de_cuenta_{periodo:%Y_%m}.pdf"
+
+
+# ------------------------------------------
+# Consultas
+# ------------------------------------------
+def _suma(qs, agrupar, campo):
+    return Coalesce(
+        Subquery(qs.order_by().values(agrupar).annotate(total=Sum(campo)).values('total')),
+        Value(Decimal('0')),
+        output_field=DecimalField(max_digits=14, decimal_places=2),
+    )
+
+
+def resumen(periodo, clientes=None):
+    """
+    Saldos del mes por cliente en una consulta.
+
+    Uso:
+        for fila in resumen(date(2026, 9, 1)):
+            fila['saldo_final']
+
+    Args:
+        periodo:  Primer día del mes.
+        clientes: Ids a los que acotar (None = todos los que tienen movimiento o saldo).
+
+    Returns:
+        QuerySet de dicts: id, nombre_empresa, nombre_contacto, email, saldo_inicial,
+        cargos, pagos, saldo_final.
+    """
+    from .models import Cliente, CuentaPorCobrar, Pago
+
+    inicio, fin, inicio_dt, fin_dt = _limites(periodo)
+    cuentas = CuentaPorCobrar.objects.filter(cliente=OuterRef('pk'))
+    pagos = Pago.objects.filter(cuenta__cliente=OuterRef('pk'))
+
+    qs = Cliente.objects.annotate(
+        cargos_previos=_suma(cuentas.filter(fecha_emision__lt=inicio_dt), 'cliente', 'monto_total'),
+        pagos_previos=_suma(pagos.filter(fecha_pago__lt=inicio), 'cuenta__cliente', 'monto'),
+        cargos=_suma(cuentas.filter(fecha_emision__gte=inicio_dt, fecha_emision__lt=fin_dt), 'cliente', 'monto_total'),
+        pagos=_suma(pagos.filter(fecha_pago__gte=inicio, fecha_pago__lt=fin), 'cuenta__cliente', 'monto'),
+    ).annotate(
+        saldo_inicial=F('cargos_previos') - F('pagos_previos'),
+        saldo_final=F('cargos_previos') - F('pagos_previos') + F('cargos') - F('pagos'),
+    )
+    if clientes is not None:
+        qs = qs.filter(id__in=clientes)
+    else:
+        qs = qs.filter(Q(cargos__gt=0) | Q(pagos__gt=0) | ~Q(saldo_final=0))
+    return qs.order_by('nombre_empresa').values(
+        'id', 'nombre_empresa', 'nombre_contacto', 'email', 'saldo_inicial', 'cargos', 'pagos', 'saldo_final',
+    )
+
+
+def _movimientos(periodo, clientes):
+    """Cargos y pagos del mes de los clientes dados, agrupados por cliente (dos consultas)."""
+    from .models import CuentaPorCobrar, Pago
+
+    inicio, fin, inicio_dt, fin_dt = _limites(periodo)
+    metodos = dict(Pago.METODOS)
+    cargos, pagos = defaultdict(list), defaultdict(list)
+    for fila in CuentaPorCobrar.objects.filter(
+        cliente_id__in=clientes, fecha_emision__gte=inicio_dt, fecha_emision__lt=fin_dt,
+    ).order_by('fecha_emision', 'id').values('cliente_id', 'id', 'concepto', 'fecha_emision', 'fecha_vencimiento', 'monto_total', 'saldo_pendiente'):
+        cargos[fila['cliente_id']].append(fila)
+    for fila in Pago.objects.filter(
+        cuenta__cliente_id__in=clientes, fecha_pago__gte=inicio, fecha_pago__lt=fin,
+    ).order_by('fecha_pago', 'id').values('cuenta__cliente_id', 'id', 'fecha_pago', 'monto', 'metodo', 'referencia', 'cuenta__concepto'):
+        fila['metodo'] = metodos.get(fila['metodo'], fila['metodo'])
+        pagos[fila['cuenta__cliente_id']].append(fila)
+    return cargos, pagos
+
+
+# ------------------------------------------
+# Lote
+# ------------------------------------------
+def _tomar(lote_id):
+    """Marca el lote en curso si nadie más lo está corriendo. True si se obtuvo."""
+    from .models import LoteEstadosCuenta
+
+    ahora = timezone.now()
+    return bool(LoteEstadosCuenta.objects.filter(id=lote_id).filter(
+        ~Q(estado='en_curso') | Q(actualizado__lt=ahora - SIN_LATIDO)
+    ).update(estado='en_curso', actualizado=ahora, fecha_fin=None))
+
+
+def _guardar(estado, periodo, contenido, carpetas, usuario_id):
+    from .models import Carpeta, Documento
+
+    cliente_id = estado.cliente_id
+    if cliente_id not in carpetas:
+        carpetas[cliente_id], _ = Carpeta.objects.get_or_create(
+            nombre=CARPETA, cliente_id=cliente_id, defaults={'es_expediente': False},
+        )
+    nombre = nombre_pdf(periodo)
+    documento = Documento(cliente_id=cliente_id, carpeta=carpetas[cliente_id], nombre_archivo=nombre, subido_por_id=usuario_id)
+    documento.archivo.save(nombre, ContentFile(contenido), save=False)
+    # Documento y renglón juntos: no queda un PDF en el drive que el lote no tenga anotado.
+    # No se reutilizan documentos por nombre: uno con ese nombre puede no ser de este lote.
+    with transaction.atomic():
+        documento.save()
+        estado.documento, estado.error, estado.fecha = documento, '', timezone.now()
+        estado.save(update_fields=['documento', 'error', 'fecha'])
+
+
+def _tanda(lote, estados, base_url, carpetas):
+    """Renderiza y guarda una tanda. Devuelve cuántos fallaron."""
+    clientes = [e.cliente_id for e in estados]
+    saldos = {fila['id']: fila for fila in resumen(lote.periodo, clientes)}
+    cargos, pagos = _movimientos(lote.periodo, clientes)
+    limite = admision.limites('pdf')['timeout']
+
+    futuros = {}
+    for estado in estados:
+        html = render_to_string(PLANTILLA, {
+            'cliente': saldos[estado.cliente_id],
+            'cargos': cargos[estado.cliente_id],
+            'pagos': pagos[estado.cliente_id],
+            'periodo': lote.periodo,
+            'mes': f"{MESES[lote.periodo.month - 1]} {lote.periodo.year}",
+            'fecha_emision': timezone.now(),
+            'base_url': base_url,
+        })
+        futuros[pdf.renderizar_en_proceso(html, base_url, PLANTILLA)] = estado
+
+    fallidos = 0
+    fin = reloj.monotonic() + limite * len(futuros)
+    pendientes = set(futuros)
+    while pendientes:
+        espera = min(LATIDO.total_seconds(), max(fin - reloj.monotonic(), 0))
+        listos, pendientes = wait(pendientes, timeout=espera, return_when=FIRST_COMPLETED)
+        lote.save(update_fields=['actualizado'])  # Latido
+        for futuro in listos:
+            estado = futuros[futuro]
+            try:
+                _guardar(estado, lote.periodo, futuro.result(), carpetas, lote.creado_por_id)
+            except Exception as e:
+                fallidos += 1
+                logger.error(f"Estado de cuenta {lote.periodo:%Y-%m} de {estado.cliente_id}: {e!r}")
+                estado.error, estado.fecha = repr(e)[:500], timezone.now()
+                estado.save(update_fields=['error', 'fecha'])
+        if pendientes and reloj.monotonic() >= fin:
+            for futuro in pendientes:
+                futuro.cancel()
+                estado = futuros[futuro]
+                estado.error, estado.fecha = "El render pasó del tiempo máximo", timezone.now()
+                estado.save(update_fields=['error', 'fecha'])
+            fallidos += len(pendientes)
+            break
+    return fallidos
+
+
+def generar_lote(lote_id, base_url):
+    """
+    Genera (o reanuda) los estados de cuenta de un lote.
+
+    Uso:
+        encolar(generar_lote, lote.id, request.build_absolute_uri('/'))
+
+    La primera corrida crea un EstadoCuenta por cliente con movimiento o saldo
+    en el mes. Cada corrida procesa los que no tienen documento, por tandas
+    de TANDA clientes; los que fallan quedan con su error para la siguiente.
+
+    Returns:
+        (generados, fallidos), o None si el lote ya estaba corriendo en otro lado.
+    """
+    from .models import EstadoCuenta, LoteEstadosCuenta
+
+    if not _tomar(lote_id):
+        logger.warning(f"Lote de estados de cuenta {lote_id} ya está en curso")
+        return None
+    lote = LoteEstadosCuenta.objects.get(id=lote_id)
+    try:
+        if not lote.estados.exists():
+            EstadoCuenta.objects.bulk_create(
+                [EstadoCuenta(lote=lote, cliente_id=fila['id']) for fila in resumen(lote.periodo)],
+                ignore_conflicts=True,
+            )
+
+        pendientes = list(lote.estados.filter(documento__isnull=True).order_by('id'))
+        carpetas, fallidos = {}, 0
+        for i in range(0, len(pendientes), TANDA):
+            fallidos += _tanda(lote, pendientes[i:i + TANDA], base_url, carpetas)
+
+        lote.estado = 'con_errores' if fallidos else 'terminado'
+        lote.fecha_fin = timezone.now()
+        lote.save(update_fields=['estado', 'fecha_fin', 'actualizado'])
+        logger.info(f"{lote}: {len(pendientes) - fallidos} generados, {fallidos} con error")
+        return len(pendientes) - fallidos, fallidos
+    except Exception:
+        LoteEstadosCuenta.objects.filter(id=lote_id).update(estado='con_errores', fecha_fin=timezone.now())
+        raise
@@ -0,0 +1,244 @@
+# ==========================================
+# EXPEDIENTES/EXPORTACIONES.PY - DESCARGAS CSV / XLSX / ZIP EN STREAMING
+# ==========================================
+"""
+Descargas tabulares que no cargan la consulta completa en memoria:
+
+    - Filas(qs.values_list(...)) recorre el QuerySet por lotes de TAMANO_LOTE
+      (`.iterator(chunk_size=...)`), con una conversión opcional por fila.
+    - CSV: se emite desde un generador async, así que bajo ASGI cada lote sale en
+      cuanto se lee. (Con un generador síncrono Django junta toda la respuesta
+      con `list()` antes de enviar el primer byte.)
+    - XLSX: openpyxl en modo write-only vuelca las filas a disco conforme se
+      agregan; el libro terminado se envía por trozos desde el archivo temporal.
+
+Uso típico:
+    filas = Filas(qs.order_by('id').values_list('cliente__nombre_empresa', 'monto'))
+    return respuesta_exportacion(request.GET.get('formato'), 'pagos', ['Cliente', 'Monto'], filas)
+"""
+import csv
+import io
+import tempfile
+import zipfile
+from datetime import date, datetime
+from itertools import islice
+
+from asgiref.sync import sync_to_async
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from django.utils.http import content_disposition_header
+
+from .asincrono import trozos
+
+FORMATOS = ('csv', 'xlsx')
+TAMANO_LOTE = 2000
+# El CSV se envía en bloques de este tamaño (caracteres), no línea por línea
+TAMANO_BLOQUE = 64 * 1024
+
+
+class Filas:
+    """
+    Filas de un QuerySet para exportar, leídas por lotes de TAMANO_LOTE.
+
+    Uso:
+        Filas(qs.values_list('nombre_archivo', 'fecha_vencimiento'))
+        Filas(qs.values_list('estado', 'monto'), lambda estado, monto: (ESTADOS[estado], monto))
+
+    Args:
+        qs:        QuerySet ya ordenado, normalmente un values_list.
+        convertir: Función opcional que recibe las columnas de una fila y devuelve la tupla a escribir.
+
+    Se recorre en sync (al escribir el XLSX) o en async (al emitir el CSV); en
+    memoria solo queda el lote en curso.
+    """
+
+    def __init__(self, qs, convertir=None):
+        self.qs = qs
+        self.convertir = convertir
+
+    def __iter__(self):
+        for fila in self.qs.iterator(chunk_size=TAMANO_LOTE):
+            yield self.convertir(*fila) if self.convertir else fila
+
+    async def __aiter__(self):
+        # No QuerySet.aiterator(): con values_list arma el iterador (y consulta) dentro del event loop.
+        # Este generador no toca la base hasta el primer lote, que ya corre en el hilo de la petición.
+        filas = iter(self)
+        siguiente = sync_to_async(lambda: list(islice(filas, TAMANO_LOTE)))
+        while lote := await siguiente():
+            for fila in lote:
+                yield fila
+
+
+async def _en_async(filas):
+    # Las listas (reportes ya calculados) se recorren en el event loop; las consultas deben venir en Filas
+    if hasattr(filas, '__aiter__'):
+        async for fila in filas:
+            yield fila
+    else:
+        for fila in filas:
+            yield fila
+
+
+class _Eco:
+    """Pseudo-archivo para csv.writer: devuelve la línea en vez de escribirla."""
+
+    def write(self, valor):
+        return valor
+
+
+def _celda(valor):
+    if isinstance(valor, datetime):
+        return timezone.localtime(valor).strftime('%d/%m/%Y %H:%M') if timezone.is_aware(valor) else valor.strftime('%d/%m/%Y %H:%M')
+    if isinstance(valor, date):
+        return valor.strftime('%d/%m/%Y')
+    return '' if valor is None else valor
+
+
+def _celda_xlsx(valor):
+    # Excel no admite zonas horarias: las fechas-hora van en hora local y las fechas quedan como fecha real
+    if isinstance(valor, datetime) and timezone.is_aware(valor):
+        return timezone.make_naive(valor)
+    return valor
+
+
+async def _csv_por_partes(encabezados, filas):
+    escritor = csv.writer(_Eco())
+    bloque, tamano = ['\ufeff', escritor.writerow(encabezados)], 0
+    async for fila in _en_async(filas):
+        linea = escritor.writerow([_celda(v) for v in fila])
+        bloque.append(linea)
+        tamano += len(linea)
+        if tamano >= TAMANO_BLOQUE:
+            yield ''.join(bloque)
+            bloque, tamano = [], 0
+    yield ''.join(bloque)
+
+
+def respuesta_csv(nombre, encabezados, filas):
+    """
+    Descarga CSV que se genera por bloques mientras se envía.
+
+    Uso:
+        return respuesta_csv('vencimientos', ['Cliente', 'Vence'], Filas(qs.values_list(...)))
+
+    Args:
+        nombre:      Nombre del archivo sin extensión.
+        encabezados: Lista con la fila de títulos.
+        filas:       Filas(...) para consultas, o una lista ya calculada.
+
+    Returns:
+        StreamingHttpResponse con BOM UTF-8 para que Excel respete los acentos.
+    """
+    response = StreamingHttpResponse(_csv_por_partes(encabezados, filas), content_type='text/csv; charset=utf-8')
+    response['Content-Disposition'] = content_disposition_header(True, f"{nombre}.csv")
+    return response
+
+
+def _escribir_libro(encabezados, filas, hoja):
+    from openpyxl import Workbook
+
+    libro = Workbook(write_only=True)
+    ws = libro.create_sheet(title=hoja[:31])
+    ws.append(encabezados)
+    for fila in filas:
+        ws.append([_celda_xlsx(v) for v in fila])
+
+    temporal = tempfile.TemporaryFile(suffix='.xlsx')
+    try:
+        libro.save(temporal)
+    except Exception:
+        temporal.close()
+        raise
+    temporal.seek(0)
+    return temporal
+
+
+async def _xlsx_por_partes(encabezados, filas, hoja):
+    # Recorre el QuerySet, así que va en el hilo de la petición (ver asincrono.py)
+    temporal = await sync_to_async(_escribir_libro)(encabezados, filas, hoja)
+    async for trozo in trozos(temporal):
+        yield trozo
+
+
+def respuesta_xlsx(nombre, encabezados, filas, hoja='Datos'):
+    """
+    Descarga XLSX escrita con openpyxl en modo write-only.
+
+    El libro se arma en un archivo temporal (un XLSX es un ZIP y no se puede
+    emitir por partes) y desde ahí se envía por trozos: la memoria no crece con
+    el número de filas.
+
+    Args:
+        nombre:      Nombre del archivo sin extensión.
+        encabezados: Lista con la fila de títulos.
+        filas:       Filas(...) para consultas, o una lista ya calculada.
+        hoja:        Título de la hoja.
+
+    Returns:
+        StreamingHttpResponse como adjunto.
+    """
+    response = StreamingHttpResponse(
+        _xlsx_por_partes(encabezados, filas, hoja),
+        content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+    )
+    response['Content-Disposition'] = content_disposition_header(True, f"{nombre}.xlsx")
+    return response
+
+
+def respuesta_exportacion(formato, nombre, encabezados, filas, hoja='Datos'):
+    """Elige CSV o XLSX según `formato` (por defecto CSV)."""
+    if formato == 'xlsx':
+        return respuesta_xlsx(nombre, encabezados, filas, hoja=hoja)
+    return respuesta_csv(nombre, encabezados, filas)
+
+
+class _Tubo(io.RawIOBase):
+    """Destino sin seek para ZipFile: junta lo escrito hasta que se vacía hacia la respuesta."""
+
+    def __init__(self):
+        super().__init__()
+        self._trozos = []
+
+    def writable(self):
+        return True
+
+    def write(self, datos):
+        self._trozos.append(bytes(datos))
+        return len(datos)
+
+    def vaciar(self):
+        datos = b''.join(self._trozos)
+        self._trozos.clear()
+        return datos
+
+
+async def _zip_por_partes(archivos):
+    tubo = _Tubo()
+    # Sin seek ZipFile escribe cada tamaño después de su archivo (data descriptor): nada se reescribe
+    with zipfile.ZipFile(tubo, 'w', zipfile.ZIP_STORED) as zf:
+        async for nombre, contenido in archivos:
+            zf.writestr(nombre, contenido)
+            yield tubo.vaciar()
+    yield tubo.vaciar()
+
+
+def respuesta_zip(nombre, archivos):
+    """
+    Descarga ZIP que se arma mientras se envía: cada archivo sale en cuanto está listo.
+
+    Uso:
+        return respuesta_zip('cotizaciones_2026-01', pdfs_de_cotizaciones(ids, base_url))
+
+    Args:
+        nombre:   Nombre del archivo sin extensión.
+        archivos: Iterable async de (nombre_en_zip, bytes).
+
+    Returns:
+        StreamingHttpResponse; en memoria solo queda el archivo en curso. Sin
+        compresión: los PDFs ya vienen comprimidos.
+    """
+    response = StreamingHttpResponse(_zip_por_partes(archivos), content_type='application/zip')
+    response['Content-Disposition'] = content_disposition_header(True, f"{nombre}.zip")
+    return response
+
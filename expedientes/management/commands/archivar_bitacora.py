@@ -0,0 +1,44 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from expedientes.models import Bitacora, BitacoraHistorica
+
+
+class Command(BaseCommand):
+    help = (
+        "Mueve a BitacoraHistorica los registros de bitácora más antiguos que --dias "
+        "para mantener chica la tabla activa. Pensado para un cron mensual."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dias', type=int, default=365, help="Antigüedad mínima en días (por defecto 365).")
+        parser.add_argument('--lote', type=int, default=5000, help="Registros por transacción.")
+        parser.add_argument('--dry-run', action='store_true', help="Solo cuenta lo que se archivaría.")
+
+    def handle(self, *args, **options):
+        corte = timezone.now() - timedelta(days=options['dias'])
+        antiguos = Bitacora.objects.filter(fecha__lt=corte)
+
+        if options['dry_run']:
+            self.stdout.write(f"{antiguos.count()} registro(s) anteriores a {corte:%d/%m/%Y} por archivar.")
+            return
+
+        movidos = 0
+        while True:
+            with transaction.atomic():
+                # Lote por el índice de fecha; se copia con el mismo id y se borra en la misma transacción
+                lote = list(antiguos.order_by('fecha', 'id').values(
+                    'id', 'usuario_id', 'cliente_id', 'accion', 'descripcion', 'fecha'
+                )[:options['lote']])
+                if not lote:
+                    break
+                BitacoraHistorica.objects.bulk_create(
+                    [BitacoraHistorica(**fila) for fila in lote], ignore_conflicts=True
+                )
+                Bitacora.objects.filter(id__in=[fila['id'] for fila in lote]).delete()
+            movidos += len(lote)
+
+        self.stdout.write(self.style.SUCCESS(f"Registros archivados: {movidos}."))
@@ -0,0 +1,445 @@
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import timedelta
+from decimal import Decimal
+from io import BytesIO
+
+import django
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.template.loader import render_to_string
+from django.test import Client, override_settings
+from django.test.utils import setup_test_environment, teardown_test_environment
+from django.urls import reverse
+from django.utils import timezone
+
+from expedientes.models import (
+    Carpeta, Cliente, Cotizacion, CuentaPorCobrar, Documento, Evento, ItemCotizacion,
+    Pago, Plantilla, Servicio, SolicitudEnlace, Usuario,
+)
+from expedientes.perfilado import medir
+
+ESCENARIOS = (
+    'dashboard', 'detalle_cliente', 'vista_publica_carga', 'panel_finanzas',
+    'api_eventos', 'pdf_cotizacion', 'zip_carpeta', 'generar_contrato',
+)
+
+# Documentos del benchmark de PDF (--pdf): nombre y plantilla
+DOCUMENTOS_PDF = (
+    ('cotizacion', 'cotizaciones/pdf_template.html'),
+    ('recibo', 'finanzas/recibo_template.html'),
+    ('orden_cobro', 'finanzas/orden_cobro_pdf.html'),
+)
+
+# Librerías cuyo costo de importación interesa vigilar en el arranque
+LIBRERIAS_PESADAS = ('pandas', 'numpy', 'weasyprint', 'mammoth', 'docxtpl', 'docx', 'qrcode', 'PIL')
+
+# Se ejecuta en un intérprete nuevo: mide el arranque en frío de Django más las URLs (que importan las vistas)
+SONDA_IMPORTACION = """
+import json, os, sys, time
+t0 = time.perf_counter()
+import django
+django.setup()
+t1 = time.perf_counter()
+from django.urls import get_resolver
+get_resolver().url_patterns
+t2 = time.perf_counter()
+with open(f"/proc/{os.getpid()}/statm") as f:
+    rss = int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 1024 / 1024
+print(json.dumps({
+    'setup_ms': (t1 - t0) * 1000, 'urls_ms': (t2 - t1) * 1000, 'total_ms': (t2 - t0) * 1000,
+    'rss_mb': rss, 'modulos': len(sys.modules),
+    'pesadas': [m for m in sys.argv[1:] if m in sys.modules],
+}))
+"""
+
+# Contenido mínimo de un PDF válido para los archivos sintéticos del drive
+PDF_MINIMO = (
+    b"%PDF-1.4\n1 0 obj<</Type/Catalog/Pages 2 0 R>>endobj\n"
+    b"2 0 obj<</Type/Pages/Kids[3 0 R]/Count 1>>endobj\n"
+    b"3 0 obj<</Type/Page/Parent 2 0 R/MediaBox[0 0 612 792]>>endobj\n"
+    b"trailer<</Root 1 0 R>>\n%%EOF\n"
+)
+
+
+def _rss_pico_mb():
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    # Linux reporta KB; macOS, bytes
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(pico / (1024 * 1024 if platform.system() == 'Darwin' else 1024), 1)
+
+
+def _commit_actual():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, timeout=5, cwd=settings.BASE_DIR
+        ).stdout.strip() or None
+    except Exception:
+        return None
+
+
+def _percentil(valores, p):
+    ordenados = sorted(valores)
+    k = (len(ordenados) - 1) * p
+    bajo = int(k)
+    alto = min(bajo + 1, len(ordenados) - 1)
+    return ordenados[bajo] + (ordenados[alto] - ordenados[bajo]) * (k - bajo)
+
+
+def _consumir(respuesta):
+    """Lee todo el cuerpo de una respuesta en streaming; las vistas async (ZIP de carpeta) dan un generador async."""
+    if respuesta.is_async:
+        async def drenar():
+            async for _ in respuesta.streaming_content:
+                pass
+
+        async_to_sync(drenar)()
+    else:
+        for _ in respuesta.streaming_content:
+            pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Siembra datos sintéticos en una BD de pruebas y mide las vistas más pesadas "
+        "(p50/p95, consultas y RSS pico). Imprime JSON para comparar entre commits."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--clientes', type=int, default=20)
+        parser.add_argument('--documentos', type=int, default=500, help="Total de documentos en el drive.")
+        parser.add_argument('--cotizaciones', type=int, default=50)
+        parser.add_argument('--pagos', type=int, default=100)
+        parser.add_argument('--repeticiones', type=int, default=15, help="Mediciones por escenario (más 1 de calentamiento).")
+        parser.add_argument('--escenarios', default=','.join(ESCENARIOS), help="Lista separada por comas.")
+        parser.add_argument('--semilla', type=int, default=42)
+        parser.add_argument('--salida', help="Archivo donde guardar el JSON (además de imprimirlo).")
+        parser.add_argument(
+            '--importacion', action='store_true',
+            help="Solo mide el arranque (django.setup + URLs) en procesos nuevos: tiempo, RSS y librerías pesadas cargadas.",
+        )
+        parser.add_argument(
+            '--pdf', action='store_true',
+            help="Solo mide el render de cotización, recibo y orden de cobro (sin caché de PDFs): "
+                 "motor compartido de expedientes/pdf.py contra CSS y fuentes nuevos en cada render.",
+        )
+
+    def handle(self, *args, **options):
+        if options['importacion']:
+            return self._escribir({
+                'commit': _commit_actual(),
+                'fecha': timezone.now().isoformat(timespec='seconds'),
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'importacion': self._medir_importacion(options['repeticiones']),
+            }, options)
+
+        escenarios = [e.strip() for e in options['escenarios'].split(',') if e.strip()]
+        desconocidos = set(escenarios) - set(ESCENARIOS)
+        if desconocidos:
+            self.stderr.write(f"Escenarios desconocidos: {', '.join(sorted(desconocidos))}")
+            return
+
+        media = tempfile.mkdtemp(prefix='bench-media-')
+        setup_test_environment()
+        nombre_original = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            with override_settings(
+                MEDIA_ROOT=media,
+                STORAGES={**settings.STORAGES, 'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'}},
+                # Caché propia del benchmark: no mezcla claves con la compartida de la instancia
+                CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'bench'}},
+                TAREAS_SINCRONAS=True,
+                ALLOWED_HOSTS=['*'],
+                PERFILADO_ESTRICTO=False,
+            ):
+                t0 = time.perf_counter()
+                datos = self._sembrar(options)
+                siembra = time.perf_counter() - t0
+                if options['pdf']:
+                    resultados = self._medir_pdf(datos, options['repeticiones'])
+                else:
+                    resultados = {nombre: self._medir(nombre, datos, options['repeticiones']) for nombre in escenarios}
+        finally:
+            connection.creation.destroy_test_db(nombre_original, verbosity=0)
+            teardown_test_environment()
+            shutil.rmtree(media, ignore_errors=True)
+
+        reporte = {
+            'commit': _commit_actual(),
+            'fecha': timezone.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'bd': connection.vendor,
+            'escala': {k: options[k] for k in ('clientes', 'documentos', 'cotizaciones', 'pagos', 'repeticiones', 'semilla')},
+            'siembra_s': round(siembra, 2),
+            'pdf' if options['pdf'] else 'escenarios': resultados,
+            'rss_pico_mb': _rss_pico_mb(),
+        }
+        self._escribir(reporte, options)
+
+    def _escribir(self, reporte, options):
+        salida = json.dumps(reporte, indent=2, ensure_ascii=False)
+        if options['salida']:
+            with open(options['salida'], 'w', encoding='utf-8') as f:
+                f.write(salida)
+        self.stdout.write(salida)
+
+    # ------------------------------------------
+    # Arranque (importación)
+    # ------------------------------------------
+    def _medir_importacion(self, repeticiones):
+        entorno = {**os.environ, 'DJANGO_SETTINGS_MODULE': os.environ.get('DJANGO_SETTINGS_MODULE', 'core.settings')}
+        muestras = []
+        for _ in range(max(repeticiones, 1)):
+            proceso = subprocess.run(
+                [sys.executable, '-c', SONDA_IMPORTACION, *LIBRERIAS_PESADAS],
+                capture_output=True, text=True, cwd=settings.BASE_DIR, env=entorno, timeout=120,
+            )
+            if proceso.returncode != 0:
+                return {'error': proceso.stderr.strip().splitlines()[-1:]}
+            muestras.append(json.loads(proceso.stdout.strip().splitlines()[-1]))
+
+        def resumen(clave):
+            valores = [m[clave] for m in muestras]
+            return {'p50': round(_percentil(valores, 0.50), 1), 'min': round(min(valores), 1), 'max': round(max(valores), 1)}
+
+        return {
+            'procesos': len(muestras),
+            'setup_ms': resumen('setup_ms'),
+            'urls_ms': resumen('urls_ms'),
+            'total_ms': resumen('total_ms'),
+            'rss_mb': resumen('rss_mb'),
+            'modulos': muestras[-1]['modulos'],
+            'pesadas_cargadas': muestras[-1]['pesadas'],
+        }
+
+    # ------------------------------------------
+    # Siembra
+    # ------------------------------------------
+    def _sembrar(self, options):
+        rnd = random.Random(options['semilla'])
+        hoy = timezone.localdate()
+
+        admin = Usuario.objects.create_user('bench', password='bench', rol='admin', is_staff=True)
+
+        # Los clientes se crean uno a uno para que la señal arme su árbol de carpetas estándar
+        clientes = [
+            Cliente.objects.create(nombre_empresa=f"Empresa {i:04d}", nombre_contacto=f"Contacto {i}", email=f"c{i}@bench.local", telefono='5555555555')
+            for i in range(max(options['clientes'], 1))
+        ]
+        carpetas = list(Carpeta.objects.filter(padre__isnull=True).values_list('id', 'cliente_id', 'nombre'))
+        requisitos = {}
+        for carpeta in Carpeta.objects.filter(padre__isnull=True)[:20]:
+            detalle = carpeta.obtener_detalle_cumplimiento() or []
+            requisitos[carpeta.nombre] = [d['nombre'] for d in detalle]
+
+        # Un solo archivo real compartido: las descargas ZIP leen bytes de verdad
+        ruta = Documento._meta.get_field('archivo').storage.save('bench/documento.pdf', ContentFile(PDF_MINIMO))
+        documentos = []
+        for i in range(options['documentos']):
+            carpeta_id, cliente_id, nombre_carpeta = carpetas[i % len(carpetas)]
+            opciones = requisitos.get(nombre_carpeta) or ['ANEXO']
+            documentos.append(Documento(
+                cliente_id=cliente_id, carpeta_id=carpeta_id, archivo=ruta, subido_por=admin,
+                nombre_archivo=f"{rnd.choice(opciones)} {i}.pdf",
+                fecha_vencimiento=hoy + timedelta(days=rnd.randint(-60, 180)) if rnd.random() < 0.4 else None,
+            ))
+        Documento.objects.bulk_create(documentos, batch_size=1000)
+
+        servicios = [Servicio.objects.create(nombre=f"Servicio {i}", precio_base=Decimal(rnd.randint(1000, 20000))) for i in range(8)]
+        cotizaciones = []
+        for i in range(max(options['cotizaciones'], 1)):
+            cliente = clientes[i % len(clientes)]
+            cot = Cotizacion.objects.create(
+                prospecto_nombre=cliente.nombre_contacto, prospecto_empresa=cliente.nombre_empresa,
+                prospecto_email=cliente.email, titulo=f"Proyecto {i}", creado_por=admin,
+                estado='aceptada', cliente_convertido=cliente, aplica_iva=bool(i % 2),
+                porcentaje_iva=Decimal('16.00'), porcentaje_descuento=Decimal('0.00'),
+            )
+            items = []
+            for servicio in rnd.sample(servicios, 3):
+                cantidad = rnd.randint(1, 3)
+                items.append(ItemCotizacion(cotizacion=cot, servicio=servicio, cantidad=cantidad, precio_unitario=servicio.precio_base, subtotal=servicio.precio_base * cantidad))
+            ItemCotizacion.objects.bulk_create(items)
+            cot.calcular_totales()
+            cotizaciones.append(cot)
+
+        cuentas = []
+        for i, cot in enumerate(cotizaciones):
+            cuentas.append(CuentaPorCobrar.objects.create(
+                cliente=cot.cliente_convertido, cotizacion=cot, concepto=f"Anticipo {i}",
+                monto_total=cot.total_con_iva or Decimal('1000'), fecha_vencimiento=hoy + timedelta(days=rnd.randint(-90, 60)),
+            ))
+        pagos = []
+        for i in range(options['pagos']):
+            cuenta = cuentas[i % len(cuentas)]
+            pagos.append(Pago(cuenta=cuenta, monto=Decimal(rnd.randint(100, 2000)), metodo='transferencia', registrado_por=admin, fecha_pago=hoy - timedelta(days=rnd.randint(0, 120))))
+        Pago.objects.bulk_create(pagos, batch_size=1000)
+        for cuenta in cuentas:
+            cuenta.monto_pagado = sum((p.monto for p in pagos if p.cuenta_id == cuenta.id), Decimal('0'))
+            cuenta.save()
+
+        inicio_mes = timezone.localtime().replace(day=1, hour=10, minute=0, second=0, microsecond=0)
+        Evento.objects.bulk_create([
+            Evento(usuario=admin, cliente=clientes[i % len(clientes)], titulo=f"Audiencia {i}", tipo='audiencia', inicio=inicio_mes + timedelta(days=i % 28, hours=i % 5))
+            for i in range(60)
+        ])
+
+        solicitud = SolicitudEnlace.objects.create(cliente=clientes[0])
+        carpeta_zip = Carpeta.objects.filter(cliente=clientes[0], documentos__isnull=False).first() or Carpeta.objects.filter(cliente=clientes[0]).first()
+
+        return {
+            'admin': admin,
+            'cliente': clientes[0],
+            'cotizacion': cotizaciones[0],
+            'cuenta': cuentas[0],
+            'pago': Pago.objects.filter(cuenta=cuentas[0]).select_related('cuenta__cliente').first(),
+            'solicitud': solicitud,
+            'carpeta_zip': carpeta_zip,
+            'plantilla': self._plantilla_contrato(),
+            'inicio_mes': inicio_mes,
+        }
+
+    def _plantilla_contrato(self):
+        from docx import Document as DocumentoWord
+
+        doc = DocumentoWord()
+        doc.add_heading('CONTRATO DE PRESTACIÓN DE SERVICIOS', 1)
+        doc.add_paragraph('En la Ciudad de México, a {{ fecha_larga }}, {{ cliente_empresa }} representada por {{ cliente_contacto }}.')
+        for n in range(20):
+            doc.add_paragraph(f'CLÁUSULA {n + 1}. {{{{ objeto }}}} ' + 'Texto de relleno. ' * 30)
+        buffer = BytesIO()
+        doc.save(buffer)
+        plantilla = Plantilla(nombre='Contrato bench')
+        plantilla.archivo.save('contrato_bench.docx', ContentFile(buffer.getvalue()))
+        return plantilla
+
+    # ------------------------------------------
+    # Medición
+    # ------------------------------------------
+    def _peticion(self, nombre, datos):
+        """Devuelve una función sin argumentos que hace la petición del escenario."""
+        cliente = datos['cliente']
+        inicio = datos['inicio_mes']
+        peticiones = {
+            'dashboard': lambda c: c.get(reverse('dashboard')),
+            'detalle_cliente': lambda c: c.get(reverse('detalle_cliente', args=[cliente.id])),
+            'vista_publica_carga': lambda c: c.get(reverse('vista_publica_carga', args=[datos['solicitud'].id])),
+            'panel_finanzas': lambda c: c.get(reverse('panel_finanzas')),
+            'api_eventos': lambda c: c.get(reverse('api_eventos'), {'start': inicio.isoformat(), 'end': (inicio + timedelta(days=42)).isoformat()}),
+            'pdf_cotizacion': lambda c: c.get(reverse('pdf_cotizacion', args=[datos['cotizacion'].id])),
+            'zip_carpeta': lambda c: c.get(reverse('descargar_carpeta_zip', args=[datos['carpeta_zip'].id])),
+            'generar_contrato': lambda c: c.post(
+                f"{reverse('generador_contratos', args=[cliente.id])}?plantilla_id={datos['plantilla'].id}",
+                {'plantilla_id': datos['plantilla'].id, 'objeto': 'Gestión de licencias'},
+            ),
+        }
+        navegador = Client()
+        navegador.force_login(datos['admin'])
+        funcion = peticiones[nombre]
+        return lambda: funcion(navegador)
+
+    def _medir(self, nombre, datos, repeticiones):
+        peticion = self._peticion(nombre, datos)
+        try:
+            respuesta = peticion()  # Calentamiento (plantillas, fuentes, cachés)
+            if respuesta.status_code >= 400:
+                return {'error': f"HTTP {respuesta.status_code}"}
+        except Exception as e:
+            return {'error': f"{type(e).__name__}: {e}"}
+
+        tiempos, consultas = [], []
+        for _ in range(max(repeticiones, 1)):
+            with medir() as m:
+                t0 = time.perf_counter()
+                respuesta = peticion()
+                if getattr(respuesta, 'streaming', False):
+                    _consumir(respuesta)
+                tiempos.append((time.perf_counter() - t0) * 1000)
+            consultas.append(m.consultas)
+
+        return {
+            'p50_ms': round(_percentil(tiempos, 0.50), 2),
+            'p95_ms': round(_percentil(tiempos, 0.95), 2),
+            'min_ms': round(min(tiempos), 2),
+            'max_ms': round(max(tiempos), 2),
+            'consultas': int(statistics.median(consultas)),
+            'consultas_max': max(consultas),
+            'estado': respuesta.status_code,
+        }
+
+    # ------------------------------------------
+    # Render de PDF (--pdf)
+    # ------------------------------------------
+    def _contextos_pdf(self, datos):
+        cuenta = datos['cuenta']
+        return {
+            'cotizacion': {'c': datos['cotizacion']},
+            'recibo': {'p': datos['pago']},
+            'orden_cobro': {
+                'cuenta': cuenta, 'c': cuenta.cotizacion, 'titulo_doc': "ORDEN DE PAGO - ANTICIPO",
+                'monto_a_pagar': cuenta.monto_total / Decimal(2), 'nota': "Concepto: 50% de anticipo.",
+                'tipo_pago': 'anticipo', 'porcentaje_pago': 50, 'fecha_emision': timezone.now(),
+                'banco': {'banco': 'BBVA', 'cuenta': '0123456789', 'clabe': '012180001234567891', 'titular': 'Bench'},
+            },
+        }
+
+    def _medir_pdf(self, datos, repeticiones):
+        """
+        Tiempo por render de cada documento, con el HTML ya generado y sin la caché de PDFs:
+            por_render: el CSS en un <style> del documento y una FontConfiguration nueva cada vez
+                        (como se hacía antes de static/pdf/).
+            motor:      pdf.renderizar(), con hojas compiladas y fuentes del proceso.
+        """
+        import weasyprint
+
+        from expedientes import pdf
+
+        base_url = 'http://testserver/'
+        contextos = self._contextos_pdf(datos)
+        resultados = {}
+        for nombre, plantilla in DOCUMENTOS_PDF:
+            html = render_to_string(plantilla, {**contextos[nombre], 'base_url': base_url})
+            estilos = '\n'.join(pdf._texto(ruta)[0] for ruta in pdf.HOJAS[plantilla])
+            html_en_linea = html.replace('</head>', f'<style>{estilos}</style></head>', 1)
+
+            def por_render():
+                weasyprint.HTML(string=html_en_linea, base_url=base_url, url_fetcher=pdf.fetcher()).write_pdf()
+
+            def motor():
+                pdf.renderizar(html, base_url, plantilla)
+
+            modos = {'por_render': self._cronometrar(por_render, repeticiones), 'motor': self._cronometrar(motor, repeticiones)}
+            antes, despues = modos['por_render']['p50_ms'], modos['motor']['p50_ms']
+            modos['ahorro_p50_pct'] = round((antes - despues) / antes * 100, 1) if antes else None
+            resultados[nombre] = modos
+        return resultados
+
+    def _cronometrar(self, funcion, repeticiones):
+        funcion()  # Calentamiento (imágenes, hojas y fuentes del motor)
+        tiempos = []
+        for _ in range(max(repeticiones, 1)):
+            t0 = time.perf_counter()
+            funcion()
+            tiempos.append((time.perf_counter() - t0) * 1000)
+        return {
+            'p50_ms': round(_percentil(tiempos, 0.50), 2),
+            'p95_ms': round(_percentil(tiempos, 0.95), 2),
+            'min_ms': round(min(tiempos), 2),
+        }
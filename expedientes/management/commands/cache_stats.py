@@ -0,0 +1,106 @@
+import json
+import os
+import tempfile
+from collections import defaultdict
+from pathlib import Path
+
+from django.core.cache import caches
+from django.core.management.base import BaseCommand
+from prometheus_client import REGISTRY, CollectorRegistry, multiprocess
+
+from expedientes.cache import DOMINIOS
+
+
+def _contadores(directorio):
+    """{dominio: {'acierto': n, 'fallo': n}} sumando los archivos de todos los workers (o este proceso)."""
+    if directorio:
+        registro = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registro, path=directorio)
+    else:
+        registro = REGISTRY
+    conteo = defaultdict(lambda: {'acierto': 0, 'fallo': 0})
+    for familia in registro.collect():
+        if familia.name != 'corpad_cache_consultas':
+            continue
+        for muestra in familia.samples:
+            if muestra.name.endswith('_total'):
+                conteo[muestra.labels['dominio']][muestra.labels['resultado']] += int(muestra.value)
+    return conteo
+
+
+def _backend():
+    """Tipo de caché configurada y lo que se pueda saber de su tamaño sin recorrerla a fondo."""
+    cache = caches['default']
+    clase = type(cache)
+    info = {'backend': f"{clase.__module__}.{clase.__name__}"}
+    nombre = clase.__name__
+    try:
+        if nombre == 'FileBasedCache':
+            archivos = list(Path(cache._dir).glob(f"*{cache.cache_suffix}"))
+            info.update(ubicacion=str(cache._dir), entradas=len(archivos), max_entradas=cache._max_entries,
+                        mb=round(sum(a.stat().st_size for a in archivos) / 1024 / 1024, 2))
+        elif nombre == 'RedisCache':
+            cliente = cache._cache.get_client()
+            stats = cliente.info('stats')
+            aciertos, fallos = stats.get('keyspace_hits', 0), stats.get('keyspace_misses', 0)
+            info.update(entradas=cliente.dbsize(), memoria=cliente.info('memory').get('used_memory_human'),
+                        servidor_aciertos=aciertos, servidor_fallos=fallos)
+        elif nombre == 'DatabaseCache':
+            from django.db import connections, router
+
+            bd = router.db_for_read(cache.cache_model_class)
+            with connections[bd].cursor() as cursor:
+                cursor.execute(f"SELECT COUNT(*) FROM {connections[bd].ops.quote_name(cache._table)}")
+                info.update(ubicacion=cache._table, entradas=cursor.fetchone()[0])
+        elif nombre == 'LocMemCache':
+            info.update(entradas=len(cache._cache), aviso="caché por proceso: los workers no la comparten")
+    except Exception as e:
+        info['error'] = str(e)
+    return info
+
+
+class Command(BaseCommand):
+    help = (
+        "Aciertos y fallos de la caché compartida por dominio (sumando los workers de gunicorn) "
+        "y estado del backend configurado."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--directorio',
+            default=os.environ.get('PROMETHEUS_MULTIPROC_DIR') or os.path.join(tempfile.gettempdir(), 'corpad-metricas'),
+            help="Directorio de métricas multiproceso de gunicorn (por defecto el de gunicorn.conf.py).",
+        )
+        parser.add_argument('--json', action='store_true', help="Salida en JSON.")
+
+    def handle(self, *args, **options):
+        directorio = options['directorio'] if os.path.isdir(options['directorio']) else None
+        conteo = _contadores(directorio)
+
+        dominios = {}
+        for espacio in DOMINIOS:
+            c = conteo.get(espacio.nombre, {'acierto': 0, 'fallo': 0})
+            total = c['acierto'] + c['fallo']
+            dominios[espacio.nombre] = {
+                'aciertos': c['acierto'], 'fallos': c['fallo'],
+                'tasa': round(c['acierto'] / total, 3) if total else None,
+                'ttl_s': espacio.ttl, 'version': espacio.version_formato,
+            }
+        reporte = {'origen': directorio or 'proceso actual', 'dominios': dominios, 'backend': _backend()}
+
+        if options['json']:
+            self.stdout.write(json.dumps(reporte, indent=2, ensure_ascii=False))
+            return
+
+        self.stdout.write(f"Contadores: {reporte['origen']}")
+        self.stdout.write(f"{'dominio':<14}{'aciertos':>10}{'fallos':>10}{'tasa':>8}{'ttl (s)':>10}")
+        for nombre, d in dominios.items():
+            tasa = f"{d['tasa']:.0%}" if d['tasa'] is not None else '-'
+            self.stdout.write(f"{nombre:<14}{d['aciertos']:>10}{d['fallos']:>10}{tasa:>8}{d['ttl_s']:>10}")
+        self.stdout.write("")
+        for clave, valor in reporte['backend'].items():
+            self.stdout.write(f"{clave}: {valor}")
+        if not directorio:
+            self.stdout.write(self.style.WARNING(
+                "No se encontró el directorio de métricas de gunicorn: los contadores son solo de este proceso."
+            ))
@@ -0,0 +1,87 @@
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from expedientes.models import Usuario
+from expedientes.recordatorios import ALERTAS_VENCIMIENTO, audiencias_del_dia, documentos_con_alerta
+
+
+class Command(BaseCommand):
+    help = (
+        "Envía a cada abogado el resumen diario de documentos por vencer (20/10/5 días) "
+        "y de las audiencias de mañana, incluidas las recurrentes. Pensado para un cron diario."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fecha', help="Fecha a procesar (YYYY-MM-DD). Por defecto, hoy.")
+        parser.add_argument('--dry-run', action='store_true', help="Muestra el resumen sin enviar correos.")
+
+    def handle(self, *args, **options):
+        hoy = parse_date(options['fecha']) if options['fecha'] else timezone.localdate()
+        avisos = dict(ALERTAS_VENCIMIENTO)
+
+        # 1. Documentos con aviso hoy: una sola consulta por el índice de vencimientos
+        docs_por_cliente = defaultdict(list)
+        for doc in documentos_con_alerta(hoy).values('nombre_archivo', 'fecha_vencimiento', 'cliente_id', 'cliente__nombre_empresa').iterator(chunk_size=2000):
+            dias = (doc['fecha_vencimiento'] - hoy).days
+            docs_por_cliente[doc['cliente_id']].append(
+                f"{avisos[dias]} ({doc['fecha_vencimiento']:%d/%m/%Y}): {doc['nombre_archivo']} - {doc['cliente__nombre_empresa']}"
+            )
+
+        # 2. Destinatarios: abogados asignados a esos clientes + administradores
+        objetivos = [hoy + timedelta(days=dias) for dias in avisos]
+        asignaciones = Usuario.clientes_asignados.through.objects.filter(
+            cliente__documentos__fecha_vencimiento__in=objetivos
+        ).values_list('usuario_id', 'cliente_id').distinct()
+
+        lineas_por_usuario = defaultdict(list)
+        for usuario_id, cliente_id in asignaciones.iterator(chunk_size=2000):
+            lineas_por_usuario[usuario_id].extend(docs_por_cliente.get(cliente_id, []))
+
+        admins = list(Usuario.objects.filter(rol='admin', is_active=True).values_list('id', flat=True))
+        todas = [linea for lineas in docs_por_cliente.values() for linea in lineas]
+        for admin_id in admins:
+            lineas_por_usuario[admin_id] = list(todas)
+
+        # 3. Audiencias de mañana (cada quien recibe las suyas)
+        audiencias_por_usuario = defaultdict(list)
+        for evento, inicio in audiencias_del_dia(hoy + timedelta(days=1)):
+            cliente = f" - {evento.cliente.nombre_empresa}" if evento.cliente else ""
+            audiencias_por_usuario[evento.usuario_id].append(f"{timezone.localtime(inicio):%H:%M} {evento.titulo}{cliente}")
+
+        ids = set(lineas_por_usuario) | set(audiencias_por_usuario)
+        usuarios = Usuario.objects.filter(id__in=ids, is_active=True).exclude(email='').only('id', 'email', 'first_name', 'username')
+
+        mensajes = []
+        for u in usuarios:
+            docs = lineas_por_usuario.get(u.id, [])
+            audiencias = audiencias_por_usuario.get(u.id, [])
+            if not docs and not audiencias:
+                continue
+            cuerpo = f"Hola {u.first_name or u.username},\n\n"
+            if docs:
+                cuerpo += "Documentos por vencer:\n" + "\n".join(f"  - {d}" for d in docs) + "\n\n"
+            if audiencias:
+                cuerpo += "Audiencias de mañana:\n" + "\n".join(f"  - {a}" for a in audiencias) + "\n\n"
+            cuerpo += "Gestiones Corpad"
+            mensajes.append(EmailMessage(
+                subject=f"Recordatorios del {hoy:%d/%m/%Y}",
+                body=cuerpo,
+                from_email=settings.DEFAULT_FROM_EMAIL,
+                to=[u.email],
+            ))
+
+        if options['dry_run']:
+            for m in mensajes:
+                self.stdout.write(f"--- {m.to[0]} ---\n{m.body}\n")
+        elif mensajes:
+            # Una sola conexión para todo el lote
+            get_connection().send_messages(mensajes)
+
+        total_docs = sum(len(v) for v in docs_por_cliente.values())
+        self.stdout.write(self.style.SUCCESS(f"{total_docs} aviso(s) de vencimiento, {len(mensajes)} correo(s) {'preparados' if options['dry_run'] else 'enviados'}."))
@@ -0,0 +1,41 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from expedientes.estados_cuenta import generar_lote, mes_cerrado, periodo_de
+from expedientes.models import LoteEstadosCuenta
+
+
+class Command(BaseCommand):
+    help = (
+        "Genera los estados de cuenta de un mes (un PDF por cliente en su drive). "
+        "Si el lote ya existe lo reanuda: solo procesa los clientes que aún no tienen su PDF."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--periodo', help="Mes cerrado AAAA-MM (por defecto el mes anterior).")
+        parser.add_argument(
+            '--base-url', help="URL del sitio para resolver el logo (por defecto https://<primer ALLOWED_HOSTS>/).",
+        )
+
+    def handle(self, *args, **options):
+        if options['periodo']:
+            periodo = periodo_de(options['periodo'])
+            if periodo is None:
+                raise CommandError(f"Periodo inválido: {options['periodo']} (se espera AAAA-MM).")
+            if not mes_cerrado(periodo):
+                raise CommandError(f"{periodo:%Y-%m} aún no termina: solo se generan meses cerrados.")
+        else:
+            periodo = (timezone.localdate().replace(day=1) - timedelta(days=1)).replace(day=1)
+        base_url = options['base_url'] or f"https://{settings.ALLOWED_HOSTS[0].lstrip('.')}/"
+
+        lote, creado = LoteEstadosCuenta.objects.get_or_create(periodo=periodo)
+        self.stdout.write(f"{lote} ({'nuevo' if creado else 'reanudando'})")
+        resultado = generar_lote(lote.id, base_url)
+        if resultado is None:
+            raise CommandError(f"{lote} ya está en curso en otro proceso.")
+        generados, fallidos = resultado
+        estilo = self.style.WARNING if fallidos else self.style.SUCCESS
+        self.stdout.write(estilo(f"Estados de cuenta generados: {generados}. Con error: {fallidos}."))
@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from expedientes.miniaturas import EXTENSIONES_IMAGEN, EXTENSIONES_PDF, generar_miniatura
+from expedientes.models import Documento
+
+
+class Command(BaseCommand):
+    help = "Genera las miniaturas WebP de los documentos del drive que aún no tienen (o de todos con --todas)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--todas', action='store_true', help="Regenera también las miniaturas existentes.")
+
+    def handle(self, *args, **options):
+        filtro_ext = Q()
+        for ext in EXTENSIONES_IMAGEN | EXTENSIONES_PDF:
+            filtro_ext |= Q(archivo__iendswith=f".{ext}")
+
+        qs = Documento.objects.filter(filtro_ext)
+        if not options['todas']:
+            qs = qs.filter(Q(miniatura='') | Q(miniatura__isnull=True))
+
+        generadas = fallidas = 0
+        for doc_id in qs.values_list('id', flat=True).iterator(chunk_size=500):
+            try:
+                if generar_miniatura(doc_id):
+                    generadas += 1
+            except Exception as e:
+                fallidas += 1
+                self.stderr.write(f"Documento {doc_id}: {e}")
+
+        self.stdout.write(self.style.SUCCESS(f"Miniaturas generadas: {generadas}. Con error: {fallidas}."))
@@ -0,0 +1,47 @@
+import json
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.template import engines
+
+from expedientes.arranque import nombres_plantillas, precompilar
+
+
+class Command(BaseCommand):
+    help = (
+        "Compila todas las plantillas (incluidas las de PDF) con el loader en caché y reporta "
+        "el tiempo de cada una. Falla si alguna no compila: sirve de revisión en el build."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lentas', type=int, default=10, help="Cuántas de las más lentas listar (por defecto 10).")
+        parser.add_argument('--json', action='store_true', help="Salida en JSON con todas las plantillas.")
+
+    def handle(self, *args, **options):
+        # Se parte del loader vacío para medir la compilación y no una lectura de la caché
+        for motor in engines.all():
+            for loader in motor.engine.template_loaders:
+                if hasattr(loader, 'reset'):
+                    loader.reset()
+
+        nombres = nombres_plantillas()
+        inicio = time.perf_counter()
+        resultados = precompilar(nombres)
+        total_ms = (time.perf_counter() - inicio) * 1000
+        errores = [(nombre, error) for nombre, _, error in resultados if error]
+
+        if options['json']:
+            self.stdout.write(json.dumps({
+                'plantillas': len(resultados), 'total_ms': round(total_ms, 1),
+                'tiempos_ms': {nombre: round(ms, 2) for nombre, ms, _ in resultados},
+                'errores': dict(errores),
+            }, indent=2, ensure_ascii=False))
+        else:
+            for nombre, ms, _ in sorted(resultados, key=lambda r: r[1], reverse=True)[:options['lentas']]:
+                self.stdout.write(f"{ms:8.1f} ms  {nombre}")
+            self.stdout.write(f"{len(resultados)} plantilla(s) en {total_ms:.0f} ms.")
+
+        if errores:
+            for nombre, error in errores:
+                self.stderr.write(f"{nombre}: {error}")
+            raise CommandError(f"{len(errores)} plantilla(s) no compilan.")
@@ -0,0 +1,161 @@
+# ==========================================
+# EXPEDIENTES/METRICAS.PY - MÉTRICAS PROMETHEUS (/metrics)
+# ==========================================
+"""
+Registro de métricas del proceso, expuesto en /metrics en formato de texto de Prometheus.
+
+Con gunicorn cada worker es un proceso distinto: si existe la variable
+PROMETHEUS_MULTIPROC_DIR (la define gunicorn.conf.py) cada proceso escribe sus
+valores en archivos propios de ese directorio y /metrics los suma al momento de
+la lectura. Sin la variable (runserver) se usa el registro normal en memoria.
+"""
+import logging
+import os
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.mail.backends.base import BaseEmailBackend
+from django.utils.module_loading import import_string
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram, generate_latest,
+)
+from prometheus_client.core import GaugeMetricFamily
+
+logger = logging.getLogger(__name__)
+
+MULTIPROCESO = bool(os.environ.get('PROMETHEUS_MULTIPROC_DIR'))
+
+# ------------------------------------------
+# Definición de métricas
+# ------------------------------------------
+DURACION_VISTA = Histogram(
+    'corpad_vista_duracion_segundos', "Latencia de las vistas por nombre de URL.",
+    ['vista', 'metodo'],
+    buckets=(0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30),
+)
+PETICIONES = Counter('corpad_peticiones_total', "Respuestas por vista y clase de estado HTTP.", ['vista', 'estado'])
+EN_CURSO = Gauge(
+    'corpad_peticiones_en_curso', "Peticiones atendiéndose ahora (saturación de workers).",
+    multiprocess_mode='livesum',
+)
+
+PDFS = Counter('corpad_pdfs_generados_total', "PDFs renderizados con WeasyPrint.", ['origen'])
+PDFS_FALLIDOS = Counter('corpad_pdfs_fallidos_total', "PDFs que fallaron al renderizar.", ['origen'])
+DURACION_PDF = Histogram(
+    'corpad_pdf_duracion_segundos', "Tiempo de render de PDFs.", ['origen'],
+    buckets=(0.1, 0.25, 0.5, 1, 2, 4, 8, 16, 32),
+)
+
+CORREOS_ENVIADOS = Counter('corpad_correos_enviados_total', "Correos aceptados por el proveedor.")
+CORREOS_FALLIDOS = Counter('corpad_correos_fallidos_total', "Correos que no se pudieron enviar.")
+
+SUBIDAS = Counter('corpad_archivos_subidos_total', "Archivos guardados.", ['origen'])
+BYTES_SUBIDOS = Counter('corpad_bytes_almacenados_total', "Bytes guardados en el almacenamiento de media.", ['origen'])
+
+CACHE_CONSULTAS = Counter(
+    'corpad_cache_consultas_total', "Lecturas de la caché compartida por dominio y resultado.", ['dominio', 'resultado'],
+)
+
+ADMISION_ESPERA = Histogram(
+    'corpad_admision_espera_segundos', "Tiempo en cola de los trabajos pesados antes de ejecutarse o rechazarse.", ['tipo'],
+    buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30),
+)
+ADMISION_RECHAZOS = Counter(
+    'corpad_admision_rechazos_total', "Trabajos pesados rechazados (tamano, saturado, tiempo).", ['tipo', 'motivo'],
+)
+ADMISION_EN_CURSO = Gauge(
+    'corpad_admision_en_curso', "Trabajos pesados ejecutándose ahora.", ['tipo'], multiprocess_mode='livesum',
+)
+
+
+# ------------------------------------------
+# Instrumentación
+# ------------------------------------------
+@contextmanager
+def medir_pdf(origen):
+    """
+    Cuenta y cronometra un render de PDF.
+
+    Uso:
+        with medir_pdf('cotizacion'):
+            pdf = weasyprint.HTML(string=html).write_pdf()
+    """
+    inicio = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        PDFS_FALLIDOS.labels(origen).inc()
+        raise
+    PDFS.labels(origen).inc()
+    DURACION_PDF.labels(origen).observe(time.perf_counter() - inicio)
+
+
+def registrar_subida(origen, tamano=None):
+    """Cuenta un archivo recién guardado y sus bytes (si se conocen)."""
+    SUBIDAS.labels(origen).inc()
+    if tamano:
+        BYTES_SUBIDOS.labels(origen).inc(tamano)
+
+
+class EmailBackendMedido(BaseEmailBackend):
+    """
+    Envuelve el backend real (settings.EMAIL_BACKEND_REAL) y cuenta enviados y fallidos,
+    incluidos los errores de la API del proveedor que se lanzan como excepción.
+    """
+
+    def __init__(self, fail_silently=False, **kwargs):
+        super().__init__(fail_silently=fail_silently)
+        self.real = import_string(settings.EMAIL_BACKEND_REAL)(fail_silently=fail_silently, **kwargs)
+
+    def open(self):
+        return self.real.open()
+
+    def close(self):
+        return self.real.close()
+
+    def send_messages(self, email_messages):
+        mensajes = list(email_messages)
+        try:
+            enviados = self.real.send_messages(mensajes) or 0
+        except Exception:
+            CORREOS_FALLIDOS.inc(len(mensajes))
+            raise
+        CORREOS_ENVIADOS.inc(enviados)
+        if len(mensajes) > enviados:
+            CORREOS_FALLIDOS.inc(len(mensajes) - enviados)
+        return enviados
+
+
+# ------------------------------------------
+# Exposición
+# ------------------------------------------
+class _ColectorPendientes:
+    """Medidor calculado al momento de la lectura: revisiones del portal pendientes."""
+
+    def collect(self):
+        from .models import ArchivoTemporal
+
+        metrica = GaugeMetricFamily('corpad_archivos_temporales_pendientes', "Archivos del portal esperando revisión.")
+        try:
+            metrica.add_metric([], ArchivoTemporal.objects.count())
+        except Exception as e:
+            logger.warning(f"No se pudo contar ArchivoTemporal para /metrics: {e}")
+            return
+        yield metrica
+
+
+_REGISTRO_BD = CollectorRegistry()
+_REGISTRO_BD.register(_ColectorPendientes())
+
+
+def exposicion():
+    """Texto de todas las métricas (sumando los workers en modo multiproceso) y su content-type."""
+    if MULTIPROCESO:
+        from prometheus_client import multiprocess
+
+        registro = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registro)
+    else:
+        registro = REGISTRY
+    return generate_latest(registro) + generate_latest(_REGISTRO_BD), CONTENT_TYPE_LATEST
@@ -0,0 +1,139 @@
+# ==========================================
+# EXPEDIENTES/MIDDLEWARE.PY - INTERMEDIARIOS PROPIOS
+# ==========================================
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from whitenoise.middleware import WhiteNoiseMiddleware
+
+from . import metricas
+from .asincrono import trozos
+from .bitacora import cerrar_bufer, guardar_lote, iniciar_bufer, vaciar_bufer
+from .perfilado import instrumentar, medir, registrar
+
+
+class EstaticosMiddleware(WhiteNoiseMiddleware):
+    """
+    WhiteNoise apto para async. El original es solo síncrono: bajo ASGI partiría
+    la cadena de middlewares y cada petición ocuparía un hilo mientras espera a
+    la vista async. Aquí los estáticos se sirven con un iterador async.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response=None, settings=settings):
+        super().__init__(get_response, settings)
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return super().__call__(request)
+
+    async def __acall__(self, request):
+        if self.autorefresh:
+            static_file = self.find_file(request.path_info)
+        else:
+            static_file = self.files.get(request.path_info)
+        if static_file is None:
+            return await self.get_response(request)
+        respuesta = self.serve(static_file, request)
+        if respuesta.file_to_stream is not None:
+            respuesta.streaming_content = trozos(respuesta.file_to_stream)
+        return respuesta
+
+
+class BitacoraMiddleware:
+    """Acumula los registros de bitácora de la petición y los inserta en un solo lote al final."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        token = iniciar_bufer()
+        try:
+            return self.get_response(request)
+        finally:
+            vaciar_bufer(token)
+
+    async def __acall__(self, request):
+        token = iniciar_bufer()
+        try:
+            return await self.get_response(request)
+        finally:
+            await sync_to_async(guardar_lote)(cerrar_bufer(token))
+
+
+class PerfiladoMiddleware:
+    """
+    Mide consultas SQL (cantidad, repetidas, tiempo), render de plantillas y
+    WeasyPrint por petición, y los expone en la cabecera Server-Timing.
+
+    Solo se activa con PERFILADO=True; si no, Django lo descarta al arrancar.
+    Es solo síncrono: con ASGI y PERFILADO=True las vistas async corren
+    adaptadas (sirve para medir, no para producción).
+    """
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'PERFILADO', False):
+            raise MiddlewareNotUsed()
+        instrumentar()
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with medir() as m:
+            respuesta = self.get_response(request)
+        respuesta['Server-Timing'] = m.server_timing()
+        registrar(request, respuesta, m)
+        return respuesta
+
+
+class MetricasMiddleware:
+    """Latencia por nombre de URL, respuestas por clase de estado y peticiones en curso (ver metricas.py)."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        metricas.EN_CURSO.inc()
+        inicio = time.perf_counter()
+        try:
+            respuesta = self.get_response(request)
+        finally:
+            metricas.EN_CURSO.dec()
+        return self._registrar(request, respuesta, inicio)
+
+    async def __acall__(self, request):
+        metricas.EN_CURSO.inc()
+        inicio = time.perf_counter()
+        try:
+            respuesta = await self.get_response(request)
+        finally:
+            metricas.EN_CURSO.dec()
+        return self._registrar(request, respuesta, inicio)
+
+    def _registrar(self, request, respuesta, inicio):
+        match = getattr(request, 'resolver_match', None)
+        vista = (match.url_name if match else None) or 'sin_ruta'
+        if vista != 'metricas':
+            metricas.DURACION_VISTA.labels(vista, request.method).observe(time.perf_counter() - inicio)
+            metricas.PETICIONES.labels(vista, f"{respuesta.status_code // 100}xx").inc()
+        return respuesta
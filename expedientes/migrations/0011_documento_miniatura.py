@@ -0,0 +1,18 @@
+# Generated by Django 6.0.1 on 2026-10-19 10:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('expedientes', '0010_alter_documento_options_documento_fecha_vencimiento_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='documento',
+            name='miniatura',
+            field=models.ImageField(blank=True, editable=False, null=True, upload_to='miniaturas/'),
+        ),
+    ]
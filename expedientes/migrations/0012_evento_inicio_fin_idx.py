@@ -0,0 +1,17 @@
+# Generated by Django 6.0.1 on 2026-10-19 10:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('expedientes', '0011_documento_miniatura'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='evento',
+            index=models.Index(fields=['inicio', 'fin'], name='evento_inicio_fin_idx'),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 6.0.1 on 2026-10-19 10:55
+
+from django.db import migrations, models
+
+
+def borrar_recordatorios_guardados(apps, schema_editor):
+    # Los avisos de vencimiento ahora se derivan de Documento.fecha_vencimiento;
+    # los Eventos que se creaban al subir cada archivo quedarían duplicados.
+    Evento = apps.get_model('expedientes', 'Evento')
+    Evento.objects.filter(descripcion__startswith='Recordatorio automático de vencimiento para el documento:').delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('expedientes', '0012_evento_inicio_fin_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='evento',
+            name='recurrencia',
+            field=models.CharField(blank=True, choices=[('', 'Sin repetición'), ('semanal', 'Cada semana'), ('quincenal', 'Cada 2 semanas'), ('mensual', 'Cada mes')], default='', max_length=20),
+        ),
+        migrations.AddField(
+            model_name='evento',
+            name='recurrencia_hasta',
+            field=models.DateField(blank=True, null=True),
+        ),
+        migrations.RunPython(borrar_recordatorios_guardados, migrations.RunPython.noop),
+    ]
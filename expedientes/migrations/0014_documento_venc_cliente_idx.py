@@ -0,0 +1,17 @@
+# Generated by Django 6.0.1 on 2026-10-19 10:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('expedientes', '0013_evento_recurrencia'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='documento',
+            index=models.Index(fields=['fecha_vencimiento', 'cliente'], name='documento_venc_cliente_idx'),
+        ),
+    ]
@@ -0,0 +1,57 @@
+# Generated by Django 6.0.1 on 2026-10-19 11:00
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('expedientes', '0014_documento_venc_cliente_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BitacoraHistorica',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('accion', models.CharField(max_length=50)),
+                ('descripcion', models.TextField()),
+                ('fecha', models.DateTimeField()),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='bitacora',
+            name='cliente',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='bitacora', to='expedientes.cliente'),
+        ),
+        migrations.AlterField(
+            model_name='bitacora',
+            name='fecha',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='bitacora',
+            index=models.Index(fields=['cliente', '-fecha'], name='bitacora_cliente_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='bitacora',
+            index=models.Index(fields=['fecha'], name='bitacora_fecha_idx'),
+        ),
+        migrations.AddField(
+            model_name='bitacorahistorica',
+            name='cliente',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='bitacora_historica', to='expedientes.cliente'),
+        ),
+        migrations.AddField(
+            model_name='bitacorahistorica',
+            name='usuario',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='bitacorahistorica',
+            index=models.Index(fields=['cliente', '-fecha'], name='bitacora_hist_cliente_idx'),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 6.0.1 on 2026-10-19 11:38
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('expedientes', '0015_bitacora_indices_historica'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VersionCotizacion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('numero', models.PositiveIntegerField()),
+                ('huella', models.CharField(max_length=64)),
+                ('datos', models.JSONField()),
+                ('pdf', models.FileField(upload_to='cotizaciones_versiones/%Y/%m/')),
+                ('fecha', models.DateTimeField(auto_now_add=True)),
+                ('cotizacion', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='versiones', to='expedientes.cotizacion')),
+                ('creada_por', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-numero'],
+                'constraints': [models.UniqueConstraint(fields=('cotizacion', 'huella'), name='version_cotizacion_huella_uniq'), models.UniqueConstraint(fields=('cotizacion', 'numero'), name='version_cotizacion_numero_uniq')],
+            },
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 6.0.1 on 2026-10-19 13:05
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('expedientes', '0016_version_cotizacion'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LoteEstadosCuenta',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('periodo', models.DateField(help_text='Primer día del mes', unique=True)),
+                ('estado', models.CharField(choices=[('pendiente', 'Pendiente'), ('en_curso', 'En curso'), ('terminado', 'Terminado'), ('con_errores', 'Con errores')], default='pendiente', max_length=20)),
+                ('fecha_creacion', models.DateTimeField(auto_now_add=True)),
+                ('actualizado', models.DateTimeField(auto_now=True)),
+                ('fecha_fin', models.DateTimeField(blank=True, null=True)),
+                ('creado_por', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-periodo'],
+            },
+        ),
+        migrations.CreateModel(
+            name='EstadoCuenta',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('error', models.TextField(blank=True)),
+                ('fecha', models.DateTimeField(blank=True, null=True)),
+                ('cliente', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='estados_cuenta', to='expedientes.cliente')),
+                ('documento', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='expedientes.documento')),
+                ('lote', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='estados', to='expedientes.loteestadoscuenta')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('lote', 'cliente'), name='estado_cuenta_lote_cliente_uniq')],
+            },
+        ),
+    ]
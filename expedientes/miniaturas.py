@@ -0,0 +1,106 @@
+# ==========================================
+# EXPEDIENTES/MINIATURAS.PY - MINIATURAS WEBP DEL DRIVE
+# ==========================================
+import io
+import logging
+
+from django.core.files.base import ContentFile
+
+logger = logging.getLogger(__name__)
+
+TAMANO_MINIATURA = (320, 320)
+CALIDAD_WEBP = 70
+
+EXTENSIONES_IMAGEN = {'jpg', 'jpeg', 'png', 'gif', 'webp'}
+EXTENSIONES_PDF = {'pdf'}
+
+
+def extension(nombre):
+    return nombre.rsplit('.', 1)[-1].lower() if nombre and '.' in nombre else ''
+
+
+def admite_miniatura(nombre):
+    """Indica si el archivo es una imagen o un PDF del que se puede sacar miniatura."""
+    ext = extension(nombre)
+    return ext in EXTENSIONES_IMAGEN or ext in EXTENSIONES_PDF
+
+
+def _rasterizar_pdf(archivo):
+    """
+    Convierte la primera página del PDF en una imagen PIL.
+
+    Usa pypdfium2; si no está instalado devuelve None y el documento se
+    queda sin miniatura (el drive sigue mostrando el ícono genérico).
+    """
+    try:
+        import pypdfium2 as pdfium
+    except ImportError:
+        logger.warning("pypdfium2 no está instalado; se omiten miniaturas de PDF.")
+        return None
+
+    pdf = pdfium.PdfDocument(archivo.read())
+    try:
+        pagina = pdf[0]
+        ancho, alto = pagina.get_size()
+        escala = max(TAMANO_MINIATURA[0] / ancho, TAMANO_MINIATURA[1] / alto)
+        return pagina.render(scale=escala).to_pil()
+    finally:
+        pdf.close()
+
+
+def _crear_webp(archivo, ext):
+    """Devuelve los bytes WebP de la miniatura o None si el formato no aplica."""
+    from PIL import Image, ImageOps
+
+    if ext in EXTENSIONES_PDF:
+        imagen = _rasterizar_pdf(archivo)
+        if imagen is None:
+            return None
+    else:
+        imagen = Image.open(archivo)
+        imagen.draft('RGB', TAMANO_MINIATURA)  # Los JPEG grandes se decodifican ya reducidos
+        imagen = ImageOps.exif_transpose(imagen)
+
+    if imagen.mode not in ('RGB', 'RGBA'):
+        imagen = imagen.convert('RGBA' if 'A' in imagen.getbands() else 'RGB')
+    imagen.thumbnail(TAMANO_MINIATURA, Image.LANCZOS)
+
+    buffer = io.BytesIO()
+    imagen.save(buffer, format='WEBP', quality=CALIDAD_WEBP, method=4)
+    return buffer.getvalue()
+
+
+def generar_miniatura(documento_id):
+    """
+    Genera (o regenera) la miniatura WebP de un Documento.
+
+    Uso:
+        transaction.on_commit(lambda: encolar(generar_miniatura, doc.id))
+
+    Si el archivo del documento cambió mientras se generaba la miniatura,
+    el resultado se descarta; el reemplazo ya encoló su propia generación.
+    """
+    from .models import Documento
+
+    doc = Documento.objects.filter(id=documento_id).first()
+    if not doc or not doc.archivo or not admite_miniatura(doc.archivo.name):
+        return None
+
+    archivo_original = doc.archivo.name
+    with doc.archivo.open('rb') as f:
+        contenido = _crear_webp(f, extension(archivo_original))
+    if contenido is None:
+        return None
+
+    miniatura_anterior = doc.miniatura.name if doc.miniatura else None
+    doc.miniatura.save(f"{doc.id}.webp", ContentFile(contenido), save=False)
+
+    # update() en lugar de save() para no disparar otra vez las señales del modelo
+    actualizados = Documento.objects.filter(id=doc.id, archivo=archivo_original).update(miniatura=doc.miniatura.name)
+    if not actualizados:
+        doc.miniatura.storage.delete(doc.miniatura.name)
+        return None
+
+    if miniatura_anterior and miniatura_anterior != doc.miniatura.name:
+        doc.miniatura.storage.delete(miniatura_anterior)
+    return doc.miniatura.name
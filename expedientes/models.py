@@ -1,11 +1,14 @@
 import uuid
+from datetime import timedelta
 from decimal import Decimal
 from django.contrib.auth.models import AbstractUser
 from django.db import models
 from django.core.validators import FileExtensionValidator
 from django.utils import timezone
-from django.db.models.signals import post_save
+from django.utils.dateparse import parse_date
+from django.db.models.signals import post_save, pre_save, post_delete, m2m_changed
 from django.dispatch import receiver
+from django.db import transaction
 from django.conf import settings
 
 # ==========================================
@@ -74,6 +77,54 @@ class CampoAdicional(models.Model):
 # ==========================================
 # 3. DRIVE Y ARCHIVOS
 # ==========================================
+# --- DEFINICIÓN MAESTRA DE REQUISITOS (Basada en PDF del Cliente) ---
+# Constante del módulo: se arma una vez al importar (y antes del fork con preload de gunicorn)
+REQUISITOS_CARPETA = {
+    'CARPETA ADMINISTRATIVA': (
+        'ACTA CONSTITUTIVA', 'PODER NOTARIAL', 'IDENTIFICACIÓN DEL REPRESENTANTE LEGAL', 
+        'CONSTANCIA DE SITUACIÓN FISCAL', 'PAGO PREDIAL', 'PAGO DE AGUA', 
+        'PLANO', 'ACREDITACION DE PROPIEDAD O POSESIÓN'
+    ),
+    'LICENCIA DE FUNCIONAMIENTO': (
+        'LICENCIA DE FUNCIONAMIENTO ANTERIOR', 'ACUSE DE INGRESO', 'ORDEN DE PAGO', 
+        'RECIBO OFICIAL DE PAGO', 'FACTURA PAGO DE DERECHOS', 'COMPROBANTE DE APORTACIÓN', 
+        'LICENCIA DE FUNCIONAMIENTO ACTUAL'
+    ),
+    'PROGRAMA ESPECIFICO DE PROTECCIÓN CIVIL': (
+        'PEPC VIGENTE', 'DICTAMEN ESTRUCTURAL', 'DICTAMEN ELECTRICO', 'ALERTAMIENTO SISMICO', 
+        'RESPONSIVA DE EXTINTORES', 'POLIZA DE SEGURO', 'CONSTANCIAS DE CAPACITACIÓN', 
+        'CONSTANCIAS 1ER SIMULACRO', 'CONSTANCIAS 2DO SIMULACRO', 'CONSTANCIAS 3ER SIMULACRO'
+    ),
+    'PROTECCIÓN CIVIL MUNICIPAL': (
+        'DICTAMEN ANTERIOR', 'ACUSE DE INGRESO', 'ORDEN DE PAGO', 'RECIBO OFICIAL DE PAGO', 
+        'FACTURA PAGO DE DERECHOS', 'COMPROBANTE DE APORTACIÓN', 'DICTAMEN ACTUAL'
+    ),
+    'PROTECCIÓN CIVIL ESTATAL': (
+        'REGISTRO ANTERIOR', 'ACUSE DE INGRESO', 'ORDEN DE PAGO', 'RECIBO OFICIAL DE PAGO', 
+        'FACTURA PAGO DE DERECHOS', 'COMPROBANTE DE APORTACIÓN', 'REGISTRO ACTUAL'
+    ),
+    'MEDIO AMBIENTE': (
+        'AUTORIZACIONES ANTERIORES', 'ACUSES DE INGRESO', 'ANALISIS DE AGUA RESIDUAL VIGENTE', 
+        'ANALISIS DE EMISIONES VIGENTE', 'ORDEN DE PAGO', 'RECIBO OFICIAL DE PAGO', 
+        'FACTURA PAGO DE DERECHOS', 'COMPROBANTE DE APORTACIÓN', 'VISTO BUENO ACTUAL', 
+        'REGISTRO DE DESCARGA DE AGUAS RESIDUALES ACTUAL', 'LICENCIA DE EMISIONES A LA ATMOSFERA ACTUAL'
+    ),
+    'REGISTRO AMBIENTAL ESTATAL': (
+        'AUTORIZACION ANTERIOR', 'ACUSES DE INGRESO', 'FACTURA DE RECOLECCIÓN DE BASURA', 
+        'CONTRATO DE RECOLECCIÓN DE BASURA', 'REGISTRO DE RECOLECTOR DE BASURA', 'ORDEN DE PAGO', 
+        'RECIBO OFICIAL DE PAGO', 'FACTURA PAGO DE DERECHOS', 'COMPROBANTE DE APORTACIÓN', 
+        'AUTORIZACIÓN ACTUAL'
+    ),
+    'CEDULA DE ZONIFICACIÓN': (
+        'REGISTRO ANTERIOR', 'ACUSE DE INGRESO', 'ORDEN DE PAGO', 'RECIBO OFICIAL DE PAGO', 
+        'FACTURA PAGO DE DERECHOS', 'COMPROBANTE DE APORTACIÓN', 'REGISTRO ACTUAL'
+    ),
+    'LICENCIA DE USO DE SUELO': (
+        'REGISTRO ANTERIOR', 'ACUSE DE INGRESO', 'ORDEN DE PAGO', 'RECIBO OFICIAL DE PAGO', 
+        'FACTURA PAGO DE DERECHOS', 'COMPROBANTE DE APORTACIÓN', 'REGISTRO ACTUAL'
+    ),
+}
+
 class Carpeta(models.Model):
     nombre = models.CharField(max_length=255, db_index=True)
     cliente = models.ForeignKey(Cliente, on_delete=models.CASCADE, related_name='carpetas_drive')
@@ -85,58 +136,16 @@ class Carpeta(models.Model):
         return f"{self.nombre} - {self.cliente.nombre_empresa}"
 
     def obtener_detalle_cumplimiento(self):
-        # --- DEFINICIÓN MAESTRA DE REQUISITOS (Basada en PDF del Cliente) ---
-        requisitos = {
-            'CARPETA ADMINISTRATIVA': [
-                'ACTA CONSTITUTIVA', 'PODER NOTARIAL', 'IDENTIFICACIÓN DEL REPRESENTANTE LEGAL', 
-                'CONSTANCIA DE SITUACIÓN FISCAL', 'PAGO PREDIAL', 'PAGO DE AGUA', 
-                'PLANO', 'ACREDITACION DE PROPIEDAD O POSESIÓN'
-            ],
-            'LICENCIA DE FUNCIONAMIENTO': [
-                'LICENCIA DE FUNCIONAMIENTO ANTERIOR', 'ACUSE DE INGRESO', 'ORDEN DE PAGO', 
-                'RECIBO OFICIAL DE PAGO', 'FACTURA PAGO DE DERECHOS', 'COMPROBANTE DE APORTACIÓN', 
-                'LICENCIA DE FUNCIONAMIENTO ACTUAL'
-            ],
-            'PROGRAMA ESPECIFICO DE PROTECCIÓN CIVIL': [
-                'PEPC VIGENTE', 'DICTAMEN ESTRUCTURAL', 'DICTAMEN ELECTRICO', 'ALERTAMIENTO SISMICO', 
-                'RESPONSIVA DE EXTINTORES', 'POLIZA DE SEGURO', 'CONSTANCIAS DE CAPACITACIÓN', 
-                'CONSTANCIAS 1ER SIMULACRO', 'CONSTANCIAS 2DO SIMULACRO', 'CONSTANCIAS 3ER SIMULACRO'
-            ],
-            'PROTECCIÓN CIVIL MUNICIPAL': [
-                'DICTAMEN ANTERIOR', 'ACUSE DE INGRESO', 'ORDEN DE PAGO', 'RECIBO OFICIAL DE PAGO', 
-                'FACTURA PAGO DE DERECHOS', 'COMPROBANTE DE APORTACIÓN', 'DICTAMEN ACTUAL'
-            ],
-            'PROTECCIÓN CIVIL ESTATAL': [
-                'REGISTRO ANTERIOR', 'ACUSE DE INGRESO', 'ORDEN DE PAGO', 'RECIBO OFICIAL DE PAGO', 
-                'FACTURA PAGO DE DERECHOS', 'COMPROBANTE DE APORTACIÓN', 'REGISTRO ACTUAL'
-            ],
-            'MEDIO AMBIENTE': [
-                'AUTORIZACIONES ANTERIORES', 'ACUSES DE INGRESO', 'ANALISIS DE AGUA RESIDUAL VIGENTE', 
-                'ANALISIS DE EMISIONES VIGENTE', 'ORDEN DE PAGO', 'RECIBO OFICIAL DE PAGO', 
-                'FACTURA PAGO DE DERECHOS', 'COMPROBANTE DE APORTACIÓN', 'VISTO BUENO ACTUAL', 
-                'REGISTRO DE DESCARGA DE AGUAS RESIDUALES ACTUAL', 'LICENCIA DE EMISIONES A LA ATMOSFERA ACTUAL'
-            ],
-            'REGISTRO AMBIENTAL ESTATAL': [
-                'AUTORIZACION ANTERIOR', 'ACUSES DE INGRESO', 'FACTURA DE RECOLECCIÓN DE BASURA', 
-                'CONTRATO DE RECOLECCIÓN DE BASURA', 'REGISTRO DE RECOLECTOR DE BASURA', 'ORDEN DE PAGO', 
-                'RECIBO OFICIAL DE PAGO', 'FACTURA PAGO DE DERECHOS', 'COMPROBANTE DE APORTACIÓN', 
-                'AUTORIZACIÓN ACTUAL'
-            ],
-            'CEDULA DE ZONIFICACIÓN': [
-                'REGISTRO ANTERIOR', 'ACUSE DE INGRESO', 'ORDEN DE PAGO', 'RECIBO OFICIAL DE PAGO', 
-                'FACTURA PAGO DE DERECHOS', 'COMPROBANTE DE APORTACIÓN', 'REGISTRO ACTUAL'
-            ],
-            'LICENCIA DE USO DE SUELO': [
-                'REGISTRO ANTERIOR', 'ACUSE DE INGRESO', 'ORDEN DE PAGO', 'RECIBO OFICIAL DE PAGO', 
-                'FACTURA PAGO DE DERECHOS', 'COMPROBANTE DE APORTACIÓN', 'REGISTRO ACTUAL'
-            ]
-        }
-
-        nombre_key = self.nombre.upper()
-        if nombre_key not in requisitos:
+        # Se guarda por carpeta con la versión del cliente: las señales de Documento y Carpeta la cambian
+        from .cache import CUMPLIMIENTO
+
+        lista_req = REQUISITOS_CARPETA.get(self.nombre.upper())
+        if lista_req is None:
             return None
+        clave = CUMPLIMIENTO.clave(self.pk, CUMPLIMIENTO.version(self.cliente_id))
+        return CUMPLIMIENTO.obtener(clave, lambda: self._calcular_cumplimiento(lista_req))
 
-        lista_req = requisitos[nombre_key]
+    def _calcular_cumplimiento(self, lista_req):
         detalle = []
         for req in lista_req:
             # Busca archivos que contengan el nombre del requisito (flexible)
@@ -169,6 +178,40 @@ class Expediente(models.Model):
     prioridad = models.IntegerField(choices=((1, 'Baja'), (2, 'Media'), (3, 'Crítica')), default=2)
     creado_el = models.DateTimeField(auto_now_add=True)
 
+class DocumentoQuerySet(models.QuerySet):
+    """Consultas de vencimiento. Todas filtran por rango de fecha y van por el índice (fecha_vencimiento, cliente)."""
+
+    def con_vencimiento(self):
+        return self.filter(fecha_vencimiento__isnull=False)
+
+    def visibles_para(self, usuario):
+        from .acceso import alcance_de
+
+        return self.filter(alcance_de(usuario).filtro())
+
+    def vencidos(self, hoy=None):
+        hoy = hoy or timezone.localdate()
+        return self.filter(fecha_vencimiento__lt=hoy)
+
+    def por_vencer(self, dias, hoy=None, incluir_vencidos=False):
+        """Documentos que vencen entre hoy y hoy + `dias` (o antes, si `incluir_vencidos`)."""
+        hoy = hoy or timezone.localdate()
+        limite = hoy + timedelta(days=dias)
+        if incluir_vencidos:
+            return self.filter(fecha_vencimiento__lte=limite)
+        return self.filter(fecha_vencimiento__gte=hoy, fecha_vencimiento__lte=limite)
+
+    def resumen_por_cliente(self, hoy=None):
+        """Conteos por cliente calculados en la BD (un GROUP BY), ordenados por el vencimiento más próximo."""
+        hoy = hoy or timezone.localdate()
+        return self.values('cliente_id', 'cliente__nombre_empresa').annotate(
+            total=models.Count('id'),
+            vencidos=models.Count('id', filter=models.Q(fecha_vencimiento__lt=hoy)),
+            urgentes=models.Count('id', filter=models.Q(fecha_vencimiento__gte=hoy, fecha_vencimiento__lte=hoy + timedelta(days=7))),
+            proximo=models.Min('fecha_vencimiento'),
+        ).order_by('proximo', 'cliente__nombre_empresa')
+
+
 class Documento(models.Model):
     cliente = models.ForeignKey(Cliente, on_delete=models.CASCADE, related_name='documentos')
     carpeta = models.ForeignKey(Carpeta, on_delete=models.CASCADE, related_name='documentos', null=True, blank=True)
@@ -177,6 +220,10 @@ class Documento(models.Model):
     subido_por = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True)
     fecha_subida = models.DateTimeField(auto_now_add=True)
     fecha_vencimiento = models.DateField(null=True, blank=True, verbose_name="Fecha de Vencimiento")
+    # Miniatura WebP (imágenes y primera página de PDFs). La genera el pool de tareas tras la subida.
+    miniatura = models.ImageField(upload_to='miniaturas/', null=True, blank=True, editable=False)
+
+    objects = DocumentoQuerySet.as_manager()
 
     def __str__(self):
         return self.nombre_archivo
@@ -185,6 +232,10 @@ class Documento(models.Model):
         verbose_name = "Documento"
         verbose_name_plural = "Documentos"
         ordering = ['-fecha_subida']
+        indexes = [
+            # Cubre los rangos de vencimiento y el agrupado por cliente sin ir a la tabla
+            models.Index(fields=['fecha_vencimiento', 'cliente'], name='documento_venc_cliente_idx'),
+        ]
 
 # ==========================================
 # 4. GESTIÓN
@@ -199,10 +250,31 @@ class Tarea(models.Model):
 
 class Bitacora(models.Model):
     usuario = models.ForeignKey(Usuario, on_delete=models.SET_NULL, null=True)
-    cliente = models.ForeignKey(Cliente, on_delete=models.CASCADE)
+    cliente = models.ForeignKey(Cliente, on_delete=models.CASCADE, related_name='bitacora')
     accion = models.CharField(max_length=50)
     descripcion = models.TextField()
-    fecha = models.DateTimeField(auto_now_add=True)
+    # Se fija al registrar la acción (no al insertar): los registros se guardan en lote al final de la petición
+    fecha = models.DateTimeField(default=timezone.now, editable=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['cliente', '-fecha'], name='bitacora_cliente_fecha_idx'),
+            models.Index(fields=['fecha'], name='bitacora_fecha_idx'),
+        ]
+
+class BitacoraHistorica(models.Model):
+    """Registros de bitácora archivados (ver `manage.py archivar_bitacora`). Conserva el id original."""
+    id = models.BigIntegerField(primary_key=True)
+    usuario = models.ForeignKey(Usuario, on_delete=models.SET_NULL, null=True)
+    cliente = models.ForeignKey(Cliente, on_delete=models.CASCADE, related_name='bitacora_historica')
+    accion = models.CharField(max_length=50)
+    descripcion = models.TextField()
+    fecha = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['cliente', '-fecha'], name='bitacora_hist_cliente_idx'),
+        ]
 
 class Plantilla(models.Model):
     nombre = models.CharField(max_length=100)
@@ -340,6 +412,32 @@ class ItemCotizacion(models.Model):
         super().save(*args, **kwargs)
         self.cotizacion.calcular_totales()
 
+class VersionCotizacion(models.Model):
+    """
+    Fotografía de una cotización tal como se envió: partidas y totales en JSON
+    compacto más el PDF renderizado una sola vez. No se edita: si la cotización
+    cambia, el siguiente envío crea otra versión. La huella (sha256 de `datos`)
+    permite que descargas, reenvíos y la conversión a cliente lean el archivo
+    guardado en lugar de renderizar (ver cotizacion_pdf.py).
+    """
+    cotizacion = models.ForeignKey(Cotizacion, related_name='versiones', on_delete=models.CASCADE)
+    numero = models.PositiveIntegerField()
+    huella = models.CharField(max_length=64)
+    datos = models.JSONField()
+    pdf = models.FileField(upload_to='cotizaciones_versiones/%Y/%m/')
+    creada_por = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True)
+    fecha = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Cotización #{self.cotizacion_id} v{self.numero}"
+
+    class Meta:
+        ordering = ['-numero']
+        constraints = [
+            models.UniqueConstraint(fields=['cotizacion', 'huella'], name='version_cotizacion_huella_uniq'),
+            models.UniqueConstraint(fields=['cotizacion', 'numero'], name='version_cotizacion_numero_uniq'),
+        ]
+
 # ==========================================
 # 6. FINANZAS
 # ==========================================
@@ -375,6 +473,37 @@ class Pago(models.Model):
         self.cuenta.monto_pagado = sum(p.monto for p in self.cuenta.pagos.all())
         self.cuenta.save()
 
+class LoteEstadosCuenta(models.Model):
+    """
+    Generación de los estados de cuenta de un mes, un PDF por cliente en su
+    drive. Es reanudable: cada cliente tiene su renglón (EstadoCuenta) y una
+    corrida nueva solo procesa los que no tienen documento (ver estados_cuenta.py).
+    """
+    ESTADOS = (('pendiente', 'Pendiente'), ('en_curso', 'En curso'), ('terminado', 'Terminado'), ('con_errores', 'Con errores'))
+    periodo = models.DateField(unique=True, help_text="Primer día del mes")
+    estado = models.CharField(max_length=20, choices=ESTADOS, default='pendiente')
+    creado_por = models.ForeignKey(Usuario, on_delete=models.SET_NULL, null=True, blank=True)
+    fecha_creacion = models.DateTimeField(auto_now_add=True)
+    # Latido de la corrida: una "en_curso" sin latido reciente se considera caída y se puede reanudar
+    actualizado = models.DateTimeField(auto_now=True)
+    fecha_fin = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-periodo']
+
+    def __str__(self):
+        return f"Estados de cuenta {self.periodo:%m/%Y}"
+
+class EstadoCuenta(models.Model):
+    lote = models.ForeignKey(LoteEstadosCuenta, related_name='estados', on_delete=models.CASCADE)
+    cliente = models.ForeignKey(Cliente, related_name='estados_cuenta', on_delete=models.CASCADE)
+    documento = models.ForeignKey('Documento', on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    error = models.TextField(blank=True)
+    fecha = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=['lote', 'cliente'], name='estado_cuenta_lote_cliente_uniq')]
+
 # ==========================================
 # 7. AGENDA
 # ==========================================
@@ -389,6 +518,14 @@ class Evento(models.Model):
     descripcion = models.TextField(blank=True)
     completado = models.BooleanField(default=False)
 
+    # Repetición (audiencias periódicas): una sola fila, las ocurrencias se calculan al consultar la agenda
+    RECURRENCIAS = (('', 'Sin repetición'), ('semanal', 'Cada semana'), ('quincenal', 'Cada 2 semanas'), ('mensual', 'Cada mes'))
+    recurrencia = models.CharField(max_length=20, choices=RECURRENCIAS, default='', blank=True)
+    recurrencia_hasta = models.DateField(null=True, blank=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['inicio', 'fin'], name='evento_inicio_fin_idx')]
+
     @property
     def color_hex(self):
         colores = {'audiencia': '#ef4444', 'vencimiento': '#f59e0b', 'reunion': '#3b82f6', 'tramite': '#10b981', 'personal': '#6b7280'}
@@ -430,6 +567,195 @@ def crear_carpetas_base(sender, instance, created, **kwargs):
                     defaults={'es_expediente': False}
                 )
 
+@receiver(pre_save, sender=Documento)
+def detectar_reemplazo_archivo(sender, instance, raw=False, **kwargs):
+    # Si el archivo cambió, la miniatura anterior ya no corresponde
+    instance._archivo_reemplazado = False
+    instance._vencimiento_anterior = None
+    if raw or not instance.pk:
+        return
+    anterior = Documento.objects.filter(pk=instance.pk).values_list('archivo', 'miniatura', 'fecha_vencimiento').first()
+    if anterior:
+        instance._vencimiento_anterior = anterior[2]
+    if anterior and anterior[0] != instance.archivo.name:
+        instance._archivo_reemplazado = True
+        if anterior[1]:
+            storage, nombre = instance.miniatura.storage, anterior[1]
+            transaction.on_commit(lambda: storage.delete(nombre))
+        instance.miniatura = None
+
+@receiver(post_save, sender=Documento)
+def programar_miniatura(sender, instance, created, raw=False, **kwargs):
+    from .miniaturas import admite_miniatura, generar_miniatura
+    from .tareas import encolar
+
+    if raw or not (created or getattr(instance, '_archivo_reemplazado', False)):
+        return
+    if instance.archivo and admite_miniatura(instance.archivo.name):
+        documento_id = instance.pk
+        transaction.on_commit(lambda: encolar(generar_miniatura, documento_id))
+
+@receiver(post_delete, sender=Documento)
+def eliminar_miniatura(sender, instance, **kwargs):
+    if instance.miniatura:
+        instance.miniatura.delete(save=False)
+
+@receiver(post_save, sender=Documento)
+@receiver(post_delete, sender=Documento)
+def invalidar_alertas_vencimiento(sender, instance, **kwargs):
+    # Los avisos de vencimiento se derivan de fecha_vencimiento: refrescamos los meses de la agenda donde caen
+    from .calendario import invalidar_fechas
+    from .recordatorios import fechas_alerta
+
+    nueva = instance.fecha_vencimiento
+    if isinstance(nueva, str):
+        nueva = parse_date(nueva)
+    anterior = getattr(instance, '_vencimiento_anterior', None)
+    if kwargs.get('created') is False and nueva == anterior:
+        return
+    invalidar_fechas(fechas_alerta(nueva) + fechas_alerta(anterior))
+
+@receiver(pre_save, sender=Documento)
+@receiver(pre_save, sender='expedientes.ArchivoTemporal')
+def medir_subida(sender, instance, raw=False, **kwargs):
+    # El tamaño se toma del archivo subido antes de guardarlo: después solo lo sabría el storage (remoto)
+    archivo = instance.archivo
+    instance._bytes_subidos = archivo.size if archivo and not raw and not archivo._committed else None
+
+@receiver(post_save, sender=Documento)
+@receiver(post_save, sender='expedientes.ArchivoTemporal')
+def contar_subida(sender, instance, created, raw=False, **kwargs):
+    from .metricas import registrar_subida
+
+    if created and not raw and instance.archivo:
+        registrar_subida('drive' if sender is Documento else 'portal', getattr(instance, '_bytes_subidos', None))
+
+@receiver(post_save, sender=Documento)
+@receiver(post_delete, sender=Documento)
+@receiver(post_save, sender=Carpeta)
+@receiver(post_delete, sender=Carpeta)
+def invalidar_cumplimiento(sender, instance, raw=False, **kwargs):
+    # El detalle de requisitos depende de los documentos y del nombre de cada carpeta del cliente
+    from .cache import CUMPLIMIENTO
+
+    if not raw and instance.cliente_id:
+        CUMPLIMIENTO.invalidar(instance.cliente_id)
+
+def _invalidar_alcance_y_derivados(*usuarios):
+    # El alcance se guarda en la caché y encima de él se arman otras por usuario: cambian juntas
+    from .acceso import invalidar_alcance
+    from .calendario import invalidar_usuarios as invalidar_agenda
+    from .context_processors import invalidar_avisos
+
+    invalidar_alcance(*usuarios)
+    invalidar_avisos(*usuarios)
+    invalidar_agenda(*usuarios)
+
+@receiver(post_save, sender=Usuario)
+@receiver(post_delete, sender=Usuario)
+def invalidar_alcance_usuario(sender, instance, update_fields=None, **kwargs):
+    # El login solo toca last_login: no cambia el alcance
+    if update_fields and set(update_fields) <= {'last_login'}:
+        return
+    _invalidar_alcance_y_derivados(instance)
+
+@receiver(m2m_changed, sender=Usuario.clientes_asignados.through)
+def invalidar_alcance_asignaciones(sender, instance, action, reverse, pk_set, **kwargs):
+    if action == 'pre_clear' and reverse:
+        # Desde el cliente (cliente.abogados_asignados.clear()) pk_set llega vacío: se leen antes de borrar
+        instance._abogados_previos = list(instance.abogados_asignados.values_list('pk', flat=True))
+        return
+    if not action.startswith('post_'):
+        return
+    if not reverse:
+        usuarios = [instance]
+    elif action == 'post_clear':
+        usuarios = getattr(instance, '_abogados_previos', [])
+    else:
+        usuarios = list(pk_set or [])
+    _invalidar_alcance_y_derivados(*usuarios)
+
+@receiver(post_save, sender=Tarea)
+@receiver(post_delete, sender=Tarea)
+@receiver(post_save, sender=CuentaPorCobrar)
+@receiver(post_delete, sender=CuentaPorCobrar)
+@receiver(post_save, sender=Evento)
+@receiver(post_delete, sender=Evento)
+@receiver(post_save, sender=Cliente)
+def invalidar_avisos_relacionados(sender, instance, raw=False, created=False, **kwargs):
+    # La campana y el menú de base.html se guardan por usuario: se invalida a quienes ven al cliente
+    from .context_processors import invalidar_avisos_cliente
+
+    if raw or (sender is Cliente and created):
+        return
+    cliente_id = instance.pk if sender is Cliente else instance.cliente_id
+    # Los eventos también se ven por su dueño (eventos personales sin cliente)
+    invalidar_avisos_cliente(cliente_id, getattr(instance, 'usuario_id', None))
+
+@receiver(pre_save, sender=Cliente)
+def recordar_nombre_cliente(sender, instance, raw=False, **kwargs):
+    # Solo un cambio de nombre toca la agenda: el resto de los campos no se muestra ahí
+    instance._nombre_anterior = None
+    if not raw and instance.pk:
+        instance._nombre_anterior = Cliente.objects.filter(pk=instance.pk).values_list('nombre_empresa', flat=True).first()
+
+@receiver(post_save, sender=Cliente)
+def invalidar_agenda_cliente(sender, instance, raw=False, created=False, **kwargs):
+    # Los eventos y avisos de la agenda muestran el nombre del cliente
+    from .calendario import invalidar_clientes
+
+    anterior = getattr(instance, '_nombre_anterior', None)
+    if not (raw or created) and anterior is not None and anterior != instance.nombre_empresa:
+        invalidar_clientes()
+
+@receiver(pre_save, sender=Evento)
+def recordar_rango_evento(sender, instance, raw=False, **kwargs):
+    # Guardamos el rango anterior para invalidar también los meses de donde se movió
+    instance._rango_anterior = None
+    if not raw and instance.pk:
+        instance._rango_anterior = Evento.objects.filter(pk=instance.pk).values_list('inicio', 'fin', 'recurrencia').first()
+
+@receiver(post_save, sender=Evento)
+@receiver(post_delete, sender=Evento)
+def invalidar_agenda(sender, instance, **kwargs):
+    from .calendario import invalidar_rango, invalidar_recurrentes, parsear_limite
+
+    anterior = getattr(instance, '_rango_anterior', None)
+    if instance.recurrencia or (anterior and anterior[2]):
+        invalidar_recurrentes()
+
+    inicio, fin = instance.inicio, instance.fin
+    if isinstance(inicio, str): inicio = parsear_limite(inicio)
+    if isinstance(fin, str): fin = parsear_limite(fin)
+    invalidar_rango(inicio, fin)
+    if anterior:
+        invalidar_rango(anterior[0], anterior[1])
+
+@receiver(post_delete, sender=VersionCotizacion)
+def eliminar_pdf_version(sender, instance, **kwargs):
+    # Después del commit: si la transacción se revierte la versión sigue existiendo con su archivo
+    if instance.pdf:
+        storage, nombre = instance.pdf.storage, instance.pdf.name
+        transaction.on_commit(lambda: storage.delete(nombre))
+
+@receiver(post_save, sender=VersionCotizacion)
+@receiver(post_delete, sender=VersionCotizacion)
+def invalidar_cotizacion_publica(sender, instance, raw=False, **kwargs):
+    # El enlace público muestra la última versión: se arma de nuevo en la siguiente visita
+    from .cache import PUBLICAS
+
+    if not raw:
+        PUBLICAS.invalidar(instance.cotizacion.folio)
+
+@receiver(post_save, sender=CuentaPorCobrar)
+@receiver(post_delete, sender=CuentaPorCobrar)
+def invalidar_cartera(sender, instance, raw=False, **kwargs):
+    # Pago.save vuelve a guardar su cuenta, así que los pagos también pasan por aquí
+    from .cartera import invalidar
+
+    if not raw:
+        invalidar()
+
 # ==========================================
 # 9. CARGA EXTERNA (CLIENT PORTAL)
 # ==========================================
@@ -0,0 +1,356 @@
+# ==========================================
+# EXPEDIENTES/PDF.PY - MOTOR DE PDF (WEASYPRINT)
+# ==========================================
+"""
+Las plantillas de PDF piden sus recursos (logo, CSS, fuentes) con URLs
+absolutas a nuestro propio dominio: "{{ base_url }}static/img/logo.png".
+Con el fetcher de WeasyPrint eso es una petición HTTP de vuelta a gunicorn,
+que ocupa otro worker mientras la petición original espera.
+
+Aquí se resuelven en el mismo proceso:
+    - STATIC_URL -> STATIC_ROOT (collectstatic) o los finders en desarrollo.
+    - MEDIA_URL  -> el storage por defecto.
+
+Los bytes se guardan en un LRU por proceso, así que el logo se lee una vez
+por worker. La opción `cache` de WeasyPrint es un dict nuevo en cada render:
+ahí también guarda los bytes crudos de cada imagen y los lee hasta escribir
+el PDF, así que no puede compartirse ni tener tope. Las URLs de otros
+dominios siguen el camino normal.
+
+Además el CSS de las plantillas vive en static/pdf/ y se compila una sola vez
+por proceso (HOJAS), igual que la FontConfiguration: renderizar() solo paga
+el HTML del documento. Con gunicorn --preload arranque.py lo prepara en el
+maestro y los workers lo heredan en el fork.
+
+Los lotes grandes (exportación masiva de cotizaciones) no renderizan en los
+hilos del worker sino en un pool de procesos (renderizar_en_proceso): el
+layout de WeasyPrint es CPU pura y con el GIL dos hilos no avanzan a la vez.
+"""
+import hashlib
+import mimetypes
+import multiprocessing
+import os
+import signal
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from collections import OrderedDict
+from urllib.parse import unquote, urlsplit
+
+from django.conf import settings
+from django.contrib.staticfiles import finders
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.files.storage import default_storage
+from django.http.request import split_domain_port, validate_host
+
+# Archivos más grandes se sirven igual, pero no se guardan en memoria
+TAMANO_MAX_RECURSO = 2 * 1024 * 1024
+MAX_RECURSOS = 64
+
+
+class LRU(OrderedDict):
+    """Diccionario con tope de entradas que descarta el menos usado. Seguro entre hilos."""
+
+    def __init__(self, maximo):
+        super().__init__()
+        self.maximo = maximo
+        self._lock = threading.Lock()
+
+    def __getitem__(self, clave):
+        with self._lock:
+            valor = super().__getitem__(clave)
+            self.move_to_end(clave)
+            return valor
+
+    def __setitem__(self, clave, valor):
+        with self._lock:
+            super().__setitem__(clave, valor)
+            self.move_to_end(clave)
+            while len(self) > self.maximo:
+                self.popitem(last=False)
+
+
+# Bytes y tipo MIME por URL local
+RECURSOS = LRU(MAX_RECURSOS)
+
+
+def _prefijo(url_setting):
+    return '/' + url_setting.strip('/') + '/' if url_setting else None
+
+
+def _leer_static(relativa):
+    try:
+        if settings.STATIC_ROOT and staticfiles_storage.exists(relativa):
+            ruta = staticfiles_storage.path(relativa)
+        else:
+            ruta = finders.find(relativa)
+    except Exception:  # SuspiciousFileOperation ('..'), storage sin path
+        return None
+    if not ruta:
+        return None
+    with open(ruta, 'rb') as f:
+        return f.read()
+
+
+def _leer_media(relativa):
+    try:
+        if not default_storage.exists(relativa):
+            return None
+        with default_storage.open(relativa, 'rb') as f:
+            return f.read()
+    except Exception:
+        return None
+
+
+def es_local(url):
+    """True si la URL apunta a nuestro propio dominio (ALLOWED_HOSTS) o no trae dominio."""
+    partes = urlsplit(url)
+    if partes.scheme not in ('http', 'https', ''):
+        return False
+    if not partes.netloc:
+        return True
+    dominio, _ = split_domain_port(partes.netloc)
+    return validate_host(dominio, settings.ALLOWED_HOSTS)
+
+
+def recurso_local(url):
+    """
+    Contenido de una URL de STATIC_URL o MEDIA_URL leído sin pasar por HTTP.
+
+    Returns:
+        (bytes, mime) si se encontró; None si la URL no es de static/media propio.
+
+    Raises:
+        FileNotFoundError si es de static/media propio pero el archivo no existe
+        (así no se cae al fetcher HTTP, que volvería a pedirlo a gunicorn).
+    """
+    if not es_local(url):
+        return None
+    ruta = unquote(urlsplit(url).path)
+    try:
+        return RECURSOS[ruta]
+    except KeyError:
+        pass
+
+    static, media = _prefijo(settings.STATIC_URL), _prefijo(settings.MEDIA_URL)
+    if static and ruta.startswith(static):
+        contenido = _leer_static(ruta[len(static):])
+    elif media and ruta.startswith(media):
+        contenido = _leer_media(ruta[len(media):])
+    else:
+        return None
+    if contenido is None:
+        raise FileNotFoundError(f"Recurso local no encontrado: {ruta}")
+
+    resultado = (contenido, mimetypes.guess_type(ruta)[0] or 'application/octet-stream')
+    if len(contenido) <= TAMANO_MAX_RECURSO:
+        RECURSOS[ruta] = resultado
+    return resultado
+
+
+_fetcher = None
+_fetcher_lock = threading.Lock()
+
+
+def fetcher():
+    """
+    url_fetcher de WeasyPrint que resuelve static/media locales (uno por proceso).
+
+    Uso (renderizar() ya lo aplica):
+        weasyprint.HTML(string=html, base_url=base_url, url_fetcher=pdf.fetcher())
+    """
+    global _fetcher
+    if _fetcher is None:
+        with _fetcher_lock:
+            if _fetcher is None:
+                from weasyprint.urls import URLFetcher, URLFetcherResponse
+
+                class FetcherLocal(URLFetcher):
+                    def fetch(self, url, headers=None):
+                        local = recurso_local(url)
+                        if local is None:
+                            return super().fetch(url, headers)
+                        contenido, mime = local
+                        return URLFetcherResponse(url, contenido, {'Content-Type': mime})
+
+                _fetcher = FetcherLocal()
+    return _fetcher
+
+
+# ------------------------------------------
+# Motor: hojas de estilo y fuentes compartidas
+# ------------------------------------------
+# Hojas (rutas de static) que se aplican a cada plantilla, en orden. Las plantillas
+# no llevan <style>: una plantilla nueva de PDF se agrega aquí con su hoja.
+HOJAS = {
+    'cotizaciones/pdf_template.html': ('pdf/base.css', 'pdf/cotizacion.css'),
+    'finanzas/recibo_template.html': ('pdf/base.css', 'pdf/recibo.css'),
+    'finanzas/orden_cobro_pdf.html': ('pdf/base.css', 'pdf/orden_cobro.css'),
+    'finanzas/estado_cuenta_pdf.html': ('pdf/base.css', 'pdf/estado_cuenta.css'),
+}
+
+_textos = {}      # ruta -> (texto, sha256)
+_compiladas = {}  # ruta -> weasyprint.CSS
+_hojas_lock = threading.Lock()
+_hilo = threading.local()
+
+
+def _texto(ruta):
+    try:
+        return _textos[ruta]
+    except KeyError:
+        pass
+    contenido = _leer_static(ruta)
+    if contenido is None:
+        raise FileNotFoundError(f"Hoja de estilo de PDF no encontrada: {ruta}")
+    _textos[ruta] = (contenido.decode('utf-8'), hashlib.sha256(contenido).hexdigest())
+    return _textos[ruta]
+
+
+def _hoja(ruta):
+    try:
+        return _compiladas[ruta]
+    except KeyError:
+        pass
+    with _hojas_lock:
+        if ruta not in _compiladas:
+            import weasyprint
+
+            # Sin font_config: las hojas no usan @font-face y así sirven a cualquier hilo
+            _compiladas[ruta] = weasyprint.CSS(string=_texto(ruta)[0], url_fetcher=fetcher())
+        return _compiladas[ruta]
+
+
+def hojas(origen):
+    """Hojas ya compiladas (weasyprint.CSS) de la plantilla; lista vacía si no tiene."""
+    return [_hoja(ruta) for ruta in HOJAS.get(origen, ())]
+
+
+def firma_estilos(origen):
+    """Hash del CSS de la plantilla, para que la caché de PDFs cambie si cambia una hoja."""
+    return ','.join(_texto(ruta)[1] for ruta in HOJAS.get(origen, ()))
+
+
+def font_config():
+    """
+    FontConfiguration del hilo actual.
+
+    Crearla es caro (fontconfig y el mapa de fuentes de Pango) y Pango no
+    permite compartirla entre hilos. Los hilos de los workers viven tanto
+    como el proceso, así que en la práctica se crea una vez por worker.
+    """
+    config = getattr(_hilo, 'font_config', None)
+    if config is None:
+        from weasyprint.text.fonts import FontConfiguration
+
+        config = _hilo.font_config = FontConfiguration()
+    return config
+
+
+def renderizar(html, base_url, origen, destino=None):
+    """
+    Convierte HTML a PDF con las hojas, fuentes, fetcher e imágenes del proceso.
+
+    Uso:
+        contenido = pdf.renderizar(html, request.build_absolute_uri('/'), 'finanzas/recibo_template.html')
+        pdf.renderizar(html, base_url, 'disenador', destino=response)
+
+    Args:
+        html:     HTML ya renderizado.
+        base_url: URL base para resolver rutas relativas (imágenes).
+        origen:   Nombre de la plantilla; decide qué hojas de HOJAS se aplican.
+        destino:  Archivo donde escribir el PDF. Sin él se devuelven los bytes.
+
+    Returns:
+        bytes del PDF, o None si se dio `destino`.
+    """
+    import weasyprint
+
+    return weasyprint.HTML(string=html, base_url=base_url, url_fetcher=fetcher()).write_pdf(
+        destino, stylesheets=hojas(origen), font_config=font_config(), cache={},
+    )
+
+
+def preparar():
+    """Compila todas las hojas de HOJAS y crea la FontConfiguration del hilo. Devuelve cuántas hojas hay."""
+    font_config()
+    rutas = {ruta for rutas in HOJAS.values() for ruta in rutas}
+    for ruta in rutas:
+        _hoja(ruta)
+    return len(rutas)
+
+
+# ------------------------------------------
+# Pool de procesos para lotes
+# ------------------------------------------
+_procesos = None
+_procesos_lock = threading.Lock()
+
+
+def _iniciar_proceso():
+    # "spawn": el hijo arranca limpio (sin los hilos ni conexiones del worker) y carga Django por su cuenta
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'core.settings')
+    import django
+
+    django.setup()
+    preparar()
+
+
+def _renderizar_en_hijo(html, base_url, origen, limite):
+    from .admision import TiempoAgotado
+    from .metricas import medir_pdf
+
+    def vencido(signum, frame):
+        raise TiempoAgotado(f"El render de {origen} pasó de {limite} s")
+
+    # El reloj corre desde que este hijo toma el render, no desde que se encoló
+    signal.signal(signal.SIGALRM, vencido)
+    signal.setitimer(signal.ITIMER_REAL, limite)
+    try:
+        with medir_pdf(origen):
+            return renderizar(html, base_url, origen)
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+
+
+def procesos():
+    """
+    Pool de procesos del worker (settings.EXPORTACION_PDF_PROCESOS), creado al primer uso.
+
+    Cada hijo atiende EXPORTACION_PDF_TAREAS_POR_PROCESO renders y se reemplaza:
+    acota la memoria que WeasyPrint no devuelve.
+    """
+    global _procesos
+    if _procesos is None:
+        with _procesos_lock:
+            if _procesos is None:
+                _procesos = ProcessPoolExecutor(
+                    max_workers=getattr(settings, 'EXPORTACION_PDF_PROCESOS', 2),
+                    mp_context=multiprocessing.get_context('spawn'),
+                    initializer=_iniciar_proceso,
+                    max_tasks_per_child=getattr(settings, 'EXPORTACION_PDF_TAREAS_POR_PROCESO', 50),
+                )
+    return _procesos
+
+
+def renderizar_en_proceso(html, base_url, origen, limite=None):
+    """
+    Como renderizar(), pero en el pool de procesos.
+
+    Uso:
+        futuro = pdf.renderizar_en_proceso(html, base_url, 'cotizaciones/pdf_template.html')
+        contenido = await asyncio.wrap_future(futuro)
+
+    El hijo corta el render pasados `limite` segundos desde que lo empieza (por
+    defecto el timeout de settings.ADMISION['pdf']); el tiempo en la cola del
+    pool, compartido con otras exportaciones, no cuenta.
+
+    Returns:
+        concurrent.futures.Future con los bytes del PDF, o que falla con
+        admision.TiempoAgotado si el render se pasó del límite.
+    """
+    if limite is None:
+        from .admision import limites
+
+        limite = limites('pdf')['timeout']
+    return procesos().submit(_renderizar_en_hijo, html, base_url, origen, limite)
+
@@ -0,0 +1,240 @@
+# ==========================================
+# EXPEDIENTES/PERFILADO.PY - MEDICIÓN DE CONSULTAS Y TIEMPOS POR PETICIÓN
+# ==========================================
+import functools
+import logging
+import re
+import threading
+import time
+from collections import Counter, deque
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+# Medición activa del contexto actual (None = no se está midiendo)
+_medicion = ContextVar('perfilado_medicion', default=None)
+
+# Últimas peticiones medidas en este proceso (para la página de reporte)
+RECIENTES = deque(maxlen=200)
+
+_instrumentado = False
+_instrumentado_lock = threading.Lock()
+
+
+class PresupuestoExcedido(AssertionError):
+    """Una vista hizo más consultas de las permitidas (solo con PERFILADO_ESTRICTO o en pruebas)."""
+
+
+# ------------------------------------------
+# Huellas de SQL
+# ------------------------------------------
+_RE_LISTA_IN = re.compile(r"IN \((?:%s, )*%s\)")
+_RE_LITERALES = re.compile(r"'(?:[^']|'')*'|\b\d+\b")
+
+
+def huella(sql):
+    """SQL normalizado: sin literales y con las listas IN colapsadas. Agrupa las consultas 'iguales'."""
+    sql = _RE_LISTA_IN.sub("IN (...)", sql)
+    return _RE_LITERALES.sub("?", sql)
+
+
+class Medicion:
+    """Acumula lo que pasa durante una petición (o un bloque `medir()`)."""
+
+    def __init__(self):
+        self.inicio = time.perf_counter()
+        self.consultas = 0
+        self.tiempo_bd = 0.0
+        self.tiempos = Counter()  # 'plantillas', 'pdf' -> segundos
+        self.huellas = Counter()
+        self.exactas = Counter()
+        self._profundidad = Counter()
+
+    @property
+    def total(self):
+        return time.perf_counter() - self.inicio
+
+    def duplicadas(self, minimo=2, limite=5):
+        """Huellas repetidas (patrón N+1), de la más repetida a la menos."""
+        return [(h, n) for h, n in self.huellas.most_common(limite) if n >= minimo]
+
+    def exactas_repetidas(self):
+        """Cuántas consultas fueron idénticas a otra (mismo SQL y mismos parámetros)."""
+        return sum(n - 1 for n in self.exactas.values() if n > 1)
+
+    def server_timing(self):
+        partes = [f'db;dur={self.tiempo_bd * 1000:.1f};desc="{self.consultas} consultas"']
+        if self.tiempos['plantillas']:
+            partes.append(f"tpl;dur={self.tiempos['plantillas'] * 1000:.1f}")
+        if self.tiempos['pdf']:
+            partes.append(f"pdf;dur={self.tiempos['pdf'] * 1000:.1f}")
+        partes.append(f"total;dur={self.total * 1000:.1f}")
+        return ", ".join(partes)
+
+    def resumen(self):
+        return {
+            'consultas': self.consultas,
+            'exactas_repetidas': self.exactas_repetidas(),
+            'bd_ms': round(self.tiempo_bd * 1000, 1),
+            'plantillas_ms': round(self.tiempos['plantillas'] * 1000, 1),
+            'pdf_ms': round(self.tiempos['pdf'] * 1000, 1),
+            'total_ms': round(self.total * 1000, 1),
+            'duplicadas': self.duplicadas(),
+        }
+
+
+def _envoltura_sql(execute, sql, params, many, context):
+    m = _medicion.get()
+    if m is None:
+        return execute(sql, params, many, context)
+    t0 = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        m.tiempo_bd += time.perf_counter() - t0
+        m.consultas += 1
+        m.huellas[huella(sql)] += 1
+        try:
+            m.exactas[(sql, repr(params))] += 1
+        except Exception:
+            pass
+
+
+# ------------------------------------------
+# Instrumentación de plantillas y WeasyPrint
+# ------------------------------------------
+def _cronometrar(categoria, funcion):
+    @functools.wraps(funcion)
+    def envuelta(*args, **kwargs):
+        m = _medicion.get()
+        if m is None:
+            return funcion(*args, **kwargs)
+        # Solo cuenta el nivel exterior (un PDF también renderiza plantillas por dentro de sí mismo)
+        m._profundidad[categoria] += 1
+        t0 = time.perf_counter()
+        try:
+            return funcion(*args, **kwargs)
+        finally:
+            m._profundidad[categoria] -= 1
+            if not m._profundidad[categoria]:
+                m.tiempos[categoria] += time.perf_counter() - t0
+    return envuelta
+
+
+def instrumentar():
+    """
+    Envuelve Template.render y weasyprint.HTML.write_pdf una sola vez por proceso.
+
+    Sin una medición activa las envolturas solo consultan un ContextVar, así
+    que dejarlas puestas no cuesta nada.
+    """
+    global _instrumentado
+    if _instrumentado:
+        return
+    with _instrumentado_lock:
+        if _instrumentado:
+            return
+        from django.template.backends.django import Template
+        Template.render = _cronometrar('plantillas', Template.render)
+        try:
+            import weasyprint
+            weasyprint.HTML.write_pdf = _cronometrar('pdf', weasyprint.HTML.write_pdf)
+        except (ImportError, OSError) as e:
+            logger.warning(f"Perfilado sin tiempos de WeasyPrint: {e}")
+        _instrumentado = True
+
+
+# ------------------------------------------
+# API
+# ------------------------------------------
+@contextmanager
+def medir():
+    """
+    Mide consultas y tiempos dentro del bloque.
+
+    Uso:
+        with medir() as m:
+            client.get('/')
+        print(m.consultas, m.duplicadas())
+    """
+    instrumentar()
+    m = Medicion()
+    token = _medicion.set(m)
+    try:
+        with _envolver_conexiones():
+            yield m
+    finally:
+        _medicion.reset(token)
+
+
+@contextmanager
+def _envolver_conexiones():
+    with ExitStack() as pila:
+        for alias in connections:
+            pila.enter_context(connections[alias].execute_wrapper(_envoltura_sql))
+        yield
+
+
+@contextmanager
+def presupuesto_consultas(maximo):
+    """
+    Falla (PresupuestoExcedido) si el bloque hace más de `maximo` consultas.
+
+    Uso en pruebas:
+        with presupuesto_consultas(12):
+            self.client.get(reverse('detalle_cliente', args=[cliente.id]))
+    """
+    with medir() as m:
+        yield m
+    if m.consultas > maximo:
+        raise PresupuestoExcedido(_mensaje_presupuesto('bloque', m, maximo))
+
+
+def presupuesto_para(nombre_url):
+    """Máximo de consultas para una vista según settings (None = sin límite)."""
+    presupuestos = getattr(settings, 'PERFILADO_PRESUPUESTOS', {})
+    return presupuestos.get(nombre_url, getattr(settings, 'PERFILADO_PRESUPUESTO', None))
+
+
+def _mensaje_presupuesto(nombre, m, maximo):
+    peores = "; ".join(f"{n}x {h[:120]}" for h, n in m.duplicadas(limite=3))
+    return f"{nombre}: {m.consultas} consultas (máximo {maximo}). Repetidas: {peores or 'ninguna'}"
+
+
+def registrar(request, respuesta, m):
+    """Guarda la medición en el historial del proceso y revisa el presupuesto de la vista."""
+    match = getattr(request, 'resolver_match', None)
+    nombre = (match.url_name if match else None) or request.path
+    datos = m.resumen()
+    datos.update({'vista': nombre, 'metodo': request.method, 'ruta': request.path, 'estado': respuesta.status_code})
+    RECIENTES.append(datos)
+
+    maximo = presupuesto_para(nombre)
+    if maximo is not None and m.consultas > maximo:
+        mensaje = _mensaje_presupuesto(nombre, m, maximo)
+        if getattr(settings, 'PERFILADO_ESTRICTO', False):
+            raise PresupuestoExcedido(mensaje)
+        logger.warning(mensaje)
+
+
+def reporte_por_vista():
+    """Agrega las peticiones recientes por vista: promedio y máximo de consultas y de tiempo."""
+    agregados = {}
+    for r in list(RECIENTES):
+        a = agregados.setdefault(r['vista'], {'vista': r['vista'], 'peticiones': 0, 'consultas': 0, 'max_consultas': 0, 'total_ms': 0.0, 'max_ms': 0.0, 'bd_ms': 0.0})
+        a['peticiones'] += 1
+        a['consultas'] += r['consultas']
+        a['max_consultas'] = max(a['max_consultas'], r['consultas'])
+        a['total_ms'] += r['total_ms']
+        a['max_ms'] = max(a['max_ms'], r['total_ms'])
+        a['bd_ms'] += r['bd_ms']
+    for a in agregados.values():
+        n = a['peticiones']
+        a['prom_consultas'] = round(a['consultas'] / n, 1)
+        a['prom_ms'] = round(a['total_ms'] / n, 1)
+        a['prom_bd_ms'] = round(a['bd_ms'] / n, 1)
+    return sorted(agregados.values(), key=lambda a: -a['prom_consultas'])
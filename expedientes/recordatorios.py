@@ -0,0 +1,157 @@
+# ==========================================
+# EXPEDIENTES/RECORDATORIOS.PY - ALERTAS DE VENCIMIENTO Y RECURRENCIAS
+# ==========================================
+from datetime import datetime, time, timedelta
+
+from dateutil.relativedelta import relativedelta
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import Documento, Evento
+
+# Días de anticipación con los que se avisa un vencimiento (antes eran 3 Eventos por archivo)
+ALERTAS_VENCIMIENTO = (
+    (20, '⚠️ Vence en 20 días'),
+    (10, '🟠 Vence en 10 días'),
+    (5, '🔴 URGENTE: Vence en 5 días'),
+)
+
+PASOS_RECURRENCIA = {
+    'semanal': relativedelta(weeks=1),
+    'quincenal': relativedelta(weeks=2),
+    'mensual': relativedelta(months=1),
+}
+
+
+# ------------------------------------------
+# Vencimientos de documentos
+# ------------------------------------------
+def fechas_alerta(fecha_vencimiento):
+    """Fechas en las que se avisa del vencimiento de un documento."""
+    if not fecha_vencimiento:
+        return []
+    return [fecha_vencimiento - timedelta(days=dias) for dias, _ in ALERTAS_VENCIMIENTO]
+
+
+def documentos_con_alerta(fecha):
+    """
+    Documentos que tienen un aviso de vencimiento el día `fecha`.
+
+    Una sola consulta por el índice de fecha_vencimiento, sin importar cuántos
+    permisos haya: solo se buscan los que vencen a 20, 10 o 5 días de `fecha`.
+    """
+    objetivos = [fecha + timedelta(days=dias) for dias, _ in ALERTAS_VENCIMIENTO]
+    return Documento.objects.filter(fecha_vencimiento__in=objetivos).select_related('cliente')
+
+
+def alertas_en_rango(documentos, desde, hasta):
+    """
+    Genera las alertas de vencimiento (sin guardarlas) que caen en [desde, hasta).
+
+    Args:
+        documentos: QuerySet de Documento ya filtrado por los clientes visibles.
+        desde, hasta: datetimes aware de la ventana de la agenda.
+
+    Yields:
+        (inicio, fin, data) con el evento listo para FullCalendar.
+    """
+    dia_ini = timezone.localtime(desde).date()
+    dia_fin = timezone.localtime(hasta).date()
+    plazo_max = max(d for d, _ in ALERTAS_VENCIMIENTO)
+    plazo_min = min(d for d, _ in ALERTAS_VENCIMIENTO)
+
+    qs = documentos.filter(
+        fecha_vencimiento__gte=dia_ini + timedelta(days=plazo_min),
+        fecha_vencimiento__lte=dia_fin + timedelta(days=plazo_max),
+    ).select_related('cliente').only('id', 'nombre_archivo', 'fecha_vencimiento', 'cliente__nombre_empresa')
+
+    for doc in qs:
+        for dias, prefijo in ALERTAS_VENCIMIENTO:
+            fecha = doc.fecha_vencimiento - timedelta(days=dias)
+            inicio = timezone.make_aware(datetime.combine(fecha, time.min))
+            if not (desde <= inicio < hasta):
+                continue
+            data = {
+                'id': f"doc-{doc.id}-{dias}",
+                'title': f"{prefijo}: {doc.nombre_archivo}",
+                'start': fecha.isoformat(),
+                'allDay': True,
+                'editable': False,
+                'backgroundColor': '#f59e0b',
+                'extendedProps': {
+                    'tipo': 'Vencimiento',
+                    'cliente': doc.cliente.nombre_empresa,
+                    'descripcion': f"Recordatorio automático de vencimiento para el documento: {doc.nombre_archivo}",
+                    'automatico': True,
+                },
+            }
+            yield inicio, inicio, data
+
+
+# ------------------------------------------
+# Eventos recurrentes (audiencias)
+# ------------------------------------------
+def filtro_recurrentes(desde, hasta):
+    """Eventos recurrentes cuya serie puede tener ocurrencias en [desde, hasta)."""
+    return Q(inicio__lt=hasta) & ~Q(recurrencia='') & (
+        Q(recurrencia_hasta__isnull=True) | Q(recurrencia_hasta__gte=timezone.localtime(desde).date())
+    )
+
+
+def ocurrencias(evento, desde, hasta):
+    """
+    Fechas de inicio de las repeticiones de `evento` que se traslapan con [desde, hasta).
+
+    Yields:
+        (inicio, fin) de cada ocurrencia; `fin` es igual a `inicio` si el evento no tiene duración.
+    """
+    paso = PASOS_RECURRENCIA.get(evento.recurrencia)
+    if not paso:
+        return
+    base = timezone.localtime(evento.inicio)
+    duracion = (evento.fin - evento.inicio) if evento.fin and evento.fin > evento.inicio else timedelta(0)
+
+    # Saltamos directo cerca de la ventana en lugar de recorrer toda la serie
+    n = 0
+    if desde > evento.inicio:
+        if evento.recurrencia == 'mensual':
+            local = timezone.localtime(desde)
+            n = max(0, (local.year - base.year) * 12 + local.month - base.month - 1)
+        else:
+            n = max(0, (desde - evento.inicio).days // (paso.weeks * 7) - 1)
+
+    while True:
+        inicio = base + paso * n
+        if inicio >= hasta:
+            break
+        if evento.recurrencia_hasta and inicio.date() > evento.recurrencia_hasta:
+            break
+        fin = inicio + duracion
+        if fin > desde or inicio >= desde:
+            yield inicio, fin
+        n += 1
+
+
+def audiencias_del_dia(fecha, eventos=None):
+    """
+    Audiencias (incluidas las repeticiones de series recurrentes) que ocurren el día `fecha`.
+
+    Returns:
+        Lista de (evento, inicio) ordenada por hora.
+    """
+    eventos = eventos if eventos is not None else Evento.objects.all()
+    desde = timezone.make_aware(datetime.combine(fecha, time.min))
+    hasta = desde + timedelta(days=1)
+    qs = eventos.filter(tipo='audiencia').filter(
+        (Q(recurrencia='') & Q(inicio__gte=desde, inicio__lt=hasta)) | filtro_recurrentes(desde, hasta)
+    ).select_related('cliente', 'usuario')
+
+    resultado = []
+    for e in qs:
+        if not e.recurrencia:
+            resultado.append((e, e.inicio))
+            continue
+        for inicio, _ in ocurrencias(e, desde, hasta):
+            if inicio >= desde:
+                resultado.append((e, inicio))
+    return sorted(resultado, key=lambda x: x[1])
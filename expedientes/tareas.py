@@ -0,0 +1,66 @@
+# ==========================================
+# EXPEDIENTES/TAREAS.PY - TRABAJOS EN SEGUNDO PLANO
+# ==========================================
+import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections, connection
+
+logger = logging.getLogger(__name__)
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _obtener_pool():
+    """
+    Crea el pool de hilos la primera vez que se usa.
+
+    Se crea de forma perezosa para que cada worker de gunicorn tenga el suyo
+    (un pool creado antes del fork no sobrevive en los procesos hijos).
+    """
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ThreadPoolExecutor(
+                    max_workers=getattr(settings, 'TAREAS_WORKERS', 2),
+                    thread_name_prefix='corpad-tareas',
+                )
+    return _pool
+
+
+def encolar(funcion, *args, **kwargs):
+    """
+    Ejecuta `funcion(*args, **kwargs)` en el pool de trabajos en segundo plano.
+
+    Uso:
+        transaction.on_commit(lambda: encolar(generar_miniatura, doc.id))
+
+    Cada trabajo abre y cierra su propia conexión a la BD. Los errores se
+    registran en el log y no se propagan a quien encoló el trabajo.
+    Con settings.TAREAS_SINCRONAS = True el trabajo corre en el mismo hilo
+    (útil en pruebas y en el benchmark).
+
+    Returns:
+        concurrent.futures.Future con el resultado de la función.
+    """
+    def _ejecutar():
+        if not sincrono:
+            close_old_connections()
+        try:
+            return funcion(*args, **kwargs)
+        except Exception as e:
+            logger.exception(f"Error en tarea en segundo plano {funcion.__name__}: {e}")
+        finally:
+            if not sincrono:
+                connection.close()
+
+    sincrono = getattr(settings, 'TAREAS_SINCRONAS', False)
+    if sincrono:
+        futuro = Future()
+        futuro.set_result(_ejecutar())
+        return futuro
+    return _obtener_pool().submit(_ejecutar)
@@ -0,0 +1,46 @@
+import hashlib
+
+from django import template
+from django.utils import timezone
+
+from expedientes.cache import NOTIFICACIONES
+
+register = template.Library()
+
+
+class CacheUsuarioNode(template.Node):
+    def __init__(self, nodelist, nombre, variantes):
+        self.nodelist = nodelist
+        self.nombre = nombre
+        self.variantes = variantes
+
+    def render(self, context):
+        usuario = context.get('user')
+        if usuario is None or not usuario.is_authenticated:
+            return self.nodelist.render(context)
+
+        variantes = '|'.join(str(v.resolve(context)) for v in self.variantes)
+        clave = NOTIFICACIONES.clave(
+            self.nombre.resolve(context), usuario.pk, NOTIFICACIONES.version(usuario.pk),
+            timezone.localdate().isoformat(), hashlib.md5(variantes.encode()).hexdigest(),
+        )
+        return NOTIFICACIONES.obtener(clave, lambda: self.nodelist.render(context))
+
+
+@register.tag
+def cache_usuario(parser, token):
+    """
+    Uso en template:
+        {% load fragmentos %}
+        {% cache_usuario "menu" seccion_menu %} ... {% endcache_usuario %}
+
+    Guarda el HTML del bloque por usuario y por día (más las variantes dadas).
+    La clave lleva la versión del usuario, que cambian las señales de
+    models.py al modificarse sus tareas, eventos, cobros o permisos.
+    """
+    bits = token.split_contents()
+    if len(bits) < 2:
+        raise template.TemplateSyntaxError(f"'{bits[0]}' necesita el nombre del fragmento.")
+    nodelist = parser.parse(('endcache_usuario',))
+    parser.delete_first_token()
+    return CacheUsuarioNode(nodelist, parser.compile_filter(bits[1]), [parser.compile_filter(b) for b in bits[2:]])
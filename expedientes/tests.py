@@ -1,3 +1,106 @@
-from django.test import TestCase
+from datetime import datetime, time, timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from .acceso import alcance_de
+from .cache import ACCESO, AGENDA
+from .models import Cliente, Evento, Usuario
+
+CACHE_PRUEBAS = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+
+@override_settings(CACHES=CACHE_PRUEBAS)
+class AgendaAlcanceTests(TestCase):
+    """La agenda en caché no debe seguir mostrando clientes que ya no están en el alcance del usuario."""
+
+    def setUp(self):
+        cache.clear()
+        self.usuario = Usuario.objects.create_user('abogado', 'abogado@corpad.mx', 'x', rol='abogado', access_agenda=True)
+        autor = Usuario.objects.create_user('autor', 'autor@corpad.mx', 'x')
+        self.alfa = Cliente.objects.create(nombre_empresa='ALFA', nombre_contacto='A', email='a@a.mx', telefono='1')
+        self.beta = Cliente.objects.create(nombre_empresa='BETA', nombre_contacto='B', email='b@b.mx', telefono='2')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.usuario.clientes_asignados.add(self.alfa, self.beta)
+
+        hoy = timezone.localdate()
+        inicio = timezone.make_aware(datetime.combine(hoy, time(10)))
+        for cliente in (self.alfa, self.beta):
+            Evento.objects.create(usuario=autor, cliente=cliente, titulo='Audiencia', inicio=inicio, tipo='audiencia')
+        self.parametros = {
+            'start': (hoy - timedelta(days=3)).isoformat(),
+            'end': (hoy + timedelta(days=3)).isoformat(),
+        }
+        self.client.force_login(self.usuario)
+
+    def _titulos(self, respuesta):
+        return {e['title'] for e in respuesta.json()}
+
+    def test_quitar_asignacion_saca_sus_eventos(self):
+        antes = self.client.get(reverse('api_eventos'), self.parametros)
+        self.assertEqual(self._titulos(antes), {'ALFA: Audiencia', 'BETA: Audiencia'})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.usuario.clientes_asignados.remove(self.beta)
+
+        despues = self.client.get(reverse('api_eventos'), self.parametros, HTTP_IF_NONE_MATCH=antes['ETag'])
+        self.assertEqual(despues.status_code, 200)
+        self.assertEqual(self._titulos(despues), {'ALFA: Audiencia'})
+
+    def test_renombrar_cliente_refresca_titulos(self):
+        self.client.get(reverse('api_eventos'), self.parametros)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.beta.nombre_empresa = 'BETA NUEVA'
+            self.beta.save()
+
+        despues = self.client.get(reverse('api_eventos'), self.parametros)
+        self.assertIn('BETA NUEVA: Audiencia', self._titulos(despues))
+
+    def test_cambio_de_alcance_invalida_agenda_del_usuario(self):
+        ambito = f"usuario:{self.usuario.pk}"
+        version = AGENDA.version(ambito)
+
+        # Desde el lado del cliente pk_set llega vacío en el clear: se usan los abogados leídos antes
+        with self.captureOnCommitCallbacks(execute=True):
+            self.beta.abogados_asignados.clear()
+        self.assertNotEqual(AGENDA.version(ambito), version)
+
+        version = AGENDA.version(ambito)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.usuario.rol = 'admin'
+            self.usuario.save()
+        self.assertNotEqual(AGENDA.version(ambito), version)
+
+    def test_guardar_cliente_sin_renombrar_conserva_agenda(self):
+        version = AGENDA.version("clientes")
+        with self.captureOnCommitCallbacks(execute=True):
+            self.beta.telefono = '3'
+            self.beta.save()
+        self.assertEqual(AGENDA.version("clientes"), version)
+
+
+@override_settings(CACHES=CACHE_PRUEBAS)
+class AlcanceCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.usuario = Usuario.objects.create_user('abogado', 'abogado@corpad.mx', 'x', rol='abogado')
+        self.cliente = Cliente.objects.create(nombre_empresa='ALFA', nombre_contacto='A', email='a@a.mx', telefono='1')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.usuario.clientes_asignados.add(self.cliente)
+
+    def test_lectura_anterior_al_cambio_no_queda_en_cache(self):
+        guardar = ACCESO.guardar
+
+        def guardar_tarde(clave, valor, ttl=None):
+            # La lista ya se leyó; el cambio se confirma antes de que llegue a la caché
+            with self.captureOnCommitCallbacks(execute=True):
+                self.usuario.clientes_asignados.remove(self.cliente)
+            guardar(clave, valor, ttl)
+
+        with mock.patch.object(ACCESO, 'guardar', guardar_tarde):
+            self.assertIn(self.cliente.pk, alcance_de(Usuario.objects.get(pk=self.usuario.pk)).clientes)
+
+        self.assertNotIn(self.cliente.pk, alcance_de(Usuario.objects.get(pk=self.usuario.pk)).clientes)
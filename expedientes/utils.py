@@ -1,14 +1,54 @@
 # ==========================================
 # EXPEDIENTES/UTILS.PY - FUNCIONES UTILITARIAS
 # ==========================================
+import hashlib
 import logging
 from django.http import HttpResponse
 from django.template.loader import render_to_string
-import weasyprint
+
+from . import admision, pdf
+from .cache import PDFS
+from .metricas import medir_pdf
 
 logger = logging.getLogger(__name__)
 
 
+def pdf_desde_html(html_string, base_url, origen):
+    """
+    Convierte HTML a PDF con WeasyPrint y guarda el resultado en la caché de PDFs.
+
+    La clave es el hash del HTML, del base_url y del CSS de la plantilla
+    (pdf.HOJAS): el mismo documento (misma cotización sin cambios, mismo día) se
+    reutiliza sin volver a renderizar, y cualquier cambio en los datos o en los
+    estilos produce otra clave sin tener que invalidar nada.
+
+    Uso:
+        pdf = pdf_desde_html(html_string, request.build_absolute_uri('/'), 'cotizaciones/pdf_template.html')
+
+    Args:
+        html_string: HTML ya renderizado.
+        base_url:    URL base para resolver rutas relativas (imágenes, CSS).
+        origen:      Nombre del template: elige las hojas de estilo y etiqueta las métricas.
+
+    Returns:
+        bytes con el contenido del PDF.
+
+    Raises:
+        admision.Rechazo si el render no se admite (ver expedientes/admision.py).
+    """
+    def _renderizar():
+        with medir_pdf(origen):
+            return pdf.renderizar(html_string, base_url, origen)
+
+    return PDFS.obtener(clave_pdf(html_string, base_url, origen), lambda: admision.ejecutar('pdf', _renderizar, tamano=len(html_string)))
+
+
+def clave_pdf(html_string, base_url, origen):
+    """Clave del PDF en la caché de PDFs (ver pdf_desde_html)."""
+    firma = hashlib.sha256(f"{base_url}\n{pdf.firma_estilos(origen)}\n{html_string}".encode()).hexdigest()
+    return PDFS.clave(firma)
+
+
 def generar_pdf_response(request, template_name, context, filename, disposition='inline'):
     """
     Genera un HttpResponse con un PDF renderizado desde un template HTML.
@@ -34,13 +74,13 @@ def generar_pdf_response(request, template_name, context, filename, disposition=
         
         html_string = render_to_string(template_name, context)
         
-        response = HttpResponse(content_type='application/pdf')
+        response = HttpResponse(pdf_desde_html(html_string, base_url, template_name), content_type='application/pdf')
         response['Content-Disposition'] = f'{disposition}; filename="{filename}"'
         
-        weasyprint.HTML(string=html_string, base_url=base_url).write_pdf(response)
-        
         return response
     
+    except admision.Rechazo:
+        raise  # No es un error: se cuenta en /metrics y el middleware responde 413/503
     except Exception as e:
         logger.error(f"Error generando PDF '{filename}' con template '{template_name}': {e}")
         raise
@@ -67,10 +107,10 @@ def generar_pdf_bytes(request, template_name, context):
         context['base_url'] = base_url
         
         html_string = render_to_string(template_name, context)
-        pdf_bytes = weasyprint.HTML(string=html_string, base_url=base_url).write_pdf()
-        
-        return pdf_bytes
+        return pdf_desde_html(html_string, base_url, template_name)
     
+    except admision.Rechazo:
+        raise
     except Exception as e:
         logger.error(f"Error generando PDF bytes con template '{template_name}': {e}")
         raise
\ No newline at end of file
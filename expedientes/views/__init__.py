@@ -0,0 +1,49 @@
+# ==========================================
+# EXPEDIENTES/VIEWS/__INIT__.PY - VISTAS POR DOMINIO
+# ==========================================
+"""
+Las vistas viven en un módulo por dominio. Aquí se re-exportan para que core/urls.py
+siga usando `views.<nombre>`.
+
+Las librerías pesadas (pandas, weasyprint, mammoth, docxtpl, python-docx, qrcode)
+se importan dentro de las funciones que las usan: importar este paquete no las carga.
+"""
+from .cuentas import (
+    signout, registro, mi_perfil, gestion_usuarios, autorizar_usuario, editar_usuario,
+    eliminar_usuario,
+)
+from .clientes import (
+    dashboard, nuevo_cliente, eliminar_cliente, detalle_cliente, api_bitacora_cliente,
+    editar_cliente, configurar_campos, eliminar_campo_dinamico, gestionar_tarea, toggle_tarea,
+    editar_tarea, eliminar_tarea,
+)
+from .drive import (
+    crear_carpeta, eliminar_carpeta, crear_expediente, subir_archivo_drive,
+    subir_archivo_requisito, eliminar_archivo_drive, mover_archivo_drive, acciones_masivas_drive,
+    descargar_carpeta_zip, descargar_archivo_oficial, exportar_documentos, preview_archivo, obtener_preview_archivo,
+    aprobar_archivo_temporal, rechazar_archivo_temporal,
+)
+from .generador import (
+    generador_contratos, reemplazar_preservando_estilo, generar_contrato_final, visor_docx,
+    subir_plantilla, eliminar_plantilla, diseñador_plantillas, previsualizar_word_raw,
+    crear_variable_api, api_convertir_html, generador_qr,
+)
+from .cotizaciones import (
+    gestion_servicios, guardar_servicio, eliminar_servicio, lista_cotizaciones, nueva_cotizacion,
+    exportar_cotizaciones_zip, exportar_cotizaciones, buscar_cliente_api, detalle_cotizacion, generar_pdf_cotizacion, convertir_a_cliente,
+    enviar_cotizacion_email, eliminar_cotizacion, cotizacion_publica, cotizacion_publica_pdf,
+)
+from .finanzas import (
+    panel_finanzas, registrar_pago, recibo_pago_pdf, eliminar_finanza, finanzas_cliente,
+    generar_orden_cobro, generar_estados_cuenta, exportar_cartera,
+    exportar_finanzas,
+)
+from .agenda import (
+    agenda_legal, api_eventos, mover_evento_api, crear_evento, eliminar_evento, panel_vencimientos,
+    exportar_vencimientos,
+)
+from .correos import (
+    enviar_recordatorio_documentacion, redactar_correo_autorizaciones, enviar_correo_universal,
+)
+from .portal import generar_link_externo, vista_publica_carga
+from .diagnostico import reporte_perfilado, metricas_prometheus
@@ -0,0 +1,172 @@
+# ==========================================
+# EXPEDIENTES/VIEWS/AGENDA.PY - AGENDA Y VENCIMIENTOS
+# ==========================================
+import json
+import logging
+import uuid
+from datetime import timedelta
+
+# --- Django Core ---
+from django.contrib import messages
+from django.contrib.auth.decorators import login_required
+from django.core.paginator import Paginator
+from django.db.models import Count, Q
+from django.http import JsonResponse
+from django.shortcuts import render, redirect, get_object_or_404
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, quote_etag
+from django.views.decorators.cache import cache_control
+from asgiref.sync import sync_to_async
+
+# --- Modelos Locales ---
+from ..models import Cliente, Documento, Evento
+
+# --- Utilidades ---
+from ..calendario import eventos_en_ventana, etag_ventana, parsear_limite
+from ..exportaciones import Filas, respuesta_exportacion
+from ..acceso import alcance_de
+
+logger = logging.getLogger(__name__)
+
+
+# ------------------------------------------
+# AGENDA
+# ------------------------------------------
+@login_required
+def agenda_legal(request):
+    if not request.user.access_agenda: return redirect('dashboard')
+    hoy = timezone.now()
+    proximas = Evento.objects.filter(
+        tipo='audiencia', inicio__gte=hoy, usuario=request.user
+    ).select_related('cliente').order_by('inicio')[:5]
+    
+    clientes = alcance_de(request.user).clientes_qs()
+    return render(request, 'agenda/calendario.html', {'clientes': clientes, 'proximas_audiencias': proximas})
+
+@login_required
+@cache_control(private=True, no_cache=True)
+async def api_eventos(request):
+    usuario = await request.auser()
+    if not usuario.access_agenda: return JsonResponse([], safe=False)
+    inicio = parsear_limite(request.GET.get('start'))
+    fin = parsear_limite(request.GET.get('end'))
+    if not (inicio and fin) or fin <= inicio:
+        return JsonResponse([], safe=False)
+
+    # ETag a mano: @condition llama a etag_func de forma síncrona y aquí el usuario ya se cargó con auser()
+    etag = quote_etag(await sync_to_async(etag_ventana)(usuario, inicio, fin))
+    no_modificado = get_conditional_response(request, etag=etag)
+    if no_modificado is not None:
+        return no_modificado
+
+    eventos = await sync_to_async(eventos_en_ventana)(usuario, inicio, fin)
+    respuesta = JsonResponse(eventos, safe=False, json_dumps_params={'separators': (',', ':'), 'ensure_ascii': False})
+    respuesta['ETag'] = etag
+    return respuesta
+
+@login_required
+def mover_evento_api(request):
+    # <--- 4. CORRECCIÓN: @csrf_exempt ELIMINADO CORRECTAMENTE
+    if request.method == 'POST':
+        try:
+            data = json.loads(request.body); evento = get_object_or_404(Evento, id=data.get('id'))
+            if request.user.rol != 'admin' and evento.usuario != request.user: return JsonResponse({'status': 'error', 'msg': 'Sin permiso'})
+            if evento.recurrencia: return JsonResponse({'status': 'error', 'msg': 'Los eventos recurrentes no se pueden mover'})
+            evento.inicio = parsear_limite(data.get('start'))
+            if data.get('end'): evento.fin = parsear_limite(data.get('end'))
+            evento.save(); return JsonResponse({'status': 'ok'})
+        except Exception as e: 
+            logger.error(f"Error moviendo evento: {e}")
+            return JsonResponse({'status': 'error', 'msg': str(e)})
+    return JsonResponse({'status': 'error'})
+
+@login_required
+def crear_evento(request):
+    if request.method == 'POST':
+        inicio = timezone.make_aware(timezone.datetime.strptime(f"{request.POST.get('fecha')} {request.POST.get('hora')}", "%Y-%m-%d %H:%M"))
+        cliente = get_object_or_404(Cliente, id=request.POST.get('cliente_id')) if request.POST.get('cliente_id') else None
+        recurrencia = request.POST.get('recurrencia', '')
+        if recurrencia not in dict(Evento.RECURRENCIAS): recurrencia = ''
+        recurrencia_hasta = request.POST.get('recurrencia_hasta') or None
+        Evento.objects.create(usuario=request.user, titulo=request.POST.get('titulo'), inicio=inicio, tipo=request.POST.get('tipo'), cliente=cliente, descripcion=request.POST.get('descripcion'), recurrencia=recurrencia, recurrencia_hasta=recurrencia_hasta if recurrencia else None)
+        messages.success(request, "Evento agendado.")
+    return redirect('agenda_legal')
+
+@login_required
+def eliminar_evento(request, evento_id):
+    evento = get_object_or_404(Evento, id=evento_id)
+    if request.user.rol == 'admin' or evento.usuario == request.user:
+        evento.delete(); return JsonResponse({'status': 'ok'})
+    return JsonResponse({'status': 'error'}, status=403)
+
+
+# ------------------------------------------
+# VENCIMIENTOS DE DOCUMENTOS
+# ------------------------------------------
+def _filtros_vencimientos(request):
+    """Lee ?dias=&vencidos=&cliente= y devuelve el QuerySet ya acotado a los clientes visibles."""
+    try:
+        dias = min(max(int(request.GET.get('dias', 30)), 1), 365)
+    except ValueError:
+        dias = 30
+    incluir_vencidos = request.GET.get('vencidos') == '1'
+    cliente_id = request.GET.get('cliente') or ''
+    hoy = timezone.localdate()
+
+    qs = Documento.objects.visibles_para(request.user).por_vencer(dias, hoy=hoy, incluir_vencidos=incluir_vencidos)
+    if cliente_id:
+        try:
+            qs = qs.filter(cliente_id=uuid.UUID(cliente_id))
+        except ValueError:
+            cliente_id = ''
+    filtros = {'dias': dias, 'incluir_vencidos': incluir_vencidos, 'cliente_id': cliente_id, 'hoy': hoy}
+    return qs, filtros
+
+@login_required
+def panel_vencimientos(request):
+    qs, filtros = _filtros_vencimientos(request)
+    hoy = filtros['hoy']
+
+    # Conteos por cliente y totales: GROUP BY en la BD, sin cargar documentos
+    resumen = list(qs.resumen_por_cliente(hoy))
+    totales = qs.aggregate(
+        total=Count('id'),
+        vencidos=Count('id', filter=Q(fecha_vencimiento__lt=hoy)),
+        urgentes=Count('id', filter=Q(fecha_vencimiento__gte=hoy, fecha_vencimiento__lte=hoy + timedelta(days=7))),
+    )
+
+    documentos = qs.select_related('cliente', 'carpeta').only(
+        'id', 'nombre_archivo', 'fecha_vencimiento', 'cliente__nombre_empresa', 'carpeta__nombre'
+    ).order_by('fecha_vencimiento', 'id')
+    pagina = Paginator(documentos, 50).get_page(request.GET.get('page'))
+    for doc in pagina:
+        doc.dias_restantes = (doc.fecha_vencimiento - hoy).days
+
+    parametros = request.GET.copy()
+    parametros.pop('page', None)
+
+    return render(request, 'vencimientos/panel.html', {
+        'resumen': resumen,
+        'totales': totales,
+        'pagina': pagina,
+        'filtros': filtros,
+        'parametros': parametros.urlencode(),
+    })
+
+@login_required
+def exportar_vencimientos(request):
+    qs, filtros = _filtros_vencimientos(request)
+    hoy = filtros['hoy']
+    filas = Filas(
+        qs.order_by('fecha_vencimiento', 'id').values_list(
+            'cliente__nombre_empresa', 'nombre_archivo', 'carpeta__nombre', 'fecha_vencimiento'
+        ),
+        lambda cliente, nombre, carpeta, vence: (cliente, nombre, carpeta or '', vence, (vence - hoy).days),
+    )
+    return respuesta_exportacion(
+        request.GET.get('formato'),
+        f"vencimientos_{hoy:%Y%m%d}_{filtros['dias']}d",
+        ['Cliente', 'Documento', 'Carpeta', 'Vence', 'Días restantes'],
+        filas,
+        hoja='Vencimientos',
+    )
@@ -0,0 +1,244 @@
+# ==========================================
+# EXPEDIENTES/VIEWS/CLIENTES.PY - DASHBOARD, CLIENTES Y TAREAS
+# ==========================================
+import logging
+
+# --- Django Core ---
+from django.contrib import messages
+from django.contrib.auth.decorators import login_required
+from django.db.models import Count, Q
+from django.http import JsonResponse
+from django.shortcuts import render, redirect, get_object_or_404
+from django.utils import timezone
+
+# --- Modelos Locales ---
+from ..models import Usuario, Cliente, Carpeta, Expediente, Documento, Tarea, CampoAdicional, ArchivoTemporal
+
+# --- Utilidades ---
+from ..acceso import alcance_de
+from ..bitacora import registrar_bitacora, pagina_historial, serializar_registro
+
+logger = logging.getLogger(__name__)
+
+
+# ------------------------------------------
+# DASHBOARD Y CLIENTES
+# ------------------------------------------
+@login_required
+def dashboard(request):
+    qs = Cliente.objects.annotate(
+        num_expedientes=Count('expedientes', distinct=True),
+        urgencias=Count('tareas', filter=Q(tareas__prioridad='alta', tareas__completada=False), distinct=True)
+    ).order_by('-urgencias', '-fecha_registro')
+
+    alcance = alcance_de(request.user)
+    mis_clientes = qs.filter(alcance.filtro('id'))
+    base_clientes = alcance.filtro()
+
+    stats = {
+        'total_clientes': alcance.clientes_qs().count(),
+        'expedientes_activos': Expediente.objects.filter(base_clientes, estado='abierto').count(),
+        'tareas_pendientes': Tarea.objects.filter(base_clientes, completada=False).count(),
+        'docs_subidos': Documento.objects.filter(base_clientes).count()
+    }
+    
+    hoy = timezone.now().date()
+    tareas_criticas = Tarea.objects.filter(
+        base_clientes, 
+        completada=False, 
+        fecha_limite__lte=hoy
+    ).select_related('cliente')
+    
+    pendientes = 0
+    if request.user.rol == 'admin':
+        pendientes = Usuario.objects.filter(is_active=False).count()
+
+    return render(request, 'dashboard.html', {
+        'clientes': mis_clientes,
+        'stats': stats,
+        'usuarios_pendientes_conteo': pendientes,
+        'now': timezone.now(),
+        'alertas': {'tareas': tareas_criticas} 
+    })
+
+@login_required
+def nuevo_cliente(request):
+    if not alcance_de(request.user).puede('can_create_client'):
+        return redirect('dashboard')
+    if request.method == 'POST':
+        c = Cliente.objects.create(
+            nombre_empresa=request.POST.get('nombre_empresa'),
+            nombre_contacto=request.POST.get('nombre_contacto'),
+            email=request.POST.get('email'),
+            telefono=request.POST.get('telefono'),
+            logo=request.FILES.get('logo')
+        )
+        if request.user.rol != 'admin':
+            request.user.clientes_asignados.add(c)
+        return redirect('dashboard')
+    return render(request, 'nuevo_cliente.html')
+
+@login_required
+def eliminar_cliente(request, cliente_id):
+    if not alcance_de(request.user).puede('can_delete_client'):
+        return redirect('dashboard')
+    cliente = get_object_or_404(Cliente, id=cliente_id)
+    cliente.delete()
+    messages.success(request, "Cliente eliminado.")
+    return redirect('dashboard')
+
+@login_required
+def detalle_cliente(request, cliente_id, carpeta_id=None):
+    cliente = get_object_or_404(Cliente.objects.prefetch_related('carpetas_drive'), id=cliente_id)
+    
+    carpeta_actual = None
+    carpetas = []
+    documentos = []
+    breadcrumbs = []
+
+    if carpeta_id:
+        carpeta_actual = get_object_or_404(
+            Carpeta.objects.select_related('padre').prefetch_related('subcarpetas', 'documentos'), 
+            id=carpeta_id, 
+            cliente=cliente
+        )
+        carpetas = carpeta_actual.subcarpetas.all()
+        documentos = carpeta_actual.documentos.all().order_by('-fecha_subida')
+        
+        padre = carpeta_actual.padre
+        while padre:
+            breadcrumbs.insert(0, padre)
+            padre = padre.padre
+    else:
+        carpetas = [c for c in cliente.carpetas_drive.all() if c.padre_id is None]
+
+    stats_cliente = {
+        'total_docs': Documento.objects.filter(cliente=cliente).count(),
+        'expedientes_activos': len(cliente.carpetas_drive.all()) 
+    }
+
+    todas_carpetas = cliente.carpetas_drive.all()
+    
+    historial, historial_siguiente = pagina_historial(cliente.id, limite=10)
+
+    archivos_pendientes = ArchivoTemporal.objects.filter(solicitud__cliente=cliente)
+
+    context = {
+        'cliente': cliente,
+        'carpeta_actual': carpeta_actual,
+        'carpetas': carpetas,
+        'documentos': documentos,
+        'breadcrumbs': breadcrumbs,
+        'stats_cliente': stats_cliente,
+        'todas_carpetas': todas_carpetas,
+        'historial': historial,
+        'historial_siguiente': historial_siguiente,
+        'archivos_pendientes': archivos_pendientes,
+    }
+
+    return render(request, 'detalle_cliente.html', context)
+
+@login_required
+def api_bitacora_cliente(request, cliente_id):
+    if not alcance_de(request.user).ve_cliente(cliente_id):
+        return JsonResponse({'error': 'Sin acceso'}, status=403)
+    try:
+        limite = int(request.GET.get('limite', 20))
+    except ValueError:
+        limite = 20
+    registros, siguiente = pagina_historial(cliente_id, request.GET.get('cursor'), limite)
+    return JsonResponse({'resultados': [serializar_registro(r) for r in registros], 'siguiente': siguiente})
+
+@login_required
+def editar_cliente(request, cliente_id):
+    cliente = get_object_or_404(Cliente, id=cliente_id)
+    if not alcance_de(request.user).ve_cliente(cliente.id):
+        return redirect('dashboard')
+
+    campos_dinamicos = CampoAdicional.objects.all()
+
+    if request.method == 'POST':
+        cliente.nombre_empresa = request.POST.get('nombre_empresa')
+        cliente.nombre_contacto = request.POST.get('nombre_contacto')
+        cliente.email = request.POST.get('email')
+        cliente.telefono = request.POST.get('telefono')
+        
+        if request.FILES.get('logo'):
+            cliente.logo = request.FILES['logo']
+
+        datos_nuevos = cliente.datos_extra or {}
+        for campo in campos_dinamicos:
+            valor = request.POST.get(f"custom_{campo.id}")
+            if valor:
+                datos_nuevos[campo.nombre] = valor
+        
+        cliente.datos_extra = datos_nuevos
+        cliente.save()
+        registrar_bitacora(request.user, cliente, 'edicion', "Actualizó datos.")
+        messages.success(request, "Cliente actualizado.")
+        return redirect('detalle_cliente', cliente_id=cliente.id)
+
+    return render(request, 'clientes/editar.html', {
+        'c': cliente,
+        'campos_dinamicos': campos_dinamicos,
+        'datos_existentes': cliente.datos_extra
+    })
+
+
+# ------------------------------------------
+# CAMPOS ADICIONALES
+# ------------------------------------------
+@login_required
+def configurar_campos(request):
+    if request.user.rol != 'admin': return redirect('dashboard')
+    campos = CampoAdicional.objects.all()
+    if request.method == 'POST':
+        nombre = request.POST.get('nombre')
+        if not CampoAdicional.objects.filter(nombre__iexact=nombre).exists():
+            CampoAdicional.objects.create(nombre=nombre, tipo=request.POST.get('tipo'))
+            messages.success(request, f"Campo '{nombre}' agregado.")
+        return redirect('configurar_campos')
+    return render(request, 'clientes/configurar_campos.html', {'campos': campos})
+
+@login_required
+def eliminar_campo_dinamico(request, campo_id):
+    if request.user.rol != 'admin': return redirect('dashboard')
+    get_object_or_404(CampoAdicional, id=campo_id).delete()
+    return redirect('configurar_campos')
+
+
+# ------------------------------------------
+# TAREAS
+# ------------------------------------------
+@login_required
+def gestionar_tarea(request, cliente_id):
+    if request.method == 'POST':
+        Tarea.objects.create(
+            cliente_id=cliente_id, titulo=request.POST.get('titulo'),
+            fecha_limite=request.POST.get('fecha_limite'), prioridad=request.POST.get('prioridad')
+        )
+    return redirect('detalle_cliente', cliente_id=cliente_id)
+
+@login_required
+def toggle_tarea(request, tarea_id):
+    t = get_object_or_404(Tarea, id=tarea_id)
+    t.completada = not t.completada
+    t.save()
+    return redirect('detalle_cliente', cliente_id=t.cliente.id)
+
+@login_required
+def editar_tarea(request, tarea_id):
+    t = get_object_or_404(Tarea, id=tarea_id)
+    if request.method == 'POST':
+        t.titulo = request.POST.get('titulo')
+        t.fecha_limite = request.POST.get('fecha_limite')
+        t.prioridad = request.POST.get('prioridad')
+        t.save()
+    return redirect('detalle_cliente', cliente_id=t.cliente.id)
+
+@login_required
+def eliminar_tarea(request, tarea_id):
+    t = get_object_or_404(Tarea, id=tarea_id)
+    c_id = t.cliente.id
+    t.delete()
+    return redirect('detalle_cliente', cliente_id=c_id)
@@ -0,0 +1,369 @@
+# ==========================================
+# EXPEDIENTES/VIEWS/CORREOS.PY - CORREOS A CLIENTES
+# ==========================================
+import io
+import logging
+import zipfile
+
+# --- Django Core ---
+from django.conf import settings
+from django.contrib import messages
+from django.contrib.auth.decorators import login_required
+from django.core.mail import EmailMultiAlternatives, EmailMessage, send_mail
+from django.shortcuts import render, redirect, get_object_or_404
+from django.template.loader import render_to_string
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.html import strip_tags
+
+# --- Modelos Locales ---
+from ..models import Cliente, Carpeta, Cotizacion, SolicitudEnlace
+
+# --- Utilidades ---
+from ..bitacora import registrar_bitacora
+from ..cotizacion_pdf import con_partidas, congelar, leer_pdf
+
+logger = logging.getLogger(__name__)
+
+
+# ------------------------------------------
+# RECORDATORIOS Y ENVÍOS
+# ------------------------------------------
+@login_required
+def enviar_recordatorio_documentacion(request, cliente_id):
+    cliente = get_object_or_404(Cliente.objects.prefetch_related('carpetas_drive'), id=cliente_id)
+    
+    faltantes_por_carpeta = {}
+    total_faltantes = 0
+    
+    for carpeta in cliente.carpetas_drive.all():
+        detalle = carpeta.obtener_detalle_cumplimiento()
+        if detalle:
+            items_rojos = [item['nombre'] for item in detalle if item['estado'] == 'missing']
+            if items_rojos:
+                faltantes_por_carpeta[carpeta.nombre] = items_rojos
+                total_faltantes += len(items_rojos)
+    
+    if total_faltantes == 0:
+        messages.success(request, "¡Este cliente ya tiene toda su documentación completa! No es necesario enviar recordatorios.")
+        return redirect('detalle_cliente', cliente_id=cliente.id)
+
+    asunto = f"Pendientes de Documentación - {cliente.nombre_empresa} - AppLegal"
+    
+    mensaje = f"""
+Estimado(a) {cliente.nombre_contacto},
+
+Esperamos que este correo le encuentre bien.
+
+Le escribimos para darle seguimiento a su expediente de regularización. Para poder avanzar con los trámites ante las autoridades correspondientes, hemos detectado que aún tenemos algunos documentos pendientes de recibir.
+
+A continuación, le compartimos el listado de los requisitos faltantes organizados por carpeta:
+------------------------------------------------------------
+"""
+
+    for nombre_carpeta, documentos in faltantes_por_carpeta.items():
+        mensaje += f"\n📂 {nombre_carpeta}:\n"
+        for doc in documentos:
+            mensaje += f"   [ ] {doc}\n"
+
+    mensaje += f"""
+------------------------------------------------------------
+
+Le agradeceríamos mucho si pudiera compartirnos estos archivos a la brevedad posible, ya sea subiéndolos directamente a la plataforma o respondiendo a este correo.
+
+Si tiene alguna duda sobre algún requisito en específico, quedamos totalmente a sus órdenes para apoyarle.
+
+Atentamente,
+
+Gestiones Cordpad
+"""
+
+    try:
+        if cliente.email:
+            send_mail(
+                asunto,
+                mensaje,
+                settings.DEFAULT_FROM_EMAIL,
+                [cliente.email],
+                fail_silently=False,
+            )
+            messages.success(request, f"✅ Se envió el recordatorio a {cliente.email} con {total_faltantes} documentos faltantes.")
+        else:
+            messages.warning(request, "⚠️ El cliente no tiene un correo electrónico registrado.")
+    except Exception as e:
+        logger.error(f"Error enviando correo recordatorio: {e}")
+        messages.error(request, f"❌ Error al enviar el correo: {str(e)}")
+
+    return redirect('detalle_cliente', cliente_id=cliente.id)
+
+@login_required
+def redactar_correo_autorizaciones(request, carpeta_id):
+    carpeta = get_object_or_404(Carpeta, id=carpeta_id)
+    cliente = carpeta.cliente
+    
+    if request.method == 'POST':
+        asunto = request.POST.get('asunto')
+        mensaje_usuario = request.POST.get('mensaje')
+        destinatario = request.POST.get('destinatario')
+        
+        buffer = io.BytesIO()
+        with zipfile.ZipFile(buffer, 'w') as zip_file:
+            for doc in carpeta.documentos.all():
+                try:
+                    zip_file.write(doc.archivo.path, arcname=doc.nombre_archivo)
+                except FileNotFoundError:
+                    pass
+        buffer.seek(0)
+
+        cuerpo_html = render_to_string('expedientes/email_autorizaciones_template.html', {
+            'cliente': cliente,
+            'usuario': request.user,
+            'mensaje_usuario': mensaje_usuario,
+            'archivos': carpeta.documentos.all()
+        })
+        
+        email = EmailMessage(
+            subject=asunto,
+            body=cuerpo_html,
+            from_email=settings.DEFAULT_FROM_EMAIL,
+            to=[destinatario],
+            cc=[request.user.email],
+            # --- CAMBIO: RESPUESTA A MARIBEL ---
+            reply_to=['maribel.aldana@gestionescorpad.com']
+        )
+        email.content_subtype = "html"
+        
+        nombre_zip = f"Autorizaciones_{cliente.nombre_empresa}_{timezone.now().date()}.zip"
+        email.attach(nombre_zip, buffer.getvalue(), 'application/zip')
+        
+        try:
+            email.send()
+            messages.success(request, f"✅ Correo enviado a {destinatario}.")
+            return redirect('detalle_carpeta', cliente_id=cliente.id, carpeta_id=carpeta.id)
+        except Exception as e:
+            logger.error(f"Error enviando correo autorizaciones: {e}")
+            messages.error(request, f"❌ Error: {e}")
+    
+    mensaje_plano = (
+        f"Estimado(a) {cliente.nombre_contacto},\n\n"
+        f"Por medio del presente le hago entrega de las autorizaciones liberadas para {cliente.nombre_empresa}.\n\n"
+        "Adjunto encontrará un archivo ZIP con todos los documentos digitales para su resguardo.\n\n"
+        "Quedo a sus órdenes."
+    )
+    
+    return render(request, 'expedientes/redactar_correo.html', {
+        'carpeta': carpeta,
+        'cliente': cliente,
+        'asunto': f"Entrega de Autorizaciones - {cliente.nombre_empresa}",
+        'mensaje': mensaje_plano,
+        'email_destino': cliente.email
+    })
+
+@login_required
+def enviar_correo_universal(request, cliente_id, tipo_correo):
+    """
+    Vista unificada optimizada para evitar SPAM.
+    - Usa URL pública para el logo en lugar de adjunto CID.
+    - Envía respuestas a Maribel.
+    """
+    cliente = get_object_or_404(Cliente.objects.prefetch_related('carpetas_drive'), id=cliente_id)
+    
+    # URL del logo para el correo (Evita penalización SpamAssassin)
+    # Cambia este dominio si usas uno propio en el futuro (ej: https://gestionescorpad.com/...)
+    domain = "https://portalgestionescorpad.up.railway.app"
+    logo_url = f"{domain}/static/img/logo.png"
+
+    # ==========================================
+    # PREPARAR CONTEXTO GENERAL
+    # ==========================================
+    context = {
+        'cliente': cliente,
+        'tipo_correo': tipo_correo,
+        'destinatario': cliente.email or '',
+        'firma_nombre': 'Lic. Maribel Aldana Santos',
+        'firma_cargo': 'Gestiones Corpad | Directora General',
+        'logo_url': logo_url, 
+    }
+
+    # --- LÓGICA ESPECÍFICA POR TIPO (GET) ---
+    if tipo_correo == 'cotizacion':
+        cotizacion_id = request.GET.get('cotizacion_id') or request.POST.get('cotizacion_id')
+        cotizacion = get_object_or_404(Cotizacion.objects.prefetch_related('items__servicio'), id=cotizacion_id)
+        
+        context.update({
+            'cotizacion': cotizacion,
+            'destinatario': cotizacion.prospecto_email or '',
+            'asunto': f"Propuesta: {cotizacion.titulo}",
+            'mensaje': (
+                f"Estimado/a {cotizacion.prospecto_nombre},\n\n"
+                f"Adjunto a este correo encontrará la propuesta detallada para el proyecto: {cotizacion.titulo}.\n\n"
+                "Quedo a su entera disposición para cualquier duda."
+            ),
+            'url_cancelar': reverse('detalle_cotizacion', args=[cotizacion.id]),
+        })
+
+    elif tipo_correo == 'autorizaciones':
+        carpeta_id = request.GET.get('carpeta_id') or request.POST.get('carpeta_id')
+        carpeta = get_object_or_404(Carpeta.objects.prefetch_related('documentos'), id=carpeta_id)
+        lista_adjuntos = carpeta.documentos.all()
+        
+        context.update({
+            'carpeta': carpeta,
+            'lista_adjuntos': lista_adjuntos,
+            'total_adjuntos': lista_adjuntos.count(),
+            'asunto': f"Entrega de Autorizaciones - {cliente.nombre_empresa}",
+            'mensaje': (
+                f"Estimado(a) {cliente.nombre_contacto},\n\n"
+                f"Por medio del presente le hago entrega de las autorizaciones liberadas para {cliente.nombre_empresa}.\n\n"
+                "Adjunto encontrará un archivo ZIP con todos los documentos digitales para su resguardo.\n\n"
+                "Quedo a sus órdenes."
+            ),
+            'url_cancelar': reverse('detalle_carpeta', args=[cliente.id, carpeta.id]),
+        })
+
+    elif tipo_correo == 'recordatorio':
+        faltantes_por_carpeta = {}
+        total_faltantes = 0
+        
+        for carpeta in cliente.carpetas_drive.all():
+            detalle = carpeta.obtener_detalle_cumplimiento()
+            if detalle:
+                items_rojos = [item['nombre'] for item in detalle if item['estado'] == 'missing']
+                if items_rojos:
+                    faltantes_por_carpeta[carpeta.nombre] = items_rojos
+                    total_faltantes += len(items_rojos)
+        
+        if total_faltantes == 0:
+            messages.success(request, "¡Este cliente ya tiene toda su documentación completa!")
+            return redirect('detalle_cliente', cliente_id=cliente.id)
+
+        solicitud = SolicitudEnlace.objects.create(cliente=cliente)
+        link_carga = request.build_absolute_uri(f'/portal-cliente/{solicitud.id}/')
+
+        context.update({
+            'faltantes_por_carpeta': faltantes_por_carpeta,
+            'total_faltantes': total_faltantes,
+            'link_carga': link_carga,
+            'asunto': f"Pendientes de Documentación - {cliente.nombre_empresa}",
+            'mensaje': (
+                f"Estimado(a) {cliente.nombre_contacto},\n\n"
+                "Esperamos que se encuentre bien.\n\n"
+                "Le escribimos para darle seguimiento a su expediente de regularización. "
+                "Hemos detectado que aún tenemos algunos documentos pendientes de recibir.\n\n"
+                "A continuación encontrará el listado detallado y un botón para subir los archivos directamente desde su dispositivo.\n\n"
+                "Quedamos a sus órdenes para cualquier duda."
+            ),
+            'url_cancelar': reverse('detalle_cliente', args=[cliente.id]),
+        })
+
+    else:
+        messages.error(request, "Tipo de correo no válido.")
+        return redirect('detalle_cliente', cliente_id=cliente.id)
+
+    # ==========================================
+    # PROCESAR ENVÍO (POST)
+    # ==========================================
+    if request.method == 'POST':
+        destinatario = request.POST.get('destinatario')
+        asunto = request.POST.get('asunto')
+        mensaje = request.POST.get('mensaje')
+        firma_nombre = request.POST.get('firma_nombre')
+        firma_cargo = request.POST.get('firma_cargo')
+        
+        # Contexto para el template HTML del correo
+        email_context = {
+            'cliente': cliente,
+            'tipo_correo': tipo_correo,
+            'mensaje': mensaje,
+            'firma_nombre': firma_nombre,
+            'firma_cargo': firma_cargo,
+            'logo_url': logo_url, # URL pública (NO CID)
+        }
+
+        try:
+            # 1. PREPARACIÓN SEGÚN TIPO
+            pdf_bytes = None
+            zip_buffer = None
+            filename_adjunto = None
+
+            if tipo_correo == 'cotizacion':
+                cotizacion_id = request.POST.get('cotizacion_id')
+                cotizacion = get_object_or_404(con_partidas(), id=cotizacion_id)
+                email_context['cotizacion'] = cotizacion
+                
+                # PDF de la versión enviada (se congela aquí si cambió desde el último envío)
+                version = congelar(cotizacion, request.build_absolute_uri('/'), request.user.id)
+                pdf_bytes = leer_pdf(version)
+                filename_adjunto = f"Cotizacion_{cotizacion.id}.pdf"
+
+            elif tipo_correo == 'autorizaciones':
+                carpeta_id = request.POST.get('carpeta_id')
+                carpeta = get_object_or_404(Carpeta.objects.prefetch_related('documentos'), id=carpeta_id)
+                lista_adjuntos = carpeta.documentos.all()
+                email_context['lista_adjuntos'] = lista_adjuntos
+                
+                # Generar ZIP
+                zip_buffer = io.BytesIO()
+                with zipfile.ZipFile(zip_buffer, 'w') as zip_file:
+                    for doc in lista_adjuntos:
+                        try:
+                            zip_file.write(doc.archivo.path, arcname=doc.nombre_archivo)
+                        except FileNotFoundError:
+                            pass
+                zip_buffer.seek(0)
+                filename_adjunto = f"Autorizaciones_{cliente.nombre_empresa}_{timezone.now().date()}.zip"
+
+            elif tipo_correo == 'recordatorio':
+                # Recuperar o crear link
+                solicitud = SolicitudEnlace.objects.filter(cliente=cliente, activa=True).last()
+                if not solicitud:
+                    solicitud = SolicitudEnlace.objects.create(cliente=cliente)
+                link_carga = request.build_absolute_uri(f'/portal-cliente/{solicitud.id}/')
+                
+                email_context['faltantes_por_carpeta'] = context.get('faltantes_por_carpeta', {})
+                email_context['link_carga'] = link_carga
+
+            # 2. CONSTRUIR EL CORREO
+            html_body = render_to_string('correo/email_body_universal.html', email_context)
+            text_body = strip_tags(html_body) # Versión texto plano automática
+
+            email = EmailMultiAlternatives(
+                subject=asunto,
+                body=text_body,
+                from_email=settings.DEFAULT_FROM_EMAIL,
+                to=[destinatario],
+                reply_to=['maribel.aldana@gestionescorpad.com'] # <--- CLAVE PARA RESPUESTAS
+            )
+            
+            # Copia oculta al usuario en autorizaciones
+            if tipo_correo == 'autorizaciones':
+                email.cc = [request.user.email]
+
+            email.attach_alternative(html_body, "text/html")
+
+            # 3. ADJUNTAR ARCHIVOS (Si aplica)
+            if pdf_bytes:
+                email.attach(filename_adjunto, pdf_bytes, 'application/pdf')
+            
+            if zip_buffer:
+                email.attach(filename_adjunto, zip_buffer.getvalue(), 'application/zip')
+
+            # 4. ENVIAR
+            email.send()
+            messages.success(request, f"✅ Correo enviado exitosamente a {destinatario}")
+            
+            registrar_bitacora(request.user, cliente, 'envio_correo', f"Envió correo ({tipo_correo}): {asunto}")
+
+        except Exception as e:
+            logger.error(f"Error enviando correo universal ({tipo_correo}): {e}")
+            messages.error(request, f"❌ Error al enviar el correo: {str(e)}")
+
+        # Redirigir
+        if tipo_correo == 'cotizacion':
+            return redirect('detalle_cotizacion', cotizacion_id=request.POST.get('cotizacion_id'))
+        elif tipo_correo == 'autorizaciones':
+            return redirect('detalle_carpeta', cliente_id=cliente.id, carpeta_id=request.POST.get('carpeta_id'))
+        else:
+            return redirect('detalle_cliente', cliente_id=cliente.id)
+
+    return render(request, 'correo/enviar_correo_universal.html', context)
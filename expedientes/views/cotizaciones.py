@@ -0,0 +1,532 @@
+# ==========================================
+# EXPEDIENTES/VIEWS/COTIZACIONES.PY - COTIZACIONES Y SERVICIOS
+# ==========================================
+import logging
+import os
+import uuid
+from datetime import timedelta
+from decimal import Decimal
+from email.mime.image import MIMEImage
+
+# --- Django Core ---
+from django.conf import settings
+from django.contrib import messages
+from django.contrib.auth.decorators import login_required
+from django.core.mail import EmailMultiAlternatives
+from django.db import transaction
+from django.db.models import Q
+from django.http import FileResponse, Http404, HttpResponse, JsonResponse
+from django.shortcuts import render, redirect, get_object_or_404
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, quote_etag
+from django.utils.dateparse import parse_date
+from django.utils.html import strip_tags
+from django.views.decorators.cache import cache_control
+
+# --- Modelos Locales ---
+from ..models import (
+    Cliente, Carpeta, Servicio, Cotizacion, ItemCotizacion, PlantillaMensaje,
+    CuentaPorCobrar, Usuario,
+)
+
+# --- Utilidades ---
+from ..cotizacion_pdf import (
+    CARPETA as CARPETA_PDF_FINAL, abrir_pdf_publico, adjuntar_pdf_final, con_partidas, congelar, leer_pdf,
+    pdfs_de_cotizaciones, publica, version_actual,
+)
+from ..exportaciones import Filas, respuesta_exportacion, respuesta_zip
+from ..tareas import encolar
+from ..utils import generar_pdf_response
+
+logger = logging.getLogger(__name__)
+
+
+# ------------------------------------------
+# SERVICIOS
+# ------------------------------------------
+@login_required
+def gestion_servicios(request):
+    if not request.user.access_cotizaciones: return redirect('dashboard')
+    servicios = Servicio.objects.all().order_by('nombre')
+    return render(request, 'cotizaciones/servicios.html', {'servicios': servicios})
+
+@login_required
+def guardar_servicio(request):
+    if request.method == 'POST':
+        s_id = request.POST.get('servicio_id')
+        s = get_object_or_404(Servicio, id=s_id) if s_id else Servicio()
+        
+        s.nombre = request.POST.get('nombre')
+        s.descripcion = request.POST.get('descripcion')
+        s.precio_base = request.POST.get('precio')
+        
+        nombres = request.POST.getlist('campo_nombre[]')
+        valores = request.POST.getlist('campo_valor[]')
+        
+        estructura = []
+        for nombre, valor in zip(nombres, valores):
+            if nombre.strip():
+                estructura.append({'nombre': nombre.strip(), 'valor': valor.strip()})
+        
+        s.campos_dinamicos = estructura
+        s.save()
+        messages.success(request, "Servicio actualizado correctamente.")
+    return redirect('gestion_servicios')
+
+@login_required
+def eliminar_servicio(request, servicio_id):
+    get_object_or_404(Servicio, id=servicio_id).delete()
+    return redirect('gestion_servicios')
+
+
+# ------------------------------------------
+# COTIZACIONES
+# ------------------------------------------
+@login_required
+def lista_cotizaciones(request):
+    if not request.user.access_cotizaciones: return redirect('dashboard')
+    cotizaciones = Cotizacion.objects.select_related('creado_por', 'cliente_convertido').order_by('-fecha_creacion')
+    return render(request, 'cotizaciones/lista.html', {
+        'cotizaciones': cotizaciones,
+        'estados': Cotizacion.ESTADOS,
+        'creadores': Usuario.objects.filter(cotizacion__isnull=False).distinct().order_by('username'),
+    })
+
+def _fecha(valor):
+    try:
+        return parse_date(valor or '')
+    except ValueError:  # Bien formada pero imposible (2026-02-30)
+        return None
+
+def _filtros_exportacion(get):
+    """Lee ?desde=&hasta=&estado=&creado_por= y devuelve (QuerySet filtrado, nombre base del archivo)."""
+    desde, hasta = _fecha(get.get('desde')), _fecha(get.get('hasta'))
+    estado = get.get('estado') if get.get('estado') in dict(Cotizacion.ESTADOS) else ''
+    qs = Cotizacion.objects.all()
+    if desde:
+        qs = qs.filter(fecha_creacion__date__gte=desde)
+    if hasta:
+        qs = qs.filter(fecha_creacion__date__lte=hasta)
+    if estado:
+        qs = qs.filter(estado=estado)
+    try:
+        if get.get('creado_por'):
+            qs = qs.filter(creado_por_id=uuid.UUID(get['creado_por']))
+    except ValueError:
+        pass
+    nombre = '_'.join(filter(None, ['cotizaciones', desde and desde.isoformat(), hasta and hasta.isoformat(), estado]))
+    return qs, nombre
+
+@login_required
+async def exportar_cotizaciones_zip(request):
+    usuario = await request.auser()
+    if not usuario.access_cotizaciones: return redirect('dashboard')
+
+    qs, nombre = _filtros_exportacion(request.GET)
+    ids = [i async for i in qs.order_by('id').values_list('id', flat=True)]
+    if not ids:
+        messages.warning(request, "Ninguna cotización coincide con los filtros.")
+        return redirect('lista_cotizaciones')
+    if len(ids) > settings.EXPORTACION_MAX_COTIZACIONES:
+        messages.error(request, f"Son {len(ids)} cotizaciones; el máximo por descarga es {settings.EXPORTACION_MAX_COTIZACIONES}. Acota el rango de fechas.")
+        return redirect('lista_cotizaciones')
+
+    logger.info(f"{usuario.username} exporta {len(ids)} cotizaciones ({nombre})")
+    return respuesta_zip(nombre, pdfs_de_cotizaciones(ids, request.build_absolute_uri('/')))
+
+@login_required
+def exportar_cotizaciones(request):
+    """Las cotizaciones filtradas en CSV/XLSX: una fila por cotización, o por partida con ?partidas=1."""
+    if not request.user.access_cotizaciones: return redirect('dashboard')
+    qs, nombre = _filtros_exportacion(request.GET)
+    estados = dict(Cotizacion.ESTADOS)
+
+    if request.GET.get('partidas') == '1':
+        filas = Filas(
+            ItemCotizacion.objects.filter(cotizacion__in=qs).order_by('cotizacion_id', 'id').values_list(
+                'cotizacion_id', 'cotizacion__fecha_creacion', 'cotizacion__prospecto_empresa', 'cotizacion__prospecto_nombre',
+                'cotizacion__estado', 'servicio__nombre', 'descripcion_personalizada', 'cantidad', 'precio_unitario', 'subtotal',
+            ),
+            lambda folio, fecha, empresa, contacto, estado, servicio, descripcion, cantidad, precio, subtotal: (
+                folio, fecha, empresa or contacto, estados.get(estado, estado), servicio, descripcion, cantidad, precio, subtotal,
+            ),
+        )
+        return respuesta_exportacion(
+            request.GET.get('formato'), f"{nombre}_partidas",
+            ['Folio', 'Fecha', 'Cliente / Prospecto', 'Estado', 'Servicio', 'Descripción', 'Cantidad', 'Precio unitario', 'Subtotal'],
+            filas, hoja='Partidas',
+        )
+
+    filas = Filas(
+        qs.order_by('id').values_list(
+            'id', 'fecha_creacion', 'titulo', 'prospecto_empresa', 'prospecto_nombre', 'prospecto_email', 'estado',
+            'subtotal', 'descuento', 'total', 'monto_iva', 'total_con_iva', 'validez_hasta', 'creado_por__username',
+            'cliente_convertido__nombre_empresa',
+        ),
+        lambda folio, fecha, titulo, empresa, contacto, email, estado, subtotal, descuento, neto, iva, total, validez, creador, cliente: (
+            folio, fecha, titulo, empresa, contacto, email, estados.get(estado, estado), subtotal, descuento, neto, iva, total,
+            validez, creador, cliente,
+        ),
+    )
+    return respuesta_exportacion(
+        request.GET.get('formato'), nombre,
+        ['Folio', 'Fecha', 'Título', 'Empresa', 'Contacto', 'Email', 'Estado', 'Subtotal', 'Descuento', 'Total sin IVA',
+         'IVA', 'Total', 'Vigencia', 'Creada por', 'Cliente'],
+        filas, hoja='Cotizaciones',
+    )
+
+@login_required
+@transaction.atomic
+def nueva_cotizacion(request):
+    if request.method == 'POST':
+        titulo = request.POST.get('titulo')
+        
+        prospecto_empresa = request.POST.get('prospecto_empresa')
+        prospecto_nombre = request.POST.get('prospecto_nombre')
+        prospecto_email = request.POST.get('prospecto_email')
+        prospecto_telefono = request.POST.get('prospecto_telefono')
+        prospecto_direccion = request.POST.get('prospecto_direccion')
+        prospecto_cargo = request.POST.get('prospecto_cargo')
+        validez = request.POST.get('validez_hasta')
+        
+        if not titulo:
+            cliente_ref = prospecto_empresa if prospecto_empresa else prospecto_nombre
+            titulo = f"Cotización para {cliente_ref}"
+
+        porcentaje_str = request.POST.get('porcentaje_descuento', '0')
+        try: porcentaje_descuento = Decimal(porcentaje_str)
+        except: porcentaje_descuento = Decimal('0.00')
+
+        aplica_iva = request.POST.get('aplica_iva') == 'on'
+        tasa_str = request.POST.get('porcentaje_iva_personalizado', '16')
+        try: tasa_iva = Decimal(tasa_str)
+        except: tasa_iva = Decimal('16.00')
+
+        cotizacion = Cotizacion.objects.create(
+            titulo=titulo,
+            prospecto_empresa=prospecto_empresa,
+            prospecto_nombre=prospecto_nombre,
+            prospecto_email=prospecto_email,
+            prospecto_telefono=prospecto_telefono,
+            prospecto_direccion=prospecto_direccion,
+            prospecto_cargo=prospecto_cargo,
+            porcentaje_descuento=porcentaje_descuento,
+            validez_hasta=validez if validez else None,
+            condiciones_pago=request.POST.get('condiciones_pago', '50_50'),
+            tiempo_entrega=request.POST.get('tiempo_entrega', '30_dias'),
+            aplica_iva=aplica_iva,
+            porcentaje_iva=tasa_iva,
+            creado_por=request.user
+        )
+
+        servicios_ids = request.POST.getlist('servicios_seleccionados')
+        cantidades = request.POST.getlist('cantidades')
+        precios = request.POST.getlist('precios_personalizados')
+        descripciones = request.POST.getlist('descripciones_personalizadas')
+
+        items_to_create = []
+        servicios_db = {str(s.id): s for s in Servicio.objects.filter(id__in=servicios_ids)}
+
+        for s_id, cant, prec, desc in zip(servicios_ids, cantidades, precios, descripciones):
+            if s_id and s_id in servicios_db:
+                servicio = servicios_db[s_id]
+                cantidad = int(cant)
+                try: precio_u = Decimal(prec)
+                except: precio_u = Decimal('0.00')
+                
+                items_to_create.append(ItemCotizacion(
+                    cotizacion=cotizacion,
+                    servicio=servicio,
+                    cantidad=cantidad,
+                    precio_unitario=precio_u,
+                    descripcion_personalizada=desc
+                ))
+        
+        ItemCotizacion.objects.bulk_create(items_to_create)
+        cotizacion.calcular_totales()
+
+        messages.success(request, 'Cotización creada exitosamente.')
+        return redirect('detalle_cotizacion', cotizacion_id=cotizacion.id)
+
+    servicios = Servicio.objects.all()
+    return render(request, 'cotizaciones/crear.html', {'servicios': servicios})
+
+@login_required
+async def buscar_cliente_api(request):
+    query = request.GET.get('q', '')
+    if len(query) < 2:
+        return JsonResponse([], safe=False)
+    
+    clientes_encontrados = Cliente.objects.filter(
+        Q(nombre_empresa__icontains=query) | 
+        Q(nombre_contacto__icontains=query)
+    ).only('nombre_empresa', 'nombre_contacto', 'email', 'telefono', 'datos_extra')[:5]
+
+    resultados = []
+    async for c in clientes_encontrados:
+        direccion = ""
+        cargo = ""
+        if c.datos_extra and isinstance(c.datos_extra, dict):
+            direccion = c.datos_extra.get('direccion', '')
+            cargo = c.datos_extra.get('cargo', '')
+
+        resultados.append({
+            'prospecto_empresa': c.nombre_empresa,
+            'prospecto_nombre': c.nombre_contacto,
+            'prospecto_email': c.email,
+            'prospecto_telefono': c.telefono,
+            'prospecto_direccion': direccion,
+            'prospecto_cargo': cargo
+        })
+
+    return JsonResponse(resultados, safe=False)
+
+@login_required
+def detalle_cotizacion(request, cotizacion_id):
+    c = get_object_or_404(
+        Cotizacion.objects.prefetch_related('items__servicio'), 
+        id=cotizacion_id
+    )
+    return render(request, 'cotizaciones/detalle.html', {
+        'c': c, 'plantillas_ws': PlantillaMensaje.objects.filter(tipo='whatsapp'),
+        # El enlace público existe desde el primer envío
+        'enviada': c.versiones.exists(),
+    })
+
+@login_required
+def generar_pdf_cotizacion(request, cotizacion_id):
+    c = get_object_or_404(con_partidas(), id=cotizacion_id)
+    # Ya enviada y sin cambios desde entonces: el PDF guardado de esa versión
+    version = version_actual(c)
+    if version:
+        return FileResponse(version.pdf.open('rb'), content_type='application/pdf', filename=f"Cotizacion_{c.id}.pdf")
+    return generar_pdf_response(request, 'cotizaciones/pdf_template.html', {'c': c}, f"Cotizacion_{c.id}.pdf")
+
+@login_required
+def convertir_a_cliente(request, cotizacion_id):
+    if request.method != 'POST':
+        return redirect('detalle_cotizacion', cotizacion_id=cotizacion_id)
+
+    # Transacción corta: solo filas. El PDF final y su subida van al pool de tareas tras el commit.
+    with transaction.atomic():
+        cli, convertida = _convertir_en_cliente(request, cotizacion_id)
+    if not convertida:
+        messages.warning(request, "Esta cotización ya es un cliente.")
+        return redirect('detalle_cliente', cliente_id=cli.id)
+
+    messages.success(
+        request,
+        "¡Trato cerrado! Se han generado las carpetas con sus subcarpetas de autorizaciones. "
+        "El PDF de la cotización aparecerá en la carpeta Cotizaciones en unos segundos."
+    )
+    return redirect('detalle_cliente', cliente_id=cli.id)
+
+def _convertir_en_cliente(request, cotizacion_id):
+    """
+    Crea o reutiliza el cliente, sus carpetas y cuentas por cobrar, y agenda el PDF final.
+
+    Returns:
+        (cliente, True) si se convirtió ahora; (cliente existente, False) si ya estaba convertida.
+    """
+    # El bloqueo evita que un doble envío convierta dos veces la misma cotización
+    c = get_object_or_404(Cotizacion.objects.select_for_update(of=('self',)).select_related('cliente_convertido'), id=cotizacion_id)
+
+    if c.cliente_convertido:
+        return c.cliente_convertido, False
+
+    items_aceptados_ids = request.POST.getlist('items_seleccionados')
+    items_a_borrar = ItemCotizacion.objects.filter(cotizacion=c).exclude(id__in=items_aceptados_ids)
+    if items_a_borrar.exists():
+        items_a_borrar.delete()
+        c.calcular_totales()
+        c.refresh_from_db()
+
+    nombre_busqueda = c.prospecto_empresa if c.prospecto_empresa else c.prospecto_nombre
+    cli = Cliente.objects.filter(nombre_empresa__iexact=nombre_busqueda).first()
+
+    if not cli:
+        cli = Cliente.objects.create(
+            nombre_empresa=nombre_busqueda,
+            nombre_contacto=c.prospecto_nombre,
+            email=c.prospecto_email,
+            telefono=c.prospecto_telefono,
+            datos_extra={'direccion': c.prospecto_direccion, 'cargo': c.prospecto_cargo}
+        )
+        if request.user.rol != 'admin':
+            request.user.clientes_asignados.add(cli)
+
+    carpetas_seleccionadas = request.POST.getlist('carpetas_seleccionadas')
+    carpetas_base = ['LICENCIA', 'FUNCIONAMIENTO', 'PROTECCIÓN CIVIL']
+    
+    for nombre_carpeta in carpetas_base:
+        if nombre_carpeta not in carpetas_seleccionadas:
+            Carpeta.objects.filter(cliente=cli, nombre=nombre_carpeta).delete()
+        else:
+            carpeta_padre, created = Carpeta.objects.get_or_create(
+                nombre=nombre_carpeta, 
+                cliente=cli, 
+                defaults={'es_expediente': False}
+            )
+            
+            Carpeta.objects.get_or_create(
+                nombre="Autorizaciones liberadas",
+                cliente=cli,
+                padre=carpeta_padre,
+                defaults={'es_expediente': False}
+            )
+    
+    Carpeta.objects.get_or_create(nombre=CARPETA_PDF_FINAL, cliente=cli, defaults={'es_expediente': False})
+
+    monto_final = c.total_con_iva if c.aplica_iva else c.total
+    hoy = timezone.now().date()
+    
+    dias_plazo = 15
+    if c.tiempo_entrega == '30_dias': dias_plazo = 30
+    elif c.tiempo_entrega == '60_dias': dias_plazo = 60
+    elif c.tiempo_entrega == '90_dias': dias_plazo = 90
+        
+    fecha_final_proyecto = hoy + timedelta(days=dias_plazo)
+
+    if c.condiciones_pago == '50_50':
+        mitad = monto_final / Decimal(2)
+        CuentaPorCobrar.objects.create(
+            cliente=cli, cotizacion=c, 
+            concepto=f"50% Anticipo - {c.titulo}", 
+            monto_total=mitad, saldo_pendiente=mitad, 
+            fecha_vencimiento=hoy, estado='pendiente'
+        )
+        CuentaPorCobrar.objects.create(
+            cliente=cli, cotizacion=c, 
+            concepto=f"50% Liquidación - {c.titulo}", 
+            monto_total=mitad, saldo_pendiente=mitad, 
+            fecha_vencimiento=fecha_final_proyecto, estado='pendiente'
+        )
+    elif c.condiciones_pago == '100_entrega':
+        CuentaPorCobrar.objects.create(
+            cliente=cli, cotizacion=c, 
+            concepto=f"Pago Contra Entrega - {c.titulo}", 
+            monto_total=monto_final, saldo_pendiente=monto_final, 
+            fecha_vencimiento=fecha_final_proyecto, estado='pendiente'
+        )
+    else: 
+        CuentaPorCobrar.objects.create(
+            cliente=cli, cotizacion=c, 
+            concepto=f"Pago de Contado - {c.titulo}", 
+            monto_total=monto_final, saldo_pendiente=monto_final, 
+            fecha_vencimiento=hoy, estado='pendiente'
+        )
+
+    c.estado = 'aceptada'
+    c.cliente_convertido = cli
+    c.save()
+
+    base_url = request.build_absolute_uri('/')
+    transaction.on_commit(lambda: encolar(adjuntar_pdf_final, c.id, request.user.id, base_url))
+    return cli, True
+
+@login_required
+def enviar_cotizacion_email(request, cotizacion_id):
+    cotizacion = get_object_or_404(con_partidas(), id=cotizacion_id)
+    
+    if request.method == 'POST':
+        asunto = request.POST.get('asunto')
+        mensaje_usuario = request.POST.get('mensaje')
+        firma_nombre = request.POST.get('firma_nombre', 'Lic. Maribel Aldana Santos')
+        firma_cargo = request.POST.get('firma_cargo', 'Gestiones Corpad | Directora General')
+        usar_logo_default = request.POST.get('usar_logo_default') == 'on'
+        
+        # Cada envío congela la versión; un reenvío sin cambios solo lee su PDF
+        version = congelar(cotizacion, request.build_absolute_uri('/'), request.user.id)
+        pdf_file = leer_pdf(version)
+
+        html_content = f"""
+        <html>
+            <body style="font-family: Arial, sans-serif; color: #333;">
+                <div style="padding: 20px;">
+                    <p style="white-space: pre-line;">{mensaje_usuario}</p>
+                    <br><br>
+                    <div style="border-top: 1px solid #ddd; padding-top: 20px; display: flex; align-items: center;">
+                        {'<img src="cid:logo_firma" style="width: 50px; height: 50px; border-radius: 50%; margin-right: 15px;">' if usar_logo_default else ''}
+                        <div>
+                            <strong style="font-size: 14px; color: #2D1B4B; display: block;">{firma_nombre}</strong>
+                            <span style="font-size: 12px; color: #666;">{firma_cargo}</span>
+                        </div>
+                    </div>
+                </div>
+            </body>
+        </html>
+        """
+        text_content = strip_tags(html_content)
+
+        email = EmailMultiAlternatives(
+            subject=asunto,
+            body=text_content,
+            from_email=settings.DEFAULT_FROM_EMAIL,
+            to=[cotizacion.prospecto_email],
+            # --- CAMBIO: RESPUESTA A MARIBEL ---
+            reply_to=['maribel.aldana@gestionescorpad.com']
+        )
+        email.attach_alternative(html_content, "text/html")
+
+        filename = f"Cotizacion_{cotizacion.id}.pdf"
+        email.attach(filename, pdf_file, 'application/pdf')
+
+        if usar_logo_default:
+            logo_path = os.path.join(settings.BASE_DIR, 'static', 'img', 'logo.png') 
+            if os.path.exists(logo_path):
+                with open(logo_path, 'rb') as f:
+                    logo_data = f.read()
+                    logo = MIMEImage(logo_data)
+                    logo.add_header('Content-ID', '<logo_firma>')
+                    email.attach(logo)
+
+        email.send()
+        messages.success(request, f'Correo enviado exitosamente a {cotizacion.prospecto_email}')
+        
+    return redirect('detalle_cotizacion', cotizacion_id=cotizacion_id)
+
+@login_required
+def eliminar_cotizacion(request, cotizacion_id):
+    if not request.user.access_cotizaciones:
+        messages.error(request, "No tienes permiso para realizar esta acción.")
+        return redirect('lista_cotizaciones')
+    
+    cotizacion = get_object_or_404(Cotizacion, id=cotizacion_id)
+    cotizacion_id_ref = cotizacion.id 
+    cotizacion.delete()
+    
+    messages.success(request, f"La cotización #{cotizacion_id_ref} fue eliminada exitosamente.")
+    return redirect('lista_cotizaciones')
+
+# ------------------------------------------
+# ENLACE PÚBLICO (PROSPECTOS)
+# ------------------------------------------
+# Sin login: el folio (UUID) es el token. Todo sale de la caché (cotizacion_pdf.publica);
+# con private + no-cache el navegador guarda la copia y solo pregunta si cambió (304).
+def _publica_o_404(folio):
+    entrada = publica(folio)
+    if entrada is None:
+        raise Http404("Cotización no disponible")
+    return entrada
+
+@cache_control(private=True, no_cache=True)
+def cotizacion_publica(request, folio):
+    entrada = _publica_o_404(folio)
+    etag = quote_etag(entrada['etag_html'])
+    no_modificado = get_conditional_response(request, etag=etag)
+    if no_modificado is not None:
+        return no_modificado
+    respuesta = HttpResponse(entrada['html'])
+    respuesta['ETag'] = etag
+    return respuesta
+
+@cache_control(private=True, no_cache=True)
+def cotizacion_publica_pdf(request, folio):
+    entrada = _publica_o_404(folio)
+    etag = quote_etag(entrada['etag_pdf'])
+    no_modificado = get_conditional_response(request, etag=etag)
+    if no_modificado is not None:
+        return no_modificado
+    respuesta = FileResponse(abrir_pdf_publico(entrada), content_type='application/pdf', filename=entrada['nombre_pdf'])
+    respuesta['ETag'] = etag
+    return respuesta
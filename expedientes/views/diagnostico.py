@@ -0,0 +1,43 @@
+# ==========================================
+# EXPEDIENTES/VIEWS/DIAGNOSTICO.PY - DIAGNÓSTICO (PERFILADO Y MÉTRICAS)
+# ==========================================
+import logging
+
+# --- Django Core ---
+from django.conf import settings
+from django.contrib.auth.decorators import login_required
+from django.http import HttpResponse
+from django.shortcuts import render, redirect
+from django.utils.crypto import constant_time_compare
+
+# --- Utilidades ---
+from .. import metricas, perfilado
+
+logger = logging.getLogger(__name__)
+
+
+# ------------------------------------------
+# DIAGNÓSTICO
+# ------------------------------------------
+@login_required
+def reporte_perfilado(request):
+    if not (request.user.is_staff or request.user.rol == 'admin'):
+        return redirect('dashboard')
+    recientes = list(perfilado.RECIENTES)[-50:]
+    recientes.reverse()
+    return render(request, 'perfilado/reporte.html', {
+        'activo': settings.PERFILADO,
+        'por_vista': perfilado.reporte_por_vista(),
+        'recientes': recientes,
+    })
+
+def metricas_prometheus(request):
+    token = settings.METRICAS_TOKEN
+    if token:
+        autorizado = constant_time_compare(request.headers.get('Authorization', ''), f"Bearer {token}")
+    else:
+        autorizado = request.user.is_authenticated and (request.user.is_staff or request.user.rol == 'admin')
+    if not autorizado:
+        return HttpResponse("No autorizado", status=401, content_type='text/plain')
+    contenido, tipo = metricas.exposicion()
+    return HttpResponse(contenido, content_type=tipo)
@@ -0,0 +1,446 @@
+# ==========================================
+# EXPEDIENTES/VIEWS/DRIVE.PY - DRIVE: CARPETAS, ARCHIVOS Y VISTA PREVIA
+# ==========================================
+import hashlib
+import logging
+import uuid
+import zipfile
+from datetime import datetime
+from io import BytesIO
+
+# --- Django Core ---
+from django.contrib import messages
+from django.contrib.auth.decorators import login_required
+from django.http import Http404, JsonResponse, HttpResponse
+from django.shortcuts import redirect, get_object_or_404, aget_object_or_404
+from django.utils import timezone
+from asgiref.sync import sync_to_async
+
+# --- Modelos Locales ---
+from ..models import Cliente, Carpeta, Expediente, Documento, ArchivoTemporal
+
+# --- Utilidades ---
+from .. import admision
+from ..acceso import alcance_de
+from ..asincrono import en_hilo, respuesta_archivo
+from ..bitacora import registrar_bitacora
+from ..cache import PREVIEWS
+from ..exportaciones import Filas, respuesta_exportacion, respuesta_zip
+
+logger = logging.getLogger(__name__)
+
+
+# ------------------------------------------
+# CARPETAS Y EXPEDIENTES
+# ------------------------------------------
+@login_required
+def crear_carpeta(request, cliente_id):
+    if request.method == 'POST':
+        padre_id = request.POST.get('padre_id')
+        padre = get_object_or_404(Carpeta, id=padre_id) if padre_id else None
+        Carpeta.objects.create(nombre=request.POST.get('nombre'), cliente_id=cliente_id, padre=padre)
+        if padre: return redirect('detalle_carpeta', cliente_id=cliente_id, carpeta_id=padre.id)
+    return redirect('detalle_cliente', cliente_id=cliente_id)
+
+@login_required
+def eliminar_carpeta(request, carpeta_id):
+    if not alcance_de(request.user).puede('can_delete_client'): return redirect('dashboard')
+    c = get_object_or_404(Carpeta, id=carpeta_id)
+    url_destino = 'detalle_carpeta' if c.padre else 'detalle_cliente'
+    kwargs = {'cliente_id': c.cliente.id}
+    if c.padre: kwargs['carpeta_id'] = c.padre.id
+    c.delete()
+    return redirect(url_destino, **kwargs)
+
+@login_required
+def crear_expediente(request, cliente_id):
+    if request.method == 'POST':
+        f = Carpeta.objects.create(nombre=f"EXP {request.POST.get('num_expediente')}: {request.POST.get('titulo')}", cliente_id=cliente_id, es_expediente=True)
+        Expediente.objects.create(cliente_id=cliente_id, num_expediente=request.POST.get('num_expediente'), titulo=request.POST.get('titulo'), carpeta=f)
+    return redirect('detalle_cliente', cliente_id=cliente_id)
+
+
+# ------------------------------------------
+# ARCHIVOS
+# ------------------------------------------
+@login_required
+def subir_archivo_drive(request, cliente_id):
+    cliente = get_object_or_404(Cliente, id=cliente_id)
+    
+    if request.method == 'POST':
+        archivos = request.FILES.getlist('archivo')
+        carpeta_id = request.POST.get('carpeta_id')
+        fecha_vencimiento = request.POST.get('fecha_vencimiento')
+        
+        carpeta = None
+        if carpeta_id:
+            carpeta = get_object_or_404(Carpeta, id=carpeta_id)
+
+        # Los avisos de vencimiento (20/10/5 días) ya no se guardan como Eventos:
+        # la agenda y el comando enviar_recordatorios los derivan de fecha_vencimiento.
+        vencimiento = datetime.strptime(fecha_vencimiento, '%Y-%m-%d').date() if fecha_vencimiento else None
+
+        for f in archivos:
+            Documento.objects.create(
+                cliente=cliente,
+                carpeta=carpeta,
+                archivo=f,
+                nombre_archivo=f.name,
+                subido_por=request.user,
+                fecha_vencimiento=vencimiento
+            )
+
+        messages.success(request, f"{len(archivos)} archivo(s) subido(s) correctamente.")
+        
+        if carpeta:
+            return redirect('detalle_carpeta', cliente_id=cliente.id, carpeta_id=carpeta.id)
+        return redirect('detalle_cliente', cliente_id=cliente.id)
+        
+    return redirect('detalle_cliente', cliente_id=cliente.id)
+
+@login_required
+def subir_archivo_requisito(request, carpeta_id):
+    if request.method == 'POST':
+        carpeta_origen = get_object_or_404(Carpeta, id=carpeta_id)
+        cliente = carpeta_origen.cliente
+        archivo = request.FILES.get('archivo')
+        nombre_requisito = request.POST.get('nombre_requisito')
+
+        if archivo and nombre_requisito:
+            try:
+                anio_actual = timezone.now().year
+                ext = archivo.name.split('.')[-1] if '.' in archivo.name else 'pdf'
+                nuevo_nombre_formal = f"{nombre_requisito} {cliente.nombre_empresa} {anio_actual}.{ext}"
+
+                carpetas_destino = []
+                todas_carpetas = cliente.carpetas_drive.all()
+
+                for carpeta in todas_carpetas:
+                    requisitos_carpeta = carpeta.obtener_detalle_cumplimiento()
+                    if requisitos_carpeta:
+                        for req in requisitos_carpeta:
+                            if req['nombre'] == nombre_requisito:
+                                carpetas_destino.append(carpeta)
+                                break
+                
+                if not carpetas_destino:
+                    carpetas_destino.append(carpeta_origen)
+
+                count = 0
+                for carpeta_target in carpetas_destino:
+                    Documento.objects.filter(
+                        carpeta=carpeta_target, 
+                        nombre_archivo__istartswith=nombre_requisito
+                    ).delete()
+
+                    nuevo_doc = Documento(
+                        cliente=cliente,
+                        carpeta=carpeta_target,
+                        archivo=archivo,
+                        nombre_archivo=nuevo_nombre_formal,
+                        subido_por=request.user
+                    )
+                    nuevo_doc.save()
+                    count += 1
+
+                messages.success(request, f'✅ Archivo actualizado exitosamente en {count} carpeta(s) con el nombre: "{nuevo_nombre_formal}".')
+
+            except Exception as e:
+                logger.error(f"Error procesando archivo requisito: {e}")
+                messages.error(request, f"Error al procesar el archivo: {e}")
+        else:
+            messages.error(request, 'Error: Faltan datos (archivo o nombre del requisito).')
+            
+        return redirect('detalle_cliente', cliente_id=cliente.id)
+    
+    return redirect('dashboard')
+
+@login_required
+def eliminar_archivo_drive(request, archivo_id):
+    doc = get_object_or_404(Documento, id=archivo_id)
+    if not alcance_de(request.user).puede('can_delete_client'): return redirect('detalle_cliente', cliente_id=doc.cliente.id)
+    c_id, padre_id = doc.cliente.id, doc.carpeta.id if doc.carpeta else None
+    registrar_bitacora(request.user, doc.cliente, 'eliminacion', f"Eliminó {doc.nombre_archivo}")
+    doc.archivo.delete(); doc.delete()
+    if padre_id: return redirect('detalle_carpeta', cliente_id=c_id, carpeta_id=padre_id)
+    return redirect('detalle_cliente', cliente_id=c_id)
+
+@login_required
+def mover_archivo_drive(request, archivo_id):
+    doc = get_object_or_404(Documento, id=archivo_id)
+    
+    alcance = alcance_de(request.user)
+    if not (alcance.puede('can_edit_client') or alcance.puede('can_upload_files')):
+        messages.error(request, "No tienes permiso para mover archivos.")
+        return redirect('detalle_cliente', cliente_id=doc.cliente.id)
+
+    if request.method == 'POST':
+        destino_id = request.POST.get('carpeta_destino')
+        
+        if destino_id == 'ROOT':
+            doc.carpeta = None
+            nombre_destino = "Carpeta Raíz"
+        else:
+            carpeta_destino = get_object_or_404(Carpeta, id=destino_id)
+            doc.carpeta = carpeta_destino
+            nombre_destino = carpeta_destino.nombre
+            
+        doc.save()
+        messages.success(request, f"Archivo movido a: {nombre_destino}")
+        
+    return redirect(request.META.get('HTTP_REFERER', 'dashboard'))
+
+@login_required
+def acciones_masivas_drive(request):
+    if request.method == 'POST':
+        accion = request.POST.get('accion')
+        doc_ids = request.POST.getlist('doc_ids')
+        docs = Documento.objects.filter(id__in=doc_ids)
+        if not docs: return redirect(request.META.get('HTTP_REFERER'))
+        
+        cliente = docs.first().cliente
+        if accion == 'eliminar':
+            if not alcance_de(request.user).puede('can_delete_client'): return redirect(request.META.get('HTTP_REFERER'))
+            count = docs.count()
+            for doc in docs: doc.archivo.delete(); doc.delete()
+            registrar_bitacora(request.user, cliente, 'eliminacion', f"Eliminó {count} archivos masivamente.")
+            messages.success(request, f"Se eliminaron {count} archivos.")
+        
+        elif accion == 'descargar':
+            buffer = BytesIO()
+            with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as zip_file:
+                for doc in docs:
+                    try: zip_file.writestr(doc.nombre_archivo, doc.archivo.read())
+                    except Exception as e:
+                        # <--- 3. CORRECCIÓN: Logging en lugar de pass
+                        logger.warning(f"Error zipping {doc.id} en acciones masivas: {e}")
+
+            registrar_bitacora(request.user, cliente, 'descarga', f"Descargó selección ZIP.")
+            buffer.seek(0)
+            response = HttpResponse(buffer, content_type='application/zip')
+            response['Content-Disposition'] = f'attachment; filename="Seleccion.zip"'
+            return response
+            
+    return redirect(request.META.get('HTTP_REFERER'))
+
+def _leer_archivo(campo):
+    with campo.open('rb') as archivo:
+        return archivo.read()
+
+async def _archivos_de_carpeta(documentos, carpeta_id):
+    # Un archivo a la vez: el worker nunca tiene en memoria más que el que se está enviando
+    for doc in documentos:
+        try:
+            contenido = await en_hilo(_leer_archivo)(doc.archivo)
+        except Exception as e:
+            logger.warning(f"No se pudo incluir {doc.nombre_archivo} en ZIP de carpeta {carpeta_id}: {e}")
+            continue
+        yield doc.nombre_archivo, contenido
+
+@login_required
+async def descargar_carpeta_zip(request, carpeta_id):
+    carpeta = await aget_object_or_404(Carpeta.objects.select_related('cliente'), id=carpeta_id)
+    usuario = await request.auser()
+    alcance = await sync_to_async(alcance_de)(usuario)
+    if not alcance.ve_cliente(carpeta.cliente_id):
+        return HttpResponse("Acceso Denegado", status=403)
+
+    documentos = [d async for d in Documento.objects.filter(carpeta=carpeta).only('id', 'nombre_archivo', 'archivo')]
+    await sync_to_async(registrar_bitacora)(usuario, carpeta.cliente, 'descarga', f"Descargó ZIP: {carpeta.nombre}")
+    return respuesta_zip(carpeta.nombre, _archivos_de_carpeta(documentos, carpeta.id))
+
+@login_required
+async def descargar_archivo_oficial(request, archivo_id):
+    doc = await aget_object_or_404(Documento, id=archivo_id)
+    try:
+        return await respuesta_archivo(doc.archivo, doc.nombre_archivo)
+    except FileNotFoundError:
+        messages.error(request, "El archivo físico no se encuentra en el servidor.")
+        return redirect('detalle_cliente', cliente_id=doc.cliente_id)
+
+@login_required
+def exportar_documentos(request):
+    """Inventario de documentos visibles (metadatos, sin archivos) en CSV/XLSX; ?cliente= acota a uno."""
+    alcance = alcance_de(request.user)
+    qs, nombre = Documento.objects.visibles_para(request.user), 'documentos'
+    if request.GET.get('cliente'):
+        try:
+            cliente = get_object_or_404(Cliente, id=uuid.UUID(request.GET['cliente']))
+        except ValueError:
+            raise Http404
+        if not alcance.ve_cliente(cliente.id):
+            return HttpResponse("Acceso Denegado", status=403)
+        qs, nombre = qs.filter(cliente=cliente), f"documentos_{cliente.nombre_empresa}"
+        registrar_bitacora(request.user, cliente, 'descarga', "Exportó el inventario de documentos")
+
+    filas = Filas(qs.order_by('cliente_id', 'carpeta_id', 'id').values_list(
+        'id', 'cliente__nombre_empresa', 'carpeta__nombre', 'nombre_archivo', 'archivo',
+        'subido_por__username', 'fecha_subida', 'fecha_vencimiento',
+    ))
+    return respuesta_exportacion(
+        request.GET.get('formato'), nombre,
+        ['Id', 'Cliente', 'Carpeta', 'Documento', 'Archivo', 'Subido por', 'Fecha de subida', 'Vence'],
+        filas, hoja='Documentos',
+    )
+
+
+# ------------------------------------------
+# VISTA PREVIA
+# ------------------------------------------
+async def _html_preview(doc, tipo, convertir, *args):
+    # El nombre en el storage cambia al reemplazar el archivo: la clave nueva basta para invalidar
+    firma = hashlib.md5(doc.archivo.name.encode()).hexdigest()
+    clave = PREVIEWS.clave(doc.pk, firma)
+
+    def _calcular():
+        # tipo de admision.py (mammoth, pandas); None = conversión ligera sin control
+        if tipo is None:
+            return convertir(*args)
+        return admision.ejecutar(tipo, convertir, *args, tamano=doc.archivo.size)
+
+    return await en_hilo(PREVIEWS.obtener)(clave, _calcular)
+
+def _docx_a_html(campo):
+    import mammoth
+
+    with campo.open() as f:
+        return mammoth.convert_to_html(f).value
+
+@login_required
+async def preview_archivo(request, documento_id):
+    doc = await aget_object_or_404(Documento, id=documento_id)
+    ext = doc.nombre_archivo.split('.')[-1].lower()
+    data = {'tipo': 'unknown', 'url': doc.archivo.url, 'nombre': doc.nombre_archivo, 'miniatura': doc.miniatura.url if doc.miniatura else None}
+    if ext in ['jpg', 'jpeg', 'png', 'gif', 'webp']: data['tipo'] = 'imagen'
+    elif ext == 'pdf': data['tipo'] = 'pdf'
+    elif ext == 'docx':
+        data['tipo'] = 'docx'
+        try:
+            data['html'] = await _html_preview(doc, 'docx', _docx_a_html, doc.archivo)
+        except admision.Rechazo as e:
+            return admision.respuesta(e)
+        except Exception as e:
+             # <--- 3. CORRECCIÓN: Logging y mensaje de error
+            logger.error(f"Error procesando preview DOCX {documento_id}: {e}")
+            data['html'] = "Error de lectura en servidor."
+    return JsonResponse(data)
+
+def _tabla_excel_html(path, ext):
+    import pandas as pd
+
+    if ext == 'csv':
+        df = pd.read_csv(path)
+    else:
+        df = pd.read_excel(path)
+    
+    tabla_html = df.head(50).to_html(classes='w-full text-sm text-left text-gray-500', border=0, index=False)
+    tabla_html = tabla_html.replace('<thead>', '<thead class="text-xs text-gray-700 uppercase bg-gray-50">')
+    tabla_html = tabla_html.replace('<th>', '<th class="px-6 py-3">')
+    tabla_html = tabla_html.replace('<td>', '<td class="px-6 py-4 border-b">')
+    return tabla_html
+
+def _leer_texto(path):
+    with open(path, 'r', encoding='utf-8', errors='ignore') as f:
+        return f.read()
+
+@login_required
+async def obtener_preview_archivo(request, archivo_id):
+    doc = await aget_object_or_404(Documento, id=archivo_id)
+    ext = doc.nombre_archivo.split('.')[-1].lower()
+    url = doc.archivo.url
+    
+    data = {
+        'nombre': doc.nombre_archivo,
+        'url': url,
+        'miniatura': doc.miniatura.url if doc.miniatura else None,
+        'tipo': 'desconocido',
+        'html': ''
+    }
+
+    try:
+        if ext in ['jpg', 'jpeg', 'png', 'gif', 'webp', 'svg']:
+            data['tipo'] = 'imagen'
+        elif ext == 'pdf':
+            data['tipo'] = 'pdf'
+        elif ext == 'docx':
+            data['tipo'] = 'docx'
+            data['html'] = await _html_preview(doc, 'docx', _docx_a_html, doc.archivo)
+        elif ext in ['xlsx', 'xls', 'csv']:
+            data['tipo'] = 'excel'
+            data['html'] = await _html_preview(doc, 'tabla', _tabla_excel_html, doc.archivo.path, ext)
+        elif ext in ['mp4', 'webm', 'ogg']:
+            data['tipo'] = 'video'
+        elif ext in ['mp3', 'wav']:
+            data['tipo'] = 'audio'
+        elif ext in ['txt', 'py', 'js', 'html', 'css', 'json', 'md']:
+            data['tipo'] = 'texto'
+            data['html'] = await _html_preview(doc, None, _leer_texto, doc.archivo.path)
+        else:
+            data['tipo'] = 'descarga'
+
+    except admision.Rechazo as e:
+        return admision.respuesta(e)
+    except Exception as e:
+        # <--- 3. CORRECCIÓN: Logging
+        logger.error(f"Error generando preview {archivo_id}: {e}")
+        data['tipo'] = 'error'
+
+    return JsonResponse(data)
+
+
+# ------------------------------------------
+# REVISIÓN DE ARCHIVOS DEL PORTAL
+# ------------------------------------------
+@login_required
+def aprobar_archivo_temporal(request, temp_id):
+    temp = get_object_or_404(ArchivoTemporal, id=temp_id)
+    cliente = temp.solicitud.cliente
+    
+    try:
+        anio_actual = timezone.now().year
+        ext = temp.archivo.name.split('.')[-1]
+        nuevo_nombre_formal = f"{temp.nombre_requisito} {cliente.nombre_empresa} {anio_actual}.{ext}"
+        
+        carpetas_destino = []
+        for carpeta in cliente.carpetas_drive.all():
+            requisitos = carpeta.obtener_detalle_cumplimiento()
+            if requisitos:
+                for req in requisitos:
+                    if req['nombre'] == temp.nombre_requisito:
+                        carpetas_destino.append(carpeta)
+                        break
+        
+        if not carpetas_destino:
+            carpetas_destino.append(cliente.carpetas_drive.first())
+
+        for carpeta_target in carpetas_destino:
+            Documento.objects.filter(carpeta=carpeta_target, nombre_archivo__icontains=temp.nombre_requisito).delete()
+            
+            Documento.objects.create(
+                cliente=cliente,
+                carpeta=carpeta_target,
+                archivo=temp.archivo,
+                nombre_archivo=nuevo_nombre_formal,
+                subido_por=request.user 
+            )
+            
+        temp.delete()
+        messages.success(request, f"Aprobado y distribuido: {nuevo_nombre_formal}")
+        
+    except Exception as e:
+        logger.error(f"Error aprobando archivo temporal: {e}")
+        messages.error(request, f"Error al aprobar: {e}")
+
+    return redirect('detalle_cliente', cliente_id=cliente.id)
+
+@login_required
+def rechazar_archivo_temporal(request, temp_id):
+    temp = get_object_or_404(ArchivoTemporal, id=temp_id)
+    nombre = temp.nombre_requisito
+    cliente_id = temp.solicitud.cliente.id
+    
+    temp.archivo.delete()
+    temp.delete()
+    
+    messages.warning(request, f"❌ Documento rechazado y eliminado: {nombre}")
+    return redirect('detalle_cliente', cliente_id=cliente_id)
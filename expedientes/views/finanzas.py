@@ -0,0 +1,264 @@
+# ==========================================
+# EXPEDIENTES/VIEWS/FINANZAS.PY - FINANZAS
+# ==========================================
+import logging
+import uuid
+from datetime import timedelta
+from decimal import Decimal
+
+# --- Django Core ---
+from django.contrib import messages
+from django.contrib.auth.decorators import login_required
+from django.db.models import Count, Q, Sum
+from django.shortcuts import render, redirect, get_object_or_404
+from django.utils import timezone
+
+# --- Modelos Locales ---
+from ..models import Cliente, CuentaPorCobrar, LoteEstadosCuenta, Pago
+
+# --- Utilidades ---
+from ..cartera import TRAMOS, antiguedad, pronostico
+from ..estados_cuenta import generar_lote, mes_cerrado, periodo_de
+from ..exportaciones import Filas, respuesta_exportacion
+from ..tareas import encolar
+from ..utils import generar_pdf_response
+
+logger = logging.getLogger(__name__)
+
+
+# ------------------------------------------
+# FINANZAS (OPTIMIZADO)
+# ------------------------------------------
+@login_required
+def panel_finanzas(request):
+    # Sumas por cliente en la base (deuda y pagado vienen del mismo JOIN, no se multiplican)
+    lista_clientes = [
+        {'obj': cli, 'deuda': cli.deuda, 'pagado': cli.pagado, 'pendientes_count': cli.pendientes_count}
+        for cli in Cliente.objects.filter(cuentas__isnull=False).annotate(
+            deuda=Sum('cuentas__saldo_pendiente'),
+            pagado=Sum('cuentas__monto_pagado'),
+            pendientes_count=Count('cuentas', filter=~Q(cuentas__estado='pagado')),
+        ).order_by('nombre_empresa')
+    ]
+    total_global_pendiente = sum(item['deuda'] for item in lista_clientes)
+    total_global_cobrado = sum(item['pagado'] for item in lista_clientes)
+
+    lotes = LoteEstadosCuenta.objects.annotate(
+        total=Count('estados'),
+        generados=Count('estados', filter=Q(estados__documento__isnull=False)),
+        con_error=Count('estados', filter=Q(estados__documento__isnull=True) & ~Q(estados__error='')),
+    )[:6]
+
+    return render(request, 'finanzas/panel.html', {
+        'clientes': lista_clientes,
+        'total_por_cobrar': total_global_pendiente,
+        'total_cobrado': total_global_cobrado,
+        'lotes': lotes,
+        'antiguedad': antiguedad(),
+        'tramos': TRAMOS,
+        'flujo': pronostico(),
+        'mes_anterior': (timezone.localdate().replace(day=1) - timedelta(days=1)).strftime('%Y-%m'),
+    })
+
+@login_required
+def exportar_cartera(request):
+    """Antigüedad de saldos (?tipo=antiguedad) o flujo esperado (?tipo=pronostico) en CSV/XLSX, desde la caché del día."""
+    if not request.user.access_finanzas: return redirect('panel_finanzas')
+    hoy = timezone.localdate()
+    if request.GET.get('tipo') == 'pronostico':
+        flujo = pronostico(hoy)
+        filas = [('Vencido', '', '', flujo['vencido'], '')]
+        filas += [(f"Semana {s['semana']}", s['inicio'], s['fin'], s['monto'], s['acumulado']) for s in flujo['semanas']]
+        filas += [('Posterior', '', '', flujo['posterior'], ''), ('Sin fecha', '', '', flujo['sin_fecha'], '')]
+        return respuesta_exportacion(
+            request.GET.get('formato'), f"flujo_esperado_{hoy:%Y%m%d}",
+            ['Periodo', 'Desde', 'Hasta', 'Monto', 'Acumulado'], filas, hoja='Flujo esperado',
+        )
+
+    reporte = antiguedad(hoy)
+    claves = [clave for clave, *_ in TRAMOS]
+    filas = [
+        (c['cliente__nombre_empresa'], c['cuentas'], *(c[k] for k in claves), c['total'])
+        for c in reporte['clientes']
+    ]
+    filas.append(('TOTAL', reporte['totales']['cuentas'], *(reporte['totales'][k] for k in claves), reporte['totales']['total']))
+    return respuesta_exportacion(
+        request.GET.get('formato'), f"antiguedad_saldos_{hoy:%Y%m%d}",
+        ['Cliente', 'Cuentas', *(etiqueta for _, etiqueta, *_ in TRAMOS), 'Total'], filas, hoja='Antigüedad',
+    )
+
+def _filtros_finanzas(get):
+    """Lee ?cliente=&periodo=AAAA-MM y devuelve (cuentas, pagos, sufijo del nombre de archivo)."""
+    cuentas, pagos, partes = CuentaPorCobrar.objects.all(), Pago.objects.all(), []
+    try:
+        if get.get('cliente'):
+            cliente_id = uuid.UUID(get['cliente'])
+            cuentas, pagos = cuentas.filter(cliente_id=cliente_id), pagos.filter(cuenta__cliente_id=cliente_id)
+            partes.append(str(cliente_id)[:8])
+    except ValueError:
+        pass
+    periodo = periodo_de(get.get('periodo'))
+    if periodo:
+        cuentas = cuentas.filter(fecha_emision__year=periodo.year, fecha_emision__month=periodo.month)
+        pagos = pagos.filter(fecha_pago__year=periodo.year, fecha_pago__month=periodo.month)
+        partes.append(f"{periodo:%Y-%m}")
+    return cuentas, pagos, '_'.join(partes)
+
+@login_required
+def exportar_finanzas(request):
+    """Cuentas por cobrar (?tipo=cuentas) o pagos (?tipo=pagos) en CSV/XLSX, acotados por ?cliente= y ?periodo=."""
+    if not request.user.access_finanzas: return redirect('panel_finanzas')
+    cuentas, pagos, sufijo = _filtros_finanzas(request.GET)
+    formato = request.GET.get('formato')
+
+    if request.GET.get('tipo') == 'pagos':
+        metodos = dict(Pago.METODOS)
+        filas = Filas(
+            pagos.order_by('fecha_pago', 'id').values_list(
+                'id', 'fecha_pago', 'cuenta__cliente__nombre_empresa', 'cuenta__concepto', 'monto', 'metodo',
+                'referencia', 'registrado_por__username',
+            ),
+            lambda recibo, fecha, cliente, concepto, monto, metodo, referencia, usuario: (
+                recibo, fecha, cliente, concepto, monto, metodos.get(metodo, metodo), referencia, usuario,
+            ),
+        )
+        return respuesta_exportacion(
+            formato, '_'.join(filter(None, ['pagos', sufijo])),
+            ['Recibo', 'Fecha', 'Cliente', 'Concepto', 'Monto', 'Método', 'Referencia', 'Registrado por'],
+            filas, hoja='Pagos',
+        )
+
+    estados = dict(CuentaPorCobrar.ESTADOS)
+    filas = Filas(
+        cuentas.order_by('fecha_emision', 'id').values_list(
+            'id', 'cliente__nombre_empresa', 'concepto', 'cotizacion_id', 'fecha_emision', 'fecha_vencimiento',
+            'monto_total', 'monto_pagado', 'saldo_pendiente', 'estado',
+        ),
+        lambda cuenta, cliente, concepto, cotizacion, emision, vence, total, pagado, saldo, estado: (
+            cuenta, cliente, concepto, cotizacion, emision, vence, total, pagado, saldo, estados.get(estado, estado),
+        ),
+    )
+    return respuesta_exportacion(
+        formato, '_'.join(filter(None, ['cuentas_por_cobrar', sufijo])),
+        ['Cuenta', 'Cliente', 'Concepto', 'Cotización', 'Emisión', 'Vence', 'Total', 'Pagado', 'Saldo', 'Estado'],
+        filas, hoja='Cuentas por cobrar',
+    )
+
+@login_required
+def registrar_pago(request):
+    if request.method == 'POST':
+        Pago.objects.create(
+            cuenta_id=request.POST.get('cuenta_id'), monto=Decimal(request.POST.get('monto')),
+            metodo=request.POST.get('metodo'), referencia=request.POST.get('referencia'), registrado_por=request.user
+        )
+    return redirect('panel_finanzas')
+
+@login_required
+def generar_estados_cuenta(request):
+    if request.method != 'POST':
+        return redirect('panel_finanzas')
+    if not request.user.access_finanzas:
+        messages.error(request, "No tienes permiso para generar estados de cuenta.")
+        return redirect('panel_finanzas')
+
+    periodo = periodo_de(request.POST.get('periodo'))
+    if periodo is None or not mes_cerrado(periodo):
+        messages.error(request, "Selecciona un mes ya cerrado.")
+        return redirect('panel_finanzas')
+
+    lote, creado = LoteEstadosCuenta.objects.get_or_create(periodo=periodo, defaults={'creado_por': request.user})
+    if lote.estado == 'terminado':
+        messages.info(request, f"Los estados de cuenta de {periodo:%m/%Y} ya están en el drive de cada cliente.")
+        return redirect('panel_finanzas')
+
+    # Lote nuevo, con errores o caído a la mitad: generar_lote sigue con los clientes que faltan
+    encolar(generar_lote, lote.id, request.build_absolute_uri('/'))
+    messages.success(request, f"{'Generando' if creado else 'Reanudando'} los estados de cuenta de {periodo:%m/%Y}. Cada PDF aparecerá en la carpeta \"Estados de cuenta\" del cliente.")
+    return redirect('panel_finanzas')
+
+@login_required
+def recibo_pago_pdf(request, pago_id):
+    p = get_object_or_404(Pago.objects.select_related('cuenta__cliente'), id=pago_id)
+    return generar_pdf_response(request, 'finanzas/recibo_template.html', {'p': p}, f"Recibo_{p.id}.pdf")
+
+@login_required
+def eliminar_finanza(request, id):
+    if request.user.rol != 'admin':
+        messages.error(request, "Acceso denegado. Solo el Administrador puede eliminar registros financieros.")
+        return redirect('panel_finanzas')
+    
+    cx = get_object_or_404(CuentaPorCobrar, id=id)
+    cx.delete()
+    messages.success(request, "Registro financiero eliminado correctamente.")
+    return redirect('panel_finanzas')
+
+@login_required
+def finanzas_cliente(request, cliente_id):
+    cliente = get_object_or_404(Cliente, id=cliente_id)
+    cuentas = cliente.cuentas.all().select_related('cotizacion').order_by('-fecha_vencimiento')
+    
+    proyectos = {}
+    
+    for cx in cuentas:
+        clave = cx.cotizacion if cx.cotizacion else "Otros Cargos"
+        
+        if clave not in proyectos:
+            proyectos[clave] = {
+                'titulo': cx.cotizacion.titulo if cx.cotizacion else "Cargos Generales",
+                'folio': cx.cotizacion.id if cx.cotizacion else None,
+                'pagos': [],
+                'total_proyecto': 0,
+                'pendiente_proyecto': 0,
+                'estado_general': 'completado' 
+            }
+        
+        proyectos[clave]['pagos'].append(cx)
+        proyectos[clave]['total_proyecto'] += cx.monto_total
+        proyectos[clave]['pendiente_proyecto'] += cx.saldo_pendiente
+        
+        if cx.saldo_pendiente > 0:
+            proyectos[clave]['estado_general'] = 'pendiente'
+
+    return render(request, 'finanzas/detalle_cliente.html', {
+        'cliente': cliente,
+        'proyectos': proyectos
+    })
+
+@login_required
+def generar_orden_cobro(request, cuenta_id, tipo_pago):
+    cuenta = get_object_or_404(CuentaPorCobrar.objects.select_related('cotizacion', 'cliente'), id=cuenta_id)
+    cotizacion = cuenta.cotizacion
+    
+    datos_bancarios = {
+        'banco': request.GET.get('banco', 'BBVA'),
+        'cuenta': request.GET.get('cuenta_num', ''),
+        'clabe': request.GET.get('clabe', ''),
+        'titular': request.GET.get('titular', '')
+    }
+
+    total_proyecto = cuenta.monto_total 
+    
+    if tipo_pago == 'anticipo':
+        titulo_doc = "ORDEN DE PAGO - ANTICIPO"
+        monto_a_pagar = total_proyecto / Decimal(2)
+        nota = "Concepto: 50% de anticipo para inicio de gestiones administrativas."
+        porcentaje_pago = 50
+    else: 
+        titulo_doc = "ORDEN DE PAGO - LIQUIDACIÓN"
+        monto_a_pagar = cuenta.saldo_pendiente 
+        nota = "Concepto: Pago final contra entrega de resultados."
+        porcentaje_pago = 100 if cuenta.monto_pagado == 0 else 50 
+
+    context = {
+        'cuenta': cuenta,
+        'c': cotizacion,
+        'titulo_doc': titulo_doc,
+        'monto_a_pagar': monto_a_pagar,
+        'nota': nota,
+        'tipo_pago': tipo_pago,
+        'porcentaje_pago': porcentaje_pago,
+        'banco': datos_bancarios,
+        'fecha_emision': timezone.now()
+    }
+
+    return generar_pdf_response(request, 'finanzas/orden_cobro_pdf.html', context, f"Cobro_{tipo_pago}_{cuenta.cliente.nombre_empresa}.pdf")
@@ -0,0 +1,454 @@
+# ==========================================
+# EXPEDIENTES/VIEWS/GENERADOR.PY - CONTRATOS, DISEÑADOR DE PLANTILLAS Y QR
+# ==========================================
+import base64
+import json
+import logging
+import re
+from io import BytesIO
+
+# --- Django Core ---
+from django.contrib import messages
+from django.contrib.auth.decorators import login_required
+from django.core.files.base import ContentFile
+from django.http import JsonResponse, HttpResponse
+from django.shortcuts import render, redirect, get_object_or_404
+from django.utils import timezone
+from django.utils.text import slugify
+from django.views.decorators.csrf import csrf_exempt
+
+# --- Modelos Locales ---
+from ..models import Cliente, Carpeta, Documento, Plantilla, VariableEstandar, Cotizacion
+
+# --- Utilidades ---
+from ..bitacora import registrar_bitacora
+from .. import admision, metricas, pdf
+
+logger = logging.getLogger(__name__)
+
+
+# ------------------------------------------
+# CONTRATOS
+# ------------------------------------------
+@login_required
+def generador_contratos(request, cliente_id):
+    from docxtpl import DocxTemplate
+
+    if not request.user.access_contratos: return redirect('dashboard')
+    cliente = get_object_or_404(Cliente, id=cliente_id)
+    
+    if request.method == 'GET' and 'plantilla_id' not in request.GET:
+        return render(request, 'generador/seleccionar.html', {
+            'cliente': cliente,
+            'plantillas': Plantilla.objects.all().order_by('-fecha_subida'),
+            'glosario': VariableEstandar.objects.all().order_by('clave')
+        })
+
+    plantilla = get_object_or_404(Plantilla, id=request.GET.get('plantilla_id') or request.POST.get('plantilla_id'))
+    doc = DocxTemplate(plantilla.archivo.path)
+    vars_en_doc = doc.get_undeclared_template_variables()
+    memoria = cliente.datos_extra if isinstance(cliente.datos_extra, dict) else {}
+    formulario = []
+    
+    # --- LÓGICA INTELIGENTE: VARIABLES AUTOMÁTICAS ---
+    hoy = timezone.now()
+    meses = ['Enero', 'Febrero', 'Marzo', 'Abril', 'Mayo', 'Junio', 'Julio', 'Agosto', 'Septiembre', 'Octubre', 'Noviembre', 'Diciembre']
+    fecha_larga = f"{hoy.day} de {meses[hoy.month-1]} de {hoy.year}"
+    
+    # Mapeo Automático de Datos del Sistema
+    datos_sistema = {
+        'cliente_empresa': cliente.nombre_empresa,
+        'cliente_contacto': cliente.nombre_contacto,
+        'cliente_email': cliente.email,
+        'cliente_telefono': cliente.telefono,
+        'cliente_direccion': memoria.get('direccion', ''),
+        'cliente_cargo': memoria.get('cargo', ''),
+        'fecha_corta': hoy.strftime("%d/%m/%Y"),
+        'fecha_larga': fecha_larga,
+        'anio_actual': str(hoy.year),
+        'firma_nombre': 'Lic. Maribel Aldana Santos',
+        'firma_cargo': 'Gestiones Corpad | Directora General',
+    }
+
+    # Si el cliente viene de una cotización aceptada, buscamos datos financieros
+    cotizacion = Cotizacion.objects.filter(cliente_convertido=cliente, estado='aceptada').last()
+    if cotizacion:
+        datos_sistema.update({
+            'monto_total': f"${cotizacion.total_con_iva:,.2f}",
+            'monto_subtotal': f"${cotizacion.total:,.2f}",
+            'monto_anticipo': f"${(cotizacion.total_con_iva/2):,.2f}" if cotizacion.condiciones_pago == '50_50' else 'N/A',
+            'proyecto_titulo': cotizacion.titulo or 'Gestión Administrativa'
+        })
+
+    vars_std_dict = {v.clave: v for v in VariableEstandar.objects.all()}
+
+    for v in vars_en_doc:
+        # Si la variable está en nuestros datos automáticos, la pre-llenamos y marcamos como oculta/auto
+        if v in datos_sistema:
+            formulario.append({'clave': v, 'valor': datos_sistema[v], 'descripcion': 'Automático del Sistema', 'es_automatico': True, 'tipo': 'hidden'})
+            continue
+
+        var_std = vars_std_dict.get(v)
+        val = ""
+        desc = "Variable personalizada"
+        tipo = "text"
+
+        if var_std:
+            desc = var_std.descripcion
+            if var_std.tipo == 'fecha': tipo = 'date'
+            val = memoria.get(v, '')
+        else: 
+            val = memoria.get(v, '')
+
+        formulario.append({'clave': v, 'valor': val, 'descripcion': desc, 'es_automatico': False, 'tipo': tipo})
+
+    if request.method == 'POST':
+        contexto = {}
+        nuevos_datos = {}
+        for item in formulario:
+            if item['es_automatico']: 
+                val = item['valor'] # Usar el valor calculado
+            else:
+                val = request.POST.get(item['clave'], '').strip()
+                nuevos_datos[item['clave']] = val
+            contexto[item['clave']] = val
+            
+        cliente.datos_extra.update(nuevos_datos)
+        cliente.save(update_fields=['datos_extra'])
+        
+        doc.render(contexto)
+        buffer = BytesIO()
+        doc.save(buffer)
+        buffer.seek(0)
+        
+        nombre = request.POST.get('nombre_archivo_salida', '').strip() or f"{plantilla.nombre} - {cliente.nombre_empresa}"
+        if not nombre.lower().endswith('.docx'): nombre += ".docx"
+
+        c_contratos, _ = Carpeta.objects.get_or_create(nombre="Contratos Generados", cliente=cliente, defaults={'es_expediente': False})
+        nuevo = Documento(cliente=cliente, carpeta=c_contratos, nombre_archivo=nombre, subido_por=request.user)
+        nuevo.archivo.save(nombre, ContentFile(buffer.getvalue()))
+        nuevo.save()
+        registrar_bitacora(request.user, cliente, 'generacion', f"Generó contrato: {nombre}")
+        return redirect('visor_docx', documento_id=nuevo.id)
+
+    return render(request, 'generador/llenar.html', {'cliente': cliente, 'plantilla': plantilla, 'variables': formulario})
+
+def reemplazar_preservando_estilo(doc, variable, valor):
+    """
+    Busca una variable (ej: {{ cliente }}) en párrafos y tablas.
+    Reemplaza el texto dentro del 'Run' específico para NO perder
+    negritas, colores, cursivas o subrayados.
+    """
+    valor_str = str(valor)
+    
+    # 1. Buscar en Párrafos del cuerpo principal
+    for p in doc.paragraphs:
+        if variable in p.text:
+            # Iteramos sobre los 'runs' (fragmentos con estilo)
+            for run in p.runs:
+                if variable in run.text:
+                    run.text = run.text.replace(variable, valor_str)
+
+    # 2. Buscar en Tablas (celda por celda)
+    for table in doc.tables:
+        for row in table.rows:
+            for cell in row.cells:
+                for p in cell.paragraphs:
+                    if variable in p.text:
+                        for run in p.runs:
+                            if variable in run.text:
+                                run.text = run.text.replace(variable, valor_str)
+
+@login_required
+def generar_contrato_final(request):
+    """
+    Recibe los datos del formulario de homologación y genera el Word final.
+    Mantiene los estilos (negritas, cursivas) definidos en la plantilla original.
+    """
+    from docxtpl import DocxTemplate
+
+    if request.method == 'POST':
+        try:
+            # 1. Identificar qué plantilla estamos usando
+            plantilla_id = request.POST.get('plantilla_id')
+            plantilla = get_object_or_404(Plantilla, id=plantilla_id)
+
+            # 2. Limpiar y preparar el "Contexto" (Diccionario de datos)
+            # Filtramos los datos que NO son variables del contrato (tokens, ids, etc.)
+            campos_ignorados = ['csrfmiddlewaretoken', 'plantilla_id', 'nombre_archivo_salida']
+            contexto = {}
+
+            for key, value in request.POST.items():
+                if key not in campos_ignorados:
+                    # Guardamos la variable. 
+                    # NOTA: Aunque 'value' es texto plano, al inyectarse en el Word
+                    # tomará el formato que tenga la llave {{ key }} en el archivo .docx
+                    contexto[key] = value
+
+            # 3. Cargar la Plantilla Maestra usando DocxTemplate
+            # Esto es vital. No usamos 'python-docx' directo, usamos 'docxtpl' 
+            # porque es el motor que sabe leer Jinja2 dentro de Word.
+            doc = DocxTemplate(plantilla.archivo.path)
+
+            # 4. RENDERIZADO (El momento mágico)
+            # Aquí se sustituyen las {{ variables }} por el texto del formulario.
+            # Los estilos se conservan porque solo se cambia el contenido XML del texto, no el contenedor.
+            doc.render(contexto)
+
+            # 5. Preparar el nombre del archivo de salida
+            nombre_salida = request.POST.get('nombre_archivo_salida', 'Documento_Generado')
+            # Sanitización básica para asegurar extensión .docx
+            nombre_salida = nombre_salida.strip().replace('/', '_').replace('\\', '_')
+            if not nombre_salida.lower().endswith('.docx'):
+                nombre_salida += '.docx'
+
+            # 6. Crear la respuesta HTTP para forzar la descarga
+            response = HttpResponse(
+                content_type='application/vnd.openxmlformats-officedocument.wordprocessingml.document'
+            )
+            response['Content-Disposition'] = f'attachment; filename="{nombre_salida}"'
+
+            # 7. Guardar el documento procesado directamente en la respuesta (sin guardar en disco)
+            doc.save(response)
+
+            return response
+
+        except Exception as e:
+            # Manejo de errores básico
+            print(f"Error generando contrato: {str(e)}")
+            # Aquí podrías usar messages.error(request, ...)
+            return redirect('dashboard') # O redirige a donde prefieras en caso de error
+
+    return redirect('dashboard')
+
+def _word_a_html(archivo):
+    import mammoth
+
+    return mammoth.convert_to_html(archivo).value
+
+@login_required
+def visor_docx(request, documento_id):
+    doc = get_object_or_404(Documento, id=documento_id)
+    html = ""
+    if doc.nombre_archivo.endswith('.docx'):
+        try:
+            with doc.archivo.open() as f: html = admision.ejecutar('docx', _word_a_html, f, tamano=doc.archivo.size)
+        except admision.Rechazo:
+            raise
+        except Exception as e:
+            # <--- 3. CORRECCIÓN: Logging en lugar de pass
+            logger.error(f"Error visualizando DOCX {documento_id}: {e}")
+    return render(request, 'generador/visor.html', {'doc': doc, 'contenido_html': html})
+
+
+# ------------------------------------------
+# DISEÑADOR DE PLANTILLAS
+# ------------------------------------------
+@login_required
+def subir_plantilla(request):
+    if request.user.rol == 'admin' and request.method == 'POST':
+        Plantilla.objects.create(nombre=request.POST.get('nombre'), archivo=request.FILES.get('archivo'))
+    return redirect('dashboard')
+
+@login_required
+def eliminar_plantilla(request, plantilla_id):
+    if request.user.rol != 'admin':
+        messages.error(request, "No tienes permisos.")
+        return redirect('dashboard')
+        
+    plantilla = get_object_or_404(Plantilla, id=plantilla_id)
+    nombre = plantilla.nombre
+    plantilla.archivo.delete() 
+    plantilla.delete()
+    
+    messages.success(request, f"Plantilla '{nombre}' eliminada.")
+    return redirect(request.META.get('HTTP_REFERER', 'dashboard'))
+
+@login_required
+def diseñador_plantillas(request):
+    from docx import Document as DocumentoWord
+
+    if not request.user.access_disenador: return redirect('dashboard')
+    
+    if request.method == 'POST':
+        nombre = request.POST.get('nombre')
+        archivo = request.FILES.get('archivo_base')
+        data_reemplazos = request.POST.get('reemplazos')
+
+        if archivo and nombre:
+            try:
+                # 1. Cargar el documento
+                doc = DocumentoWord(archivo)
+                
+                # 2. Aplicar reemplazos explícitos del Diseñador (Frontend)
+                if data_reemplazos:
+                    lista = json.loads(data_reemplazos)
+                    for item in lista:
+                        original = item.get('texto_original', '')
+                        variable_raw = item.get('variable', '').strip()
+                        
+                        # Sanitizar nombre variable (Ej: "Nombre Cliente" -> "nombre_cliente")
+                        variable_clean = variable_raw.lower().replace(' ', '_').replace('-', '_')
+                        variable_clean = re.sub(r'[^a-z0-9_]', '', variable_clean) # Solo letras, numeros y _
+                        
+                        variable_formateada = "{{ " + variable_clean + " }}"
+                        
+                        modo = item.get('modo', 'SINGLE')
+                        
+                        # Usar la función helper que ya tienes (reemplazar_preservando_estilo)
+                        # Nota: Si usas replace simple, asegúrate de iterar runs.
+                        # Aquí asumimos que tienes la función helper, si no, usa una lógica simple:
+                        for p in doc.paragraphs:
+                            if original in p.text:
+                                p.text = p.text.replace(original, variable_formateada)
+                        
+                        for table in doc.tables:
+                            for row in table.rows:
+                                for cell in row.cells:
+                                    for p in cell.paragraphs:
+                                        if original in p.text:
+                                            p.text = p.text.replace(original, variable_formateada)
+
+                # 3. AUTO-REPARACIÓN DE VARIABLES ROTAS (NUEVO - NIVEL ENTERPRISE)
+                # Escanea todo el documento buscando {{ ALGO MAL ESCRITO }} y lo arregla
+                
+                def reparar_texto(texto):
+                    # Busca patrones {{ ... }}
+                    pattern = r'\{\{\s*(.*?)\s*\}\}'
+                    
+                    def replacer(match):
+                        contenido = match.group(1)
+                        # Si tiene espacios o caracteres raros, lo arreglamos
+                        if ' ' in contenido or not contenido.isidentifier():
+                            nuevo_contenido = slugify(contenido).replace('-', '_')
+                            return f"{{{{ {nuevo_contenido} }}}}"
+                        return match.group(0) # Si está bien, lo deja igual
+                    
+                    return re.sub(pattern, replacer, texto)
+
+                # Aplicar reparación a todo el documento
+                for p in doc.paragraphs:
+                    if '{{' in p.text:
+                        p.text = reparar_texto(p.text)
+                
+                for table in doc.tables:
+                    for row in table.rows:
+                        for cell in row.cells:
+                            for p in cell.paragraphs:
+                                if '{{' in p.text:
+                                    p.text = reparar_texto(p.text)
+
+                # 4. Guardar archivo final
+                buffer = BytesIO()
+                doc.save(buffer)
+                buffer.seek(0)
+                
+                nombre_archivo = nombre if nombre.endswith('.docx') else f"{nombre}.docx"
+                
+                # Crear registro en BD
+                nueva_plantilla = Plantilla(nombre=nombre)
+                nueva_plantilla.archivo.save(nombre_archivo, ContentFile(buffer.getvalue()))
+                nueva_plantilla.save()
+                
+                messages.success(request, f"¡Plantilla '{nombre}' guardada y optimizada correctamente!")
+                
+            except Exception as e:
+                print(f"Error CRÍTICO en diseñador: {e}") # Ver en consola
+                messages.error(request, f"Error procesando el archivo: {str(e)}")
+            
+            return redirect('dashboard')
+            
+    return render(request, 'generador/diseñador.html', {
+        'glosario': VariableEstandar.objects.all().order_by('clave')
+    })
+
+@login_required
+def previsualizar_word_raw(request):
+    # SEGURO: Eliminado @csrf_exempt
+    if request.method == 'POST' and request.FILES.get('archivo'):
+        try:
+            f = request.FILES['archivo']
+            return JsonResponse({'html': admision.ejecutar('docx', _word_a_html, f, tamano=f.size)})
+        except admision.Rechazo as e:
+            return admision.respuesta(e)
+        except Exception as e:
+            logger.error(f"Error en preview raw: {e}")
+            return JsonResponse({'status': 'error', 'msg': str(e)}, status=500)
+    return JsonResponse({'status': 'error', 'msg': 'No se envió archivo'}, status=400)
+
+@login_required
+def crear_variable_api(request):
+    # SEGURO: Eliminado @csrf_exempt
+    if request.method == 'POST':
+        try:
+            data = json.loads(request.body)
+            clave = data.get('clave')
+            descripcion = data.get('descripcion', '')
+            tipo = data.get('tipo', 'texto')
+            if not clave: return JsonResponse({'status': 'error', 'msg': 'Falta la clave'}, status=400)
+            variable, created = VariableEstandar.objects.get_or_create(clave=clave, defaults={'descripcion': descripcion, 'tipo': tipo})
+            return JsonResponse({'status': 'ok', 'id': str(variable.id), 'clave': variable.clave, 'created': created})
+        except Exception as e:
+            logger.error(f"Error creando variable API: {e}")
+            return JsonResponse({'status': 'error', 'msg': str(e)}, status=500)
+    return JsonResponse({'status': 'error', 'msg': 'Método no permitido'}, status=405)
+
+def _pdf_disenador(html, base_url):
+    with metricas.medir_pdf('disenador'):
+        return pdf.renderizar(html, base_url, 'disenador')
+
+@csrf_exempt
+def api_convertir_html(request):
+    if request.method == 'POST':
+        try:
+            try: data = json.loads(request.body); html_content = data.get('html', '')
+            except: html_content = request.POST.get('html', '')
+            if not html_content: return JsonResponse({'error': 'No content'}, status=400)
+            
+            base_url = request.build_absolute_uri('/')
+            contenido = admision.ejecutar('pdf', _pdf_disenador, html_content, base_url, tamano=len(html_content))
+            response = HttpResponse(contenido, content_type='application/pdf')
+            response['Content-Disposition'] = 'attachment; filename="documento_diseñado.pdf"'
+            return response
+        except admision.Rechazo as e:
+            return admision.respuesta(e)
+        except Exception as e:
+            logger.error(f"Error api_convertir_html: {e}")
+            return JsonResponse({'error': str(e)}, status=500)
+    return JsonResponse({'status': 'error', 'message': 'Only POST allowed'}, status=405)
+
+
+# ------------------------------------------
+# GENERADOR QR
+# ------------------------------------------
+@login_required
+def generador_qr(request):
+    import qrcode
+
+    qr_url = None
+    data = ""
+    color_fill = "#2D1B4B"
+    color_back = "#FFFFFF"
+
+    if request.method == 'POST':
+        data = request.POST.get('data')
+        color_fill = request.POST.get('color_fill', '#2D1B4B')
+        color_back = request.POST.get('color_back', '#FFFFFF')
+
+        if data:
+            qr = qrcode.QRCode(version=1, error_correction=qrcode.constants.ERROR_CORRECT_H, box_size=10, border=4)
+            qr.add_data(data)
+            qr.make(fit=True)
+            img = qr.make_image(fill_color=color_fill, back_color=color_back)
+
+            buffer = BytesIO()
+            img.save(buffer, format="PNG")
+            img_str = base64.b64encode(buffer.getvalue()).decode()
+            qr_url = f"data:image/png;base64,{img_str}"
+
+    return render(request, 'generador_qr.html', {
+        'qr_url': qr_url,
+        'data_input': data,
+        'color_fill': color_fill,
+        'color_back': color_back
+    })
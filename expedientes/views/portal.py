@@ -0,0 +1,92 @@
+# ==========================================
+# EXPEDIENTES/VIEWS/PORTAL.PY - PORTAL PÚBLICO DE CARGA
+# ==========================================
+import logging
+
+# --- Django Core ---
+from django.contrib import messages
+from django.contrib.auth.decorators import login_required
+from django.shortcuts import render, redirect, get_object_or_404, aget_object_or_404
+from asgiref.sync import sync_to_async
+
+# --- Modelos Locales ---
+from ..models import Cliente, SolicitudEnlace, ArchivoTemporal
+
+logger = logging.getLogger(__name__)
+
+
+# ------------------------------------------
+# ENLACES Y CARGA EXTERNA
+# ------------------------------------------
+@login_required
+def generar_link_externo(request, cliente_id):
+    cliente = get_object_or_404(Cliente, id=cliente_id)
+    solicitud = SolicitudEnlace.objects.create(cliente=cliente)
+    link = request.build_absolute_uri(f'/portal-cliente/{solicitud.id}/')
+    messages.success(request, f"¡Link generado! Copia y envía esto al cliente: {link}")
+    return redirect('detalle_cliente', cliente_id=cliente.id)
+
+def _avance_portal(solicitud):
+    cliente = solicitud.cliente
+
+    archivos_en_revision = set(ArchivoTemporal.objects.filter(solicitud=solicitud).values_list('nombre_requisito', flat=True))
+
+    total_requisitos_unicos = set()
+    requisitos_cumplidos_unicos = set()
+    faltantes_reales = []
+    faltantes_set = set()
+
+    for carpeta in cliente.carpetas_drive.all():
+        detalle = carpeta.obtener_detalle_cumplimiento()
+        if detalle:
+            for item in detalle:
+                nombre = item['nombre']
+                total_requisitos_unicos.add(nombre)
+                
+                if item['estado'] == 'ok':
+                    requisitos_cumplidos_unicos.add(nombre)
+                else:
+                    if nombre not in archivos_en_revision:
+                        if nombre not in faltantes_set:
+                            faltantes_reales.append(nombre)
+                            faltantes_set.add(nombre)
+    
+    tareas_completadas = len(requisitos_cumplidos_unicos | archivos_en_revision)
+    total_tareas = len(total_requisitos_unicos)
+    
+    porcentaje = 0
+    if total_tareas > 0:
+        porcentaje = int((tareas_completadas / total_tareas) * 100)
+    
+    if not faltantes_reales and total_tareas > 0:
+        porcentaje = 100
+
+    documento_actual = faltantes_reales[0] if faltantes_reales else None
+
+    return {
+        'cliente': cliente, 
+        'documento_actual': documento_actual, 
+        'faltantes_count': len(faltantes_reales),
+        'porcentaje': porcentaje,
+        'archivos_en_revision': archivos_en_revision
+    }
+
+async def vista_publica_carga(request, token):
+    solicitud = await aget_object_or_404(SolicitudEnlace.objects.select_related('cliente'), id=token, activa=True)
+
+    if request.method == 'POST' and request.FILES.get('archivo'):
+        requisito_a_subir = request.POST.get('requisito_objetivo')
+        archivo_subido = request.FILES['archivo']
+        
+        if requisito_a_subir:
+            # La subida al storage ocurre en el save(): el event loop queda libre mientras tanto
+            await ArchivoTemporal.objects.acreate(
+                solicitud=solicitud,
+                archivo=archivo_subido,
+                nombre_requisito=requisito_a_subir
+            )
+            return redirect('vista_publica_carga', token=token)
+
+    contexto = await sync_to_async(_avance_portal)(solicitud)
+    # render corre los context processors, que leen request.user de forma síncrona
+    return await sync_to_async(render)(request, 'externo/portal_carga.html', contexto)
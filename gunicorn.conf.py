@@ -0,0 +1,102 @@
+# ==========================================
+# GUNICORN.CONF.PY - CONFIGURACIÓN DEL SERVIDOR (se carga sola desde la raíz)
+# ==========================================
+import os
+import shutil
+import tempfile
+import time
+
+_INICIO = time.perf_counter()
+
+
+def _cpus():
+    # Respeta el límite de CPUs del contenedor (cpuset), no solo las del host
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+CPUS = _cpus()
+
+# --- Worker ASGI ---
+# Las vistas async (descargas, previews, agenda, portal) liberan el worker
+# mientras esperan storage o conversiones: un proceso atiende muchas a la vez.
+# Lanzar con la app ASGI: gunicorn core.asgi:application
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'uvicorn_worker.UvicornWorker')
+
+# --- Procesos e hilos ---
+# Worker async: uno por CPU basta (la espera de E/S no ocupa el proceso).
+# Worker síncrono: la fórmula clásica 2 x CPU + 1. Los hilos solo aplican a gthread.
+_ASINCRONO = 'uvicorn' in worker_class.lower()
+workers = int(os.environ.get('GUNICORN_WORKERS', CPUS + 1 if _ASINCRONO else 2 * CPUS + 1))
+threads = int(os.environ.get('GUNICORN_THREADS', min(2 * CPUS, 8)))
+
+# --- Preload ---
+# La app (y los cachés de expedientes/arranque.py) se cargan una vez en el maestro
+# y los workers la heredan por copy-on-write.
+preload_app = os.environ.get('GUNICORN_PRELOAD', '1') == '1'
+
+# --- Reciclaje ---
+# Un worker se reemplaza tras N peticiones (con variación para que no se reinicien todos juntos):
+# acota fugas de memoria de WeasyPrint/pandas.
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 1000))
+max_requests_jitter = int(os.environ.get('GUNICORN_MAX_REQUESTS_JITTER', 100))
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 60))
+graceful_timeout = 30
+
+# --- Métricas multiproceso ---
+# Cada worker escribe sus métricas en este directorio y /metrics las suma.
+# Debe existir antes de importar prometheus_client: con preload la app se importa
+# antes de on_starting, así que se prepara aquí (una sola vez, no en cada recarga con HUP).
+DIRECTORIO_METRICAS = os.environ.setdefault(
+    'PROMETHEUS_MULTIPROC_DIR', os.path.join(tempfile.gettempdir(), 'corpad-metricas')
+)
+if not os.environ.get('CORPAD_METRICAS_PREPARADAS'):
+    # Los archivos de un arranque anterior dejarían contadores inflados
+    shutil.rmtree(DIRECTORIO_METRICAS, ignore_errors=True)
+    os.makedirs(DIRECTORIO_METRICAS, exist_ok=True)
+    os.environ['CORPAD_METRICAS_PREPARADAS'] = '1'
+
+
+def when_ready(server):
+    # Corre en el maestro antes de crear los workers: lo que se cargue aquí se comparte
+    if preload_app:
+        from expedientes.arranque import calentar, memoria_mb
+
+        reporte = calentar()
+        for paso, (cantidad, segundos) in reporte.items():
+            server.log.info(f"Calentamiento {paso}: {cantidad} en {segundos * 1000:.0f} ms")
+        memoria = memoria_mb()
+    else:
+        memoria = None
+    server.log.info(
+        f"Arranque listo en {time.perf_counter() - _INICIO:.2f} s: {workers} workers {worker_class}"
+        f"{f' x {threads} hilos' if 'gthread' in worker_class else ''}, preload={preload_app}, "
+        f"max_requests={max_requests}±{max_requests_jitter}, RSS maestro={memoria} MB"
+    )
+
+
+def post_fork(server, worker):
+    # El pool de expedientes/tareas.py se crea perezosamente en cada worker, nunca en el maestro
+    from expedientes import tareas
+
+    if tareas._pool is not None:
+        server.log.warning("El pool de tareas existía antes del fork; se descarta en el worker")
+        tareas._pool = None
+
+
+def post_worker_init(worker):
+    # Sin preload cada worker carga la app por su cuenta: compila las plantillas antes de su primera petición
+    if not preload_app:
+        from expedientes.arranque import precompilar
+
+        inicio = time.perf_counter()
+        compiladas = sum(1 for *_, error in precompilar() if error is None)
+        worker.log.info(f"Worker {worker.pid}: {compiladas} plantillas en {(time.perf_counter() - inicio) * 1000:.0f} ms")
+
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+
+    multiprocess.mark_process_dead(worker.pid)
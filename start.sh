@@ -1,4 +1,4 @@
 #!/bin/bash
 python manage.py migrate
 python manage.py collectstatic --noinput
-gunicorn core.wsgi:application --bind 0.0.0.0:$PORT
\ No newline at end of file
+gunicorn core.asgi:application --bind 0.0.0.0:$PORT
\ No newline at end of file